@@ -1,4 +1,9 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# FACEREC_IMPORTTIME=1 pyinstaller FaceRecognition.spec builds an exe that
+# prints -X importtime to stderr (python -m bench startup --exe ...)
+options = [('X importtime', None, 'OPTION')] if os.environ.get('FACEREC_IMPORTTIME') else []
 
 
 a = Analysis(
@@ -19,7 +24,7 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    [],
+    options,
     exclude_binaries=True,
     name='FaceRecognition',
     debug=False,
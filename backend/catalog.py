@@ -0,0 +1,252 @@
+"""Search several face databases as one library.
+
+Libraries kept as separate faces.db files (per year, per archive drive) are
+registered in ``catalog.json`` (next to the main DB, or ``FACEREC_CATALOG``).
+Each query runs on every registered DB in parallel, one connection each,
+and the per-DB results are merged: matches by similarity, people and
+companions by label (cluster ids only mean something inside their DB).
+
+Databases are probed first: one whose file is missing (drive unplugged) or
+that doesn't answer within ``probe_timeout`` (a NAS spinning up, a dead
+network mount) is left out and reported in ``skipped`` rather than failing
+or stalling the query. Opened DBs and their search matrices are cached
+until the file changes.
+"""
+import concurrent.futures as cf
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+
+try:
+    from backend.db import FaceDB
+    from backend.search import normalize, top_k_quantized
+except ModuleNotFoundError:
+    from db import FaceDB
+    from search import normalize, top_k_quantized
+
+_DEFAULT_LABEL = re.compile(r"Person[ _#]*\d+")
+
+
+def catalog_path_for(db_path):
+    return os.environ.get("FACEREC_CATALOG") or \
+        os.path.join(os.path.dirname(os.path.abspath(db_path)), "catalog.json")
+
+
+def default_name(db_path):
+    """``/archive/2019/faces.db`` -> ``2019``; ``/x/holidays.db`` -> ``holidays``."""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    if stem == "faces":
+        return os.path.basename(os.path.dirname(os.path.abspath(db_path))) or stem
+    return stem
+
+
+def _person_key(library, cluster_id, label):
+    # unnamed clusters ("Person #3") are different people in every DB
+    if not label or _DEFAULT_LABEL.fullmatch(label):
+        return (library, cluster_id)
+    return label.casefold()
+
+
+class Catalog:
+    """Registered face DBs: ``entries`` is [{"name", "path"}], in registration order.
+
+    probe_timeout: seconds a DB's file may take to show up before it is skipped
+    timeout: seconds a query may take per DB (None: no limit)
+    """
+    def __init__(self, path, probe_timeout=3.0, timeout=None, workers=None):
+        self.path = path
+        self.probe_timeout = probe_timeout
+        self.timeout = timeout
+        self.workers = workers
+        self.entries = []
+        self._dbs = {}      # name -> FaceDB
+        self._index = {}    # name -> (mtime, mode, recs, qm)
+        self._lock = threading.Lock()
+        self.load()
+
+    # ---------- registry ----------
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            self.entries = [{"name": e["name"], "path": e["path"]} for e in doc.get("libraries", [])]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = []
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"libraries": self.entries}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def add(self, db_path, name=None):
+        """Register ``db_path``; returns its name. Re-adding the same file is a no-op."""
+        path = os.path.abspath(db_path)
+        for e in self.entries:
+            if os.path.normcase(e["path"]) == os.path.normcase(path):
+                return e["name"]
+        name = name or default_name(path)
+        if any(e["name"] == name for e in self.entries):
+            raise ValueError(f"a library named {name!r} is already registered")
+        self.entries.append({"name": name, "path": path})
+        self.save()
+        return name
+
+    def remove(self, name):
+        before = len(self.entries)
+        self.entries = [e for e in self.entries if e["name"] != name]
+        with self._lock:
+            self._dbs.pop(name, None)
+            self._index.pop(name, None)
+        if len(self.entries) != before:
+            self.save()
+            return True
+        return False
+
+    # ---------- fan-out ----------
+    def _pool(self, n):
+        return cf.ThreadPoolExecutor(max_workers=self.workers or min(8, max(1, n)),
+                                     thread_name_prefix="catalog")
+
+    @staticmethod
+    def _mtime(path):
+        return os.stat(path).st_mtime
+
+    def available(self):
+        """Probe every DB: ({name: mtime}, {name: reason}) for the reachable and the skipped."""
+        ok, skipped = {}, {}
+        if not self.entries:
+            return ok, skipped
+        pool = self._pool(len(self.entries))
+        futs = {pool.submit(self._mtime, e["path"]): e["name"] for e in self.entries}
+        done, pending = cf.wait(futs, timeout=self.probe_timeout)
+        for f in done:
+            try:
+                ok[futs[f]] = f.result()
+            except FileNotFoundError:
+                skipped[futs[f]] = "offline"
+            except OSError as e:
+                skipped[futs[f]] = e.strerror or str(e)
+        for f in pending:
+            skipped[futs[f]] = f"no answer within {self.probe_timeout:g} s"
+        # a stat stuck on a dead mount can't be interrupted; its thread ends when the mount does
+        pool.shutdown(wait=False)
+        return ok, skipped
+
+    def _db(self, name):
+        with self._lock:
+            db = self._dbs.get(name)
+            if db is None:
+                path = next(e["path"] for e in self.entries if e["name"] == name)
+                db = self._dbs[name] = FaceDB(path)
+        return db
+
+    def _run(self, fn):
+        """``fn(name, db)`` on every reachable DB in parallel -> ({name: result}, {name: reason})."""
+        ok, skipped = self.available()
+        results = {}
+        if not ok:
+            return results, skipped
+        pool = self._pool(len(ok))
+        futs = {pool.submit(lambda n: fn(n, self._db(n)), name): name for name in ok}
+        done, pending = cf.wait(futs, timeout=self.timeout)
+        for f in done:
+            try:
+                results[futs[f]] = f.result()
+            except Exception as e:
+                skipped[futs[f]] = str(e) or type(e).__name__
+        for f in pending:
+            skipped[futs[f]] = f"no answer within {self.timeout:g} s"
+        pool.shutdown(wait=False)
+        # keep the catalogue's order
+        order = [e["name"] for e in self.entries]
+        return ({n: results[n] for n in order if n in results},
+                {n: skipped[n] for n in order if n in skipped})
+
+    def _face_index(self, name, db, mode):
+        mtime = self._mtime(db.path)
+        with self._lock:
+            hit = self._index.get(name)
+        if hit and hit[0] == mtime and hit[1] == mode:
+            return hit[2], hit[3]
+        recs, qm = db.get_face_index(mode)
+        with self._lock:
+            self._index[name] = (mtime, mode, recs, qm)
+        return recs, qm
+
+    # ---------- queries ----------
+    def search(self, ref, k=50, min_sim=None, mode=None):
+        """Faces similar to ``ref`` in every library: (matches, skipped).
+
+        Each DB returns its own top ``k`` (re-ranked exactly, see
+        ``top_k_quantized``); the best ``k`` of those win. Matches are
+        ``get_face_index`` records plus 'sim' and 'library'.
+        """
+        r = normalize(ref)
+
+        def one(name, db):
+            recs, qm = self._face_index(name, db, mode)
+            idx, sims = top_k_quantized(r, qm, k, min_sim,
+                                        exact=lambda ix: db.get_embeddings([recs[i]["face_id"] for i in ix]))
+            return [dict(recs[i], sim=float(s), library=name) for i, s in zip(idx.tolist(), sims.tolist())]
+
+        results, skipped = self._run(one)
+        found = itertools.chain.from_iterable(results.values())
+        if k:
+            return heapq.nlargest(k, found, key=lambda m: m["sim"]), skipped
+        return sorted(found, key=lambda m: -m["sim"]), skipped
+
+    def people(self, text=None):
+        """People whose label contains ``text`` (all without it), biggest first: (rows, skipped).
+
+        Rows are dicts with 'library', 'cluster_id', 'label' and 'faces'.
+        """
+        needle = (text or "").casefold()
+
+        def one(name, db):
+            return [{"library": name, "cluster_id": cid, "label": label, "faces": n}
+                    for cid, label, n in db.list_clusters() if needle in (label or "").casefold()]
+
+        results, skipped = self._run(one)
+        rows = sorted(itertools.chain.from_iterable(results.values()), key=lambda r: -r["faces"])
+        return rows, skipped
+
+    @staticmethod
+    def _clusters_named(db, label):
+        want = label.casefold()
+        return [cid for cid, lab, _ in db.list_clusters() if (lab or "").casefold() == want]
+
+    def together(self, labels):
+        """Photos showing every one of ``labels`` (exact, case-insensitive): (rows, skipped).
+
+        Rows are dicts with 'library' and 'abs_path'.
+        """
+        def one(name, db):
+            groups = [self._clusters_named(db, lab) for lab in labels]
+            return [{"library": name, "abs_path": p} for p in db.images_with_people(groups)]
+
+        results, skipped = self._run(one)
+        return list(itertools.chain.from_iterable(results.values())), skipped
+
+    def companions(self, label, limit=20):
+        """Who appears in photos with ``label``, over all libraries: (rows, skipped).
+
+        Named people are counted together across libraries; unnamed clusters
+        stay per library. Rows are dicts with 'label', 'images' and
+        'libraries', most shared photos first.
+        """
+        def one(name, db):
+            return [(name, cid, lab, n) for cid, lab, n in db.companions(self._clusters_named(db, label), limit)]
+
+        results, skipped = self._run(one)
+        merged = {}
+        for name, cid, lab, n in itertools.chain.from_iterable(results.values()):
+            row = merged.setdefault(_person_key(name, cid, lab), {"label": lab, "images": 0, "libraries": []})
+            row["images"] += n
+            if name not in row["libraries"]:
+                row["libraries"].append(name)
+        rows = sorted(merged.values(), key=lambda r: -r["images"])
+        return rows[:limit] if limit else rows, skipped
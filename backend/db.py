@@ -1,29 +1,43 @@
 import os
+import shutil
 import sqlite3
 import json
-import shutil
+import time
 import numpy as np
 import threading
 
+try:
+    from backend.export import export_files
+    from backend import quant
+    from backend.video import frames_dir_for
+except ModuleNotFoundError:
+    from export import export_files
+    import quant
+    from video import frames_dir_for
+
 def adapt_array(arr):
     return arr.tobytes()
 
 def convert_array(blob):
-    return np.frombuffer(blob, dtype=np.float32)
+    # raw float32, or a tagged float16/int8 blob (see quant.encode)
+    return quant.decode(blob)
 
 sqlite3.register_adapter(np.ndarray, adapt_array)
 sqlite3.register_converter("ARRAY", convert_array)
 
 class FaceDB:
-    def __init__(self, path: str):
+    def __init__(self, path: str, timeout: float = 5.0):
         self.path = path
-        # Allow use from worker thread
+        # Allow use from worker thread; ``timeout`` is how long a write waits for
+        # another process's lock (queue workers sharing one DB raise it)
         self.conn = sqlite3.connect(
             self.path,
+            timeout=timeout,
             detect_types=sqlite3.PARSE_DECLTYPES,
             check_same_thread=False
         )
         self.lock = threading.Lock()
+        self._universe = None  # (data version, ids) of people_images()
         self._migrate()
 
     def _migrate(self):
@@ -50,8 +64,80 @@ class FaceDB:
                 id INTEGER PRIMARY KEY,
                 label TEXT
             )""")
+            # columns added after the first release
+            self._add_column(cur, "faces", "det_score", "REAL")
+            self._add_column(cur, "clusters", "rep_face_id", "INTEGER")
+            self._add_column(cur, "clusters", "rep_dirty", "INTEGER DEFAULT 1")
+            # comma separated QualityGate reasons; gated faces keep no embedding
+            self._add_column(cur, "faces", "quality_flags", "TEXT")
+            # faces found in videos: timestamp and the saved frame they were cut from
+            self._add_column(cur, "faces", "frame_ts", "REAL")
+            self._add_column(cur, "faces", "frame_path", "TEXT")
+            # set once a file went through detection, so files without faces aren't redone
+            self._add_column(cur, "images", "scanned", "INTEGER DEFAULT 0")
+            # perceptual hash, and the image this one is a burst duplicate of
+            self._add_column(cur, "images", "phash", "INTEGER")
+            self._add_column(cur, "images", "duplicate_of", "INTEGER")
+            # what re-embedding needs without re-detection: the detector landmarks,
+            # optionally the aligned chip (JPEG), and the model that made the embedding
+            self._add_column(cur, "faces", "kps", "TEXT")
+            self._add_column(cur, "faces", "chip", "BLOB")
+            self._add_column(cur, "faces", "model", "TEXT")
+            # work queue (see workqueue.py): who holds an image and until when, how
+            # often it was handed out, and the shard DB its results wait in
+            self._add_column(cur, "images", "lease_owner", "TEXT")
+            self._add_column(cur, "images", "lease_until", "REAL")
+            self._add_column(cur, "images", "attempts", "INTEGER DEFAULT 0")
+            self._add_column(cur, "images", "shard", "TEXT")
+            # scanned without detection because the prefilter saw no face (prefilter.py)
+            self._add_column(cur, "images", "prefiltered", "INTEGER DEFAULT 0")
+            # person -> image index: sorted uint32 image ids per cluster, rebuilt when dirty
+            self._add_column(cur, "clusters", "image_ids", "BLOB")
+            self._add_column(cur, "clusters", "images_dirty", "INTEGER DEFAULT 1")
+            cur.execute("CREATE INDEX IF NOT EXISTS faces_cluster ON faces(cluster_id, image_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS faces_image ON faces(image_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS images_duplicate ON images(duplicate_of) WHERE duplicate_of IS NOT NULL")
+            self.has_fts = self._migrate_fts(cur)
+            cur.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+            cur.execute("SELECT value FROM meta WHERE key='embedding_format'")
+            row = cur.fetchone()
+            # format new embeddings are written in; rows in other formats still read fine
+            self.embedding_format = row[0] if row and row[0] in quant.MODES else quant.FLOAT32
             self.conn.commit()
 
+    @staticmethod
+    def _migrate_fts(cur):
+        """Full-text index over cluster labels, kept in sync by triggers. False without FTS5."""
+        cur.execute("SELECT 1 FROM sqlite_master WHERE name='cluster_fts'")
+        if cur.fetchone():
+            return True
+        try:
+            cur.execute("""CREATE VIRTUAL TABLE cluster_fts USING fts5(
+                               label, content='clusters', content_rowid='id',
+                               tokenize='unicode61 remove_diacritics 2')""")
+        except sqlite3.OperationalError:
+            return False  # SQLite built without FTS5: label search falls back to LIKE
+        cur.executescript("""
+            CREATE TRIGGER IF NOT EXISTS clusters_fts_ai AFTER INSERT ON clusters BEGIN
+                INSERT INTO cluster_fts(rowid, label) VALUES (new.id, new.label);
+            END;
+            CREATE TRIGGER IF NOT EXISTS clusters_fts_ad AFTER DELETE ON clusters BEGIN
+                INSERT INTO cluster_fts(cluster_fts, rowid, label) VALUES ('delete', old.id, old.label);
+            END;
+            CREATE TRIGGER IF NOT EXISTS clusters_fts_au AFTER UPDATE OF label ON clusters BEGIN
+                INSERT INTO cluster_fts(cluster_fts, rowid, label) VALUES ('delete', old.id, old.label);
+                INSERT INTO cluster_fts(rowid, label) VALUES (new.id, new.label);
+            END;
+        """)
+        cur.execute("INSERT INTO cluster_fts(cluster_fts) VALUES ('rebuild')")
+        return True
+
+    @staticmethod
+    def _add_column(cur, table, column, decl):
+        cur.execute(f"PRAGMA table_info({table})")
+        if column not in {r[1] for r in cur.fetchall()}:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
     # ---------- Images ----------
     def ensure_image(self, rel_path: str, abs_path: str) -> int:
         st = os.stat(abs_path)
@@ -67,6 +153,43 @@ class FaceDB:
             self.conn.commit()
         return row[0]
 
+    def mark_scanned(self, image_id: int, prefiltered: bool = False):
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("UPDATE images SET scanned=1, prefiltered=? WHERE id=?", (int(prefiltered), image_id))
+            self.conn.commit()
+
+    def recheck_prefiltered(self, root: str = None):
+        """Make images the prefilter skipped unscanned again; returns their paths (below ``root``)."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id, abs_path FROM images WHERE prefiltered=1")
+            rows = cur.fetchall()
+            if root is not None:
+                prefix = os.path.join(os.path.normcase(os.path.abspath(root)), "")
+                rows = [r for r in rows if r[1] and os.path.normcase(os.path.abspath(r[1])).startswith(prefix)]
+            cur.executemany("UPDATE images SET scanned=0, prefiltered=0 WHERE id=?", [(i,) for i, _ in rows])
+            self.conn.commit()
+        return [p for _, p in rows]
+
+    def set_image_hash(self, image_id: int, phash, duplicate_of=None):
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("UPDATE images SET phash=?, duplicate_of=? WHERE id=?", (phash, duplicate_of, image_id))
+            if duplicate_of is not None:
+                # the representative's people now show this photo as well
+                cur.execute("""UPDATE clusters SET images_dirty=1 WHERE id IN
+                               (SELECT DISTINCT cluster_id FROM faces WHERE image_id=?)""", (duplicate_of,))
+            self.conn.commit()
+
+    def is_indexed(self, image_id: int) -> bool:
+        """True if the file went through detection before (with or without faces)."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT scanned FROM images WHERE id=?", (image_id,))
+            row = cur.fetchone()
+        return bool(row and row[0]) or self.has_faces(image_id)
+
     def has_faces(self, image_id: int) -> bool:
         with self.lock:
             cur = self.conn.cursor()
@@ -74,24 +197,493 @@ class FaceDB:
             got = cur.fetchone()[0] > 0
         return got
 
+    def get_images_under(self, root: str):
+        """Return [(id, abs_path, mtime, scanned)] for stored images below ``root``."""
+        prefix = os.path.join(os.path.normcase(os.path.abspath(root)), "")
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id, abs_path, mtime, scanned FROM images")
+            rows = cur.fetchall()
+        return [r for r in rows if r[1] and os.path.normcase(os.path.abspath(r[1])).startswith(prefix)]
+
+    def get_images_by_path(self, abs_paths):
+        """Return {abs_path: (id, mtime)} for the given paths that are stored."""
+        out = {}
+        paths = list(abs_paths)
+        with self.lock:
+            cur = self.conn.cursor()
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                cur.execute(f"SELECT abs_path, id, mtime FROM images WHERE abs_path IN ({','.join('?' * len(chunk))})",
+                            chunk)
+                out.update({p: (iid, mt) for p, iid, mt in cur.fetchall()})
+        return out
+
+    def remove_images(self, image_ids):
+        """Delete images and their faces (e.g. files gone from disk)."""
+        ids = list(image_ids)
+        self.forget_faces(ids)
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.executemany("DELETE FROM images WHERE id=?", [(i,) for i in ids])
+            self.conn.commit()
+
+    def forget_faces(self, image_ids, mtimes=None):
+        """Drop the faces of ``image_ids`` so the next scan re-detects them.
+
+        mtimes: optional {image_id: mtime} to record for the changed files.
+        Clusters that lose members get their representative recomputed.
+        """
+        ids = list(image_ids)
+        with self.lock:
+            cur = self.conn.cursor()
+            frames = []
+            for i in ids:
+                cur.execute("""UPDATE clusters SET rep_dirty=1, images_dirty=1 WHERE id IN
+                               (SELECT DISTINCT cluster_id FROM faces WHERE image_id=?)""", (i,))
+                cur.execute("SELECT DISTINCT frame_path FROM faces WHERE image_id=? AND frame_path IS NOT NULL", (i,))
+                frames.extend(r[0] for r in cur.fetchall())
+                cur.execute("DELETE FROM faces WHERE image_id=?", (i,))
+                # a burst duplicate is listed under its representative's people
+                cur.execute("""UPDATE clusters SET images_dirty=1 WHERE id IN
+                               (SELECT DISTINCT f.cluster_id FROM faces f JOIN images d ON f.image_id = d.duplicate_of
+                                WHERE d.id=?)""", (i,))
+                cur.execute("UPDATE images SET scanned=0, prefiltered=0, duplicate_of=NULL WHERE id=?", (i,))
+                # duplicates tagged against this image have to be looked at again
+                cur.execute("UPDATE images SET scanned=0, duplicate_of=NULL WHERE duplicate_of=?", (i,))
+            for i, mt in (mtimes or {}).items():
+                cur.execute("UPDATE images SET mtime=? WHERE id=?", (mt, i))
+            self.conn.commit()
+        for fp in frames:
+            try:
+                os.remove(fp)
+            except OSError:
+                pass
+
+    # ---------- Work queue ----------
+    _CLAIMABLE = """scanned=0 AND shard IS NULL AND attempts < ?
+                    AND (lease_until IS NULL OR lease_until < ?)"""
+
+    def claim_images(self, owner: str, limit: int = 16, lease_s: float = 600.0, max_attempts: int = 3):
+        """Lease up to ``limit`` unscanned images to ``owner`` for ``lease_s`` seconds.
+
+        Free images and ones whose lease ran out (a worker that died) are
+        claimable until they were handed out ``max_attempts`` times. One
+        UPDATE does the claim, so concurrent workers never get the same row.
+        Returns (token, [(image_id, rel_path, abs_path, attempts)]); the token
+        names this claim for ``renew_claim``/``finish_claim``.
+        """
+        token = f"{owner}#{time.time_ns()}"
+        now = time.time()
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute(f"""
+                UPDATE images SET lease_owner=?, lease_until=?, attempts=attempts+1
+                WHERE id IN (SELECT id FROM images WHERE {self._CLAIMABLE} ORDER BY id LIMIT ?)
+            """, (token, now + lease_s, max_attempts, now, limit))
+            self.conn.commit()
+            cur.execute("SELECT id, rel_path, abs_path, attempts FROM images WHERE lease_owner=? ORDER BY id",
+                        (token,))
+            rows = cur.fetchall()
+        return token, rows
+
+    def renew_claim(self, token: str, lease_s: float = 600.0) -> int:
+        """Heartbeat: push the claim's lease out again; returns the rows still held."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("UPDATE images SET lease_until=? WHERE lease_owner=?", (time.time() + lease_s, token))
+            n = cur.rowcount
+            self.conn.commit()
+        return n
+
+    def finish_claim(self, token: str, shard=None, done_ids=()):
+        """Give a claim's images back. With ``shard``, ``done_ids`` are marked as
+        indexed into that shard DB (waiting for ``merge_shard``); images not
+        scanned or sharded become claimable again."""
+        with self.lock:
+            cur = self.conn.cursor()
+            if shard is not None:
+                cur.executemany("UPDATE images SET shard=?, attempts=0 WHERE id=? AND lease_owner=?",
+                                [(shard, i, token) for i in done_ids])
+            # attempts only add up for images that keep failing
+            cur.execute("""UPDATE images SET lease_owner=NULL, lease_until=NULL,
+                           attempts=CASE WHEN scanned=1 THEN 0 ELSE attempts END
+                           WHERE lease_owner=?""", (token,))
+            self.conn.commit()
+
+    def queue_stats(self, max_attempts: int = 3):
+        """Counts of 'pending', 'leased', 'failed' (out of attempts) and 'done'
+        images, 'shards' ({name: images waiting to be merged}) and the
+        'workers' holding a live lease."""
+        now = time.time()
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute(f"""
+                SELECT SUM({self._CLAIMABLE}),
+                       SUM(scanned=0 AND shard IS NULL AND lease_until >= ?),
+                       SUM(scanned=0 AND shard IS NULL AND attempts >= ? AND (lease_until IS NULL OR lease_until < ?)),
+                       SUM(scanned=1)
+                FROM images
+            """, (max_attempts, now, now, max_attempts, now))
+            pending, leased, failed, done = cur.fetchone()
+            cur.execute("SELECT shard, COUNT(1) FROM images WHERE shard IS NOT NULL AND scanned=0 GROUP BY shard")
+            shards = dict(cur.fetchall())
+            cur.execute("SELECT DISTINCT lease_owner FROM images WHERE lease_until >= ?", (now,))
+            workers = sorted({r[0].rsplit("#", 1)[0] for r in cur.fetchall()})
+        return {"pending": pending or 0, "leased": leased or 0, "failed": failed or 0, "done": done or 0,
+                "shards": shards, "workers": workers}
+
+    def requeue(self, failed=True, shard=None) -> int:
+        """Make images claimable again: those out of attempts (``failed``) and/or
+        those waiting in ``shard`` (a shard DB that was lost). Returns the count."""
+        n = 0
+        with self.lock:
+            cur = self.conn.cursor()
+            if failed:
+                cur.execute("""UPDATE images SET attempts=0, lease_owner=NULL, lease_until=NULL
+                               WHERE scanned=0 AND shard IS NULL AND attempts > 0
+                                 AND (lease_until IS NULL OR lease_until < ?)""", (time.time(),))
+                n += cur.rowcount
+            if shard is not None:
+                cur.execute("UPDATE images SET shard=NULL, attempts=0 WHERE shard=? AND scanned=0", (shard,))
+                n += cur.rowcount
+            self.conn.commit()
+        return n
+
+    def merge_shard(self, shard_path: str, shard=None):
+        """Fold the results of a shard DB (a queue worker's private faces.db) in.
+
+        Images are matched by rel_path; each merged image's faces here are
+        replaced by the shard's, so merging the same shard twice is harmless.
+        Embeddings are rewritten in this DB's storage format, video frames are
+        copied next to this DB, and the images stop waiting on ``shard``.
+        New faces are unclustered: re-cluster afterwards.
+        Returns dict with 'images' and 'faces' merged.
+        """
+        src = sqlite3.connect(shard_path)  # no converters: blobs are copied as stored
+        try:
+            scur = src.cursor()
+            scur.execute("PRAGMA table_info(faces)")
+            theirs = {r[1] for r in scur.fetchall()}
+            scur.execute("SELECT id, rel_path, abs_path, mtime, phash, duplicate_of, prefiltered FROM images "
+                         "WHERE scanned=1")
+            images = scur.fetchall()
+            with self.lock:
+                try:
+                    cur = self.conn.cursor()
+                    cur.execute("PRAGMA table_info(faces)")
+                    cols = [r[1] for r in cur.fetchall()
+                            if r[1] not in ("id", "image_id", "cluster_id") and r[1] in theirs]
+                    ids = {}
+                    for sid, rel, abs_path, mtime, _, _, _ in images:
+                        # a worker on another OS writes the same rel_path with other separators
+                        for r in (rel, rel.replace("/", "\\"), rel.replace("\\", "/")):
+                            cur.execute("SELECT id FROM images WHERE rel_path=?", (r,))
+                            row = cur.fetchone()
+                            if row:
+                                break
+                        else:
+                            cur.execute("INSERT INTO images(rel_path, abs_path, mtime) VALUES(?,?,?)",
+                                        (rel, abs_path, mtime))
+                            row = (cur.lastrowid,)
+                        ids[sid] = row[0]
+                    for mid in ids.values():
+                        cur.execute("""UPDATE clusters SET rep_dirty=1, images_dirty=1 WHERE id IN
+                                       (SELECT DISTINCT cluster_id FROM faces WHERE image_id=?)""", (mid,))
+                        cur.execute("DELETE FROM faces WHERE image_id=?", (mid,))
+                    for sid, _, _, _, phash, dup, pre in images:
+                        cur.execute("""UPDATE images SET scanned=1, phash=?, duplicate_of=?, prefiltered=?, shard=NULL,
+                                       lease_owner=NULL, lease_until=NULL WHERE id=?""",
+                                    (phash, ids.get(dup), pre or 0, ids[sid]))
+                    frames_dir = frames_dir_for(self.path)
+                    emb = cols.index("embedding") if "embedding" in cols else None
+                    fp = cols.index("frame_path") if "frame_path" in cols else None
+                    n_faces = 0
+                    scur.execute(f"SELECT image_id, {', '.join(cols)} FROM faces")
+                    for row in scur:
+                        if row[0] not in ids:
+                            continue
+                        vals = list(row[1:])
+                        if emb is not None and vals[emb] is not None \
+                                and quant.blob_format(vals[emb]) != self.embedding_format:
+                            vals[emb] = sqlite3.Binary(quant.encode(quant.decode(vals[emb]), self.embedding_format))
+                        if fp is not None and vals[fp]:
+                            vals[fp] = self._adopt_frame(vals[fp], shard_path, frames_dir)
+                        cur.execute(f"INSERT INTO faces(image_id, {', '.join(cols)}) "
+                                    f"VALUES(?{', ?' * len(cols)})", [ids[row[0]]] + vals)
+                        n_faces += 1
+                    if shard is not None:
+                        # anything the shard was credited with but doesn't hold goes back in the queue
+                        cur.execute("UPDATE images SET shard=NULL WHERE shard=?", (shard,))
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+        finally:
+            src.close()
+        return {"images": len(images), "faces": n_faces}
+
+    @staticmethod
+    def _adopt_frame(path, shard_path, frames_dir):
+        """Copy a shard's saved video frame next to this DB; returns the new path."""
+        src = path
+        if not os.path.exists(src):
+            # stored by another machine: look in the shard's own frames folder
+            src = os.path.join(frames_dir_for(shard_path), os.path.basename(path.replace("\\", "/")))
+        dst = os.path.join(frames_dir, os.path.basename(src))
+        try:
+            if os.path.abspath(src) != os.path.abspath(dst):
+                os.makedirs(frames_dir, exist_ok=True)
+                shutil.copy2(src, dst)
+            return dst
+        except OSError:
+            return path
+
     # ---------- Faces ----------
-    def add_face(self, image_id: int, bbox, embedding: np.ndarray):
+    def add_face(self, image_id: int, bbox, embedding: np.ndarray, det_score=None, flags=None,
+                 frame_ts=None, frame_path=None, kps=None, chip=None, model=None):
+        """Store a detection. With ``flags`` (QualityGate reasons) the face is
+        kept as metadata only: no embedding, so it never reaches search or
+        clustering, and the image still counts as indexed. Faces from videos
+        carry ``frame_ts`` (seconds) and the saved ``frame_path`` the bbox
+        refers to. ``kps``/``chip`` let ``reembed`` redo the embedding later;
+        ``model`` is the engine's model_version."""
+        if flags:
+            embedding = chip = None
+        if embedding is not None:
+            embedding = sqlite3.Binary(quant.encode(embedding, self.embedding_format))
         with self.lock:
             cur = self.conn.cursor()
             cur.execute(
-                "INSERT INTO faces(image_id, bbox, embedding) VALUES(?,?,?)",
-                (image_id, json.dumps(bbox), embedding),
+                "INSERT INTO faces(image_id, bbox, embedding, det_score, quality_flags, frame_ts, frame_path,"
+                " kps, chip, model) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                (image_id, json.dumps(bbox), embedding, det_score, ",".join(flags) if flags else None,
+                 frame_ts, frame_path, json.dumps(kps) if kps is not None else None,
+                 sqlite3.Binary(chip) if chip is not None else None, model),
             )
             self.conn.commit()
 
+    def faces_to_reembed(self, model: str, after_id: int = 0, limit: int = 256):
+        """Searchable faces whose embedding isn't from ``model`` and that can be
+        redone without detection (chip or landmarks stored), by id after ``after_id``.
+
+        Returns [(face_id, chip_bytes|None, kps|None, source_path)], where the
+        source is the frame image for videos.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("""
+                SELECT f.id, f.chip, f.kps, COALESCE(f.frame_path, i.abs_path)
+                FROM faces f
+                JOIN images i ON i.id = f.image_id
+                WHERE f.embedding IS NOT NULL AND (f.model IS NULL OR f.model != ?)
+                  AND (f.chip IS NOT NULL OR f.kps IS NOT NULL) AND f.id > ?
+                ORDER BY f.id
+                LIMIT ?
+            """, (model, after_id, limit))
+            rows = cur.fetchall()
+        return [(fid, bytes(chip) if chip is not None else None, json.loads(kps) if kps else None, src)
+                for fid, chip, kps, src in rows]
+
+    def set_embeddings(self, pairs, model: str):
+        """Replace embeddings: pairs of (face_id, float32 vector), tagged with ``model``."""
+        pairs = list(pairs)
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.executemany("UPDATE faces SET embedding=?, model=? WHERE id=?",
+                            [(sqlite3.Binary(quant.encode(e, self.embedding_format)), model, fid)
+                             for fid, e in pairs])
+            cur.executemany("UPDATE clusters SET rep_dirty=1 WHERE id=(SELECT cluster_id FROM faces WHERE id=?)",
+                            [(fid,) for fid, _ in pairs])
+            self.conn.commit()
+
+    def model_stats(self):
+        """Searchable faces per embedding model, and what re-embedding can reuse.
+
+        Returns dict with 'by_model' ({model or None: n}), 'with_chip',
+        'with_kps_only', 'needs_detection' and 'chip_bytes'.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT model, COUNT(1) FROM faces WHERE embedding IS NOT NULL GROUP BY model")
+            by_model = dict(cur.fetchall())
+            cur.execute("""
+                SELECT SUM(chip IS NOT NULL), SUM(chip IS NULL AND kps IS NOT NULL),
+                       SUM(chip IS NULL AND kps IS NULL), COALESCE(SUM(LENGTH(chip)), 0)
+                FROM faces WHERE embedding IS NOT NULL
+            """)
+            chips, kps_only, bare, chip_bytes = cur.fetchone()
+        return {"by_model": by_model, "with_chip": chips or 0, "with_kps_only": kps_only or 0,
+                "needs_detection": bare or 0, "chip_bytes": chip_bytes}
+
     def get_all_embeddings(self):
         with self.lock:
             cur = self.conn.cursor()
-            cur.execute("SELECT id, embedding FROM faces")
+            cur.execute("SELECT id, embedding FROM faces WHERE embedding IS NOT NULL")
             rows = cur.fetchall()
         self._face_ids = [r[0] for r in rows]
         return [r[1] for r in rows]
 
+    def max_face_id(self) -> int:
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT MAX(id) FROM faces")
+            row = cur.fetchone()
+        return row[0] or 0
+
+    def assign_unclustered(self, since_face_id: int = 0, max_dist: float = 0.45):
+        """Attach unclustered faces newer than ``since_face_id`` to the nearest
+        existing cluster centroid within ``max_dist`` cosine distance.
+
+        Cheap incremental alternative to a full re-cluster for a handful of
+        new faces; faces with no close cluster stay unassigned until the next
+        full clustering pass. Returns the number of faces assigned.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id, embedding, image_id FROM faces WHERE cluster_id IS NULL AND id>? AND embedding IS NOT NULL",
+                        (since_face_id,))
+            new = cur.fetchall()
+            if not new:
+                return 0
+            cur.execute("SELECT cluster_id, embedding FROM faces WHERE cluster_id IS NOT NULL AND embedding IS NOT NULL")
+            members = cur.fetchall()
+        if not members:
+            return 0
+        cids = sorted({c for c, _ in members})
+        pos = {c: i for i, c in enumerate(cids)}
+        C = np.zeros((len(cids), len(members[0][1])), dtype=np.float32)
+        for c, e in members:
+            C[pos[c]] += e
+        C /= (np.linalg.norm(C, axis=1, keepdims=True) + 1e-9)
+        X = np.vstack([e for _, e, _ in new]).astype(np.float32)
+        S = X @ C.T
+        best = S.argmax(axis=1)
+        picked = [(cids[b], fid, iid) for (fid, _, iid), b, s in zip(new, best, S[np.arange(len(new)), best])
+                  if 1.0 - s <= max_dist]
+        assigned = [(c, fid) for c, fid, _ in picked]
+        added = {}
+        for c, _, iid in picked:
+            added.setdefault(c, []).append(iid)
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.executemany("UPDATE faces SET cluster_id=? WHERE id=?", assigned)
+            cur.executemany("UPDATE clusters SET rep_dirty=1 WHERE id=?", [(c,) for c in added])
+            self._add_person_images(cur, self._with_duplicates(cur, added))
+            self.conn.commit()
+        return len(assigned)
+
+    def get_face_records(self):
+        """Return (records, X) for every face.
+
+        records: list of dicts with 'face_id', 'bbox', 'abs_path', 'cluster_id',
+            'source_path' and 'frame_ts' ('abs_path' is the frame image for videos)
+        X: float32 matrix of the embeddings, one row per record
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("""
+                SELECT f.id, f.bbox, COALESCE(f.frame_path, i.abs_path), f.cluster_id, f.embedding,
+                       i.abs_path, f.frame_ts
+                FROM faces f
+                JOIN images i ON i.id = f.image_id
+                WHERE f.embedding IS NOT NULL
+                ORDER BY f.id
+            """)
+            rows = cur.fetchall()
+        recs = [{"face_id": fid, "bbox": json.loads(b), "abs_path": p, "cluster_id": c,
+                 "source_path": src, "frame_ts": ts}
+                for (fid, b, p, c, _, src, ts) in rows]
+        X = np.vstack([r[4] for r in rows]).astype(np.float32) if rows else np.zeros((0, 0), np.float32)
+        return recs, X
+
+    def get_face_index(self, mode=None):
+        """Like ``get_face_records`` but the matrix is a quant.QuantizedMatrix
+        in ``mode``, filled row by row so no full float32 copy is ever held.
+        Default: float32 when it fits in memory (fastest to scan), else the
+        storage format. Pair with ``get_embeddings`` for exact re-ranking."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT COUNT(1) FROM faces WHERE embedding IS NOT NULL")
+            n = cur.fetchone()[0]
+            if mode is None:
+                cur.execute("SELECT embedding FROM faces WHERE embedding IS NOT NULL LIMIT 1")
+                row = cur.fetchone()
+                mode = quant.search_mode(n, len(row[0]) if row else 0, self.embedding_format)
+            cur.execute("""
+                SELECT f.id, f.bbox, COALESCE(f.frame_path, i.abs_path), f.cluster_id, f.embedding,
+                       i.abs_path, f.frame_ts
+                FROM faces f
+                JOIN images i ON i.id = f.image_id
+                WHERE f.embedding IS NOT NULL
+                ORDER BY f.id
+            """)
+            recs = []
+            qm = None
+            for fid, b, p, c, e, src, ts in cur:
+                if qm is None:
+                    qm = quant.QuantizedMatrix(n, len(e), mode)
+                if len(recs) == n:
+                    break
+                qm.add(e)
+                recs.append({"face_id": fid, "bbox": json.loads(b), "abs_path": p, "cluster_id": c,
+                             "source_path": src, "frame_ts": ts})
+        return recs, qm or quant.QuantizedMatrix(0, 0, mode)
+
+    def get_embeddings(self, face_ids):
+        """float32 matrix of the stored embeddings of ``face_ids``, in that order."""
+        ids = [int(i) for i in face_ids]
+        found = {}
+        with self.lock:
+            cur = self.conn.cursor()
+            for s in range(0, len(ids), 500):
+                chunk = ids[s:s + 500]
+                cur.execute(f"SELECT id, embedding FROM faces WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(cur.fetchall())
+        return np.vstack([found[i] for i in ids]).astype(np.float32) if ids else np.zeros((0, 0), np.float32)
+
+    def convert_embeddings(self, mode, batch=5000, progress=None):
+        """Store every embedding in ``mode`` (quant.MODES) and write new ones that way.
+
+        Runs in batches of ``batch`` rows, each its own transaction, so it can
+        be interrupted and re-run. The file only shrinks after ``vacuum()``.
+        progress: optional callable(done, total, rewritten). Returns the rows rewritten.
+        """
+        if mode not in quant.MODES:
+            raise ValueError(f"unknown embedding format: {mode}")
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES('embedding_format', ?)", (mode,))
+            self.conn.commit()
+            self.embedding_format = mode
+            cur.execute("SELECT COUNT(1) FROM faces WHERE embedding IS NOT NULL")
+            total = cur.fetchone()[0]
+        done = rewritten = 0
+        last = 0
+        while True:
+            with self.lock:
+                cur = self.conn.cursor()
+                # read the raw bytes: the ARRAY converter would decode them
+                cur.execute("SELECT id, CAST(embedding AS BLOB) FROM faces"
+                            " WHERE embedding IS NOT NULL AND id > ? ORDER BY id LIMIT ?", (last, batch))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                last = rows[-1][0]
+                upd = [(sqlite3.Binary(quant.encode(quant.decode(b), mode)), fid)
+                       for fid, b in rows if quant.blob_format(b) != mode]
+                cur.executemany("UPDATE faces SET embedding=? WHERE id=?", upd)
+                self.conn.commit()
+            rewritten += len(upd)
+            done += len(rows)
+            if progress:
+                progress(done, total, rewritten)
+        return rewritten
+
+    def vacuum(self):
+        with self.lock:
+            self.conn.execute("VACUUM")
+
     def apply_cluster_labels(self, labels):
         with self.lock:
             cur = self.conn.cursor()
@@ -107,7 +699,7 @@ class FaceDB:
             next_id = 1
             for _, members in groups.items():
                 cur.execute(
-                    "INSERT INTO clusters(id, label) VALUES(?,?)",
+                    "INSERT INTO clusters(id, label, rep_dirty) VALUES(?,?,1)",
                     (next_id, f"Person #{next_id}"),
                 )
                 for fid in members:
@@ -143,23 +735,237 @@ class FaceDB:
     def merge_clusters(self, keep_id: int, merged_ids):
         with self.lock:
             cur = self.conn.cursor()
-            for mid in merged_ids:
+            merged = [m for m in merged_ids if m != keep_id]
+            # union the merged people's image lists into the kept one (dirty if any is stale)
+            ids = self._person_arrays(cur, merged)
+            for mid in merged:
                 cur.execute("UPDATE faces SET cluster_id=? WHERE cluster_id=?", (keep_id, mid))
                 cur.execute("DELETE FROM clusters WHERE id=?", (mid,))
+            cur.execute("UPDATE clusters SET rep_dirty=1 WHERE id=?", (keep_id,))
+            if len(ids) < len(merged):
+                cur.execute("UPDATE clusters SET images_dirty=1 WHERE id=?", (keep_id,))
+            else:
+                self._add_person_images(cur, {keep_id: np.concatenate(list(ids.values())) if ids else []})
             self.conn.commit()
 
     def get_faces_by_cluster(self, cluster_id: int):
         with self.lock:
             cur = self.conn.cursor()
             cur.execute("""
-                SELECT f.bbox, i.abs_path
+                SELECT f.bbox, COALESCE(f.frame_path, i.abs_path)
                 FROM faces f
                 JOIN images i ON i.id = f.image_id
                 WHERE f.cluster_id=?
+                ORDER BY f.image_id, f.id
             """, (cluster_id,))
             rows = cur.fetchall()
         return [{"bbox": json.loads(b), "abs_path": p} for (b, p) in rows]
 
+    def images_with_people(self, groups):
+        """Paths of the images showing everyone in ``groups``: one list of
+        cluster ids per person (a person may be split over clusters)."""
+        groups = [list(g) for g in groups]
+        if not groups or not all(groups):
+            return []
+        ids = None
+        for g in sorted((self.person_images(g) for g in groups), key=len):
+            ids = g if ids is None else np.intersect1d(ids, g, assume_unique=True)
+            if not len(ids):
+                return []
+        return [p for _, p in self.image_paths(ids)]
+
+    # ---------- Person index ----------
+    @staticmethod
+    def _person_arrays(cur, cluster_ids):
+        """{cluster_id: sorted image id array} for the clean clusters among ``cluster_ids``."""
+        out = {}
+        ids = [int(c) for c in cluster_ids]
+        for s in range(0, len(ids), 500):
+            chunk = ids[s:s + 500]
+            cur.execute(f"SELECT id, image_ids FROM clusters WHERE id IN ({','.join('?' * len(chunk))})"
+                        " AND images_dirty=0 AND image_ids IS NOT NULL", chunk)
+            out.update((cid, np.frombuffer(b, dtype="<u4")) for cid, b in cur.fetchall())
+        return out
+
+    def _add_person_images(self, cur, added):
+        """Union ``{cluster_id: image ids}`` into the clean clusters' lists; dirty ones get rebuilt anyway."""
+        have = self._person_arrays(cur, added)
+        cur.executemany("UPDATE clusters SET image_ids=? WHERE id=?",
+                        [(sqlite3.Binary(np.union1d(have[c], np.asarray(iids, dtype="<u4")).astype("<u4").tobytes()), c)
+                         for c, iids in added.items() if c in have])
+
+    @staticmethod
+    def _with_duplicates(cur, added):
+        """``{cluster_id: image ids}`` plus the burst duplicates tagged against those images."""
+        iids = sorted({int(i) for v in added.values() for i in v})
+        dups = {}
+        for s in range(0, len(iids), 500):
+            chunk = iids[s:s + 500]
+            cur.execute(f"SELECT duplicate_of, id FROM images WHERE duplicate_of IN ({','.join('?' * len(chunk))})",
+                        chunk)
+            for rep, d in cur.fetchall():
+                dups.setdefault(rep, []).append(d)
+        if not dups:
+            return added
+        return {c: list(v) + [d for i in v for d in dups.get(int(i), ())] for c, v in added.items()}
+
+    def refresh_person_index(self):
+        """Rebuild the image lists of clusters flagged dirty; returns how many were rebuilt.
+
+        Cheap when nothing changed. Full re-clustering dirties everything;
+        merges and incremental assignment update the lists in place. Burst
+        duplicates count as photos of their representative's people, as in
+        ``get_cluster_files``.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id FROM clusters WHERE images_dirty IS NULL OR images_dirty=1 OR image_ids IS NULL")
+            dirty = [r[0] for r in cur.fetchall()]
+            for s in range(0, len(dirty), 500):
+                chunk = dirty[s:s + 500]
+                marks = ','.join('?' * len(chunk))
+                cur.execute(f"""
+                    SELECT cluster_id, image_id FROM faces WHERE cluster_id IN ({marks})
+                    UNION
+                    SELECT f.cluster_id, d.id FROM images d JOIN faces f ON f.image_id = d.duplicate_of
+                    WHERE f.cluster_id IN ({marks})
+                """, chunk + chunk)
+                pairs = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+                pairs = np.unique(pairs, axis=0)  # sorted by cluster, then image
+                cuts = np.flatnonzero(np.diff(pairs[:, 0])) + 1
+                lists = {int(g[0, 0]): g[:, 1].astype("<u4") for g in np.split(pairs, cuts) if len(g)}
+                cur.executemany("UPDATE clusters SET image_ids=?, images_dirty=0 WHERE id=?",
+                                [(sqlite3.Binary(lists.get(c, np.zeros(0, "<u4")).tobytes()), c) for c in chunk])
+            self.conn.commit()
+        self._universe = None
+        return len(dirty)
+
+    def person_images(self, cluster_ids):
+        """Sorted uint32 array of the images showing any of ``cluster_ids``."""
+        ids = [int(c) for c in cluster_ids]
+        if not ids:
+            return np.zeros(0, "<u4")
+        with self.lock:
+            have = self._person_arrays(self.conn.cursor(), ids)
+        if len(have) < len(ids):
+            self.refresh_person_index()
+            with self.lock:
+                have = self._person_arrays(self.conn.cursor(), ids)
+        arrays = list(have.values())
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, "<u4")
+
+    def people_images(self):
+        """Sorted uint32 array of every image showing at least one person (what NOT subtracts from)."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("PRAGMA data_version")
+            version = (cur.fetchone()[0], self.conn.total_changes)
+        if self._universe is not None and self._universe[0] == version:
+            return self._universe[1]
+        self.refresh_person_index()
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT image_ids FROM clusters WHERE image_ids IS NOT NULL")
+            arrays = [np.frombuffer(r[0], dtype="<u4") for r in cur.fetchall()]
+            cur.execute("PRAGMA data_version")
+            version = (cur.fetchone()[0], self.conn.total_changes)
+        ids = np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, "<u4")
+        self._universe = (version, ids)
+        return ids
+
+    def match_people(self, text):
+        """Clusters whose label matches ``text``: [(cluster_id, label)].
+
+        An exact (case-insensitive) label wins; otherwise every word must
+        start a word of the label (FTS5, or LIKE without it).
+        """
+        text = (text or "").strip()
+        if not text:
+            return []
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id, label FROM clusters WHERE label = ? COLLATE NOCASE", (text,))
+            rows = cur.fetchall()
+            if rows:
+                return rows
+            words = text.replace('"', " ").split()
+            if self.has_fts:
+                query = " ".join(f'"{w}"*' for w in words)
+                cur.execute("SELECT rowid, label FROM cluster_fts WHERE cluster_fts MATCH ? ORDER BY rank", (query,))
+            else:
+                # prefix of the label or of any later word; % and _ in the input are literal
+                esc = [w.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") for w in words]
+                cond = "(label LIKE ? ESCAPE '\\' OR label LIKE ? ESCAPE '\\')"
+                cur.execute("SELECT id, label FROM clusters WHERE " + " AND ".join([cond] * len(words)),
+                            [p for w in esc for p in (f"{w}%", f"% {w}%")])
+            return cur.fetchall()
+
+    def image_paths(self, image_ids):
+        """[(image_id, abs_path)] for ``image_ids``, in that order."""
+        ids = [int(i) for i in image_ids]
+        found = {}
+        with self.lock:
+            cur = self.conn.cursor()
+            for s in range(0, len(ids), 500):
+                chunk = ids[s:s + 500]
+                cur.execute(f"SELECT id, abs_path FROM images WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(cur.fetchall())
+        return [(i, found[i]) for i in ids if i in found]
+
+    def image_faces(self, image_ids, prefer=()):
+        """One face per image for showing results: {image_id: {'bbox', 'abs_path', 'source_path'}}.
+
+        A face of a cluster in ``prefer`` is picked when the image has one.
+        """
+        ids = [int(i) for i in image_ids]
+        prefer = {int(c) for c in prefer}
+        out = {}
+        with self.lock:
+            cur = self.conn.cursor()
+            for s in range(0, len(ids), 500):
+                chunk = ids[s:s + 500]
+                cur.execute(f"""
+                    SELECT f.image_id, f.cluster_id, f.bbox, COALESCE(f.frame_path, i.abs_path), i.abs_path
+                    FROM faces f JOIN images i ON i.id = f.image_id
+                    WHERE f.image_id IN ({','.join('?' * len(chunk))}) AND f.cluster_id IS NOT NULL
+                    ORDER BY f.id
+                """, chunk)
+                for iid, cid, b, p, src in cur.fetchall():
+                    if iid not in out or (cid in prefer and out[iid][0] not in prefer):
+                        out[iid] = (cid, {"bbox": json.loads(b), "abs_path": p, "source_path": src})
+        return {iid: rec for iid, (_, rec) in out.items()}
+
+    def companions(self, cluster_ids, limit: int = 20):
+        """People seen in the same images as ``cluster_ids``:
+        [(cluster_id, label, shared_images)], most shared first."""
+        ids = list(cluster_ids)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        with self.lock:
+            cur = self.conn.cursor()
+            # burst duplicates of a shared image count as shared images too
+            cur.execute(f"""
+                WITH shared AS (
+                    SELECT DISTINCT f2.cluster_id AS cid, f1.image_id AS iid
+                    FROM faces f1
+                    JOIN faces f2 ON f2.image_id = f1.image_id
+                    WHERE f1.cluster_id IN ({marks}) AND f2.cluster_id NOT IN ({marks})
+                )
+                SELECT c.id, c.label, COUNT(1) AS n
+                FROM (SELECT cid, iid FROM shared
+                      UNION
+                      SELECT s.cid, d.id FROM shared s JOIN images d ON d.duplicate_of = s.iid) x
+                JOIN clusters c ON c.id = x.cid
+                GROUP BY c.id, c.label
+                ORDER BY n DESC
+                LIMIT ?
+            """, ids + ids + [limit])
+            rows = cur.fetchall()
+        return rows
+
     def get_recent_faces(self, limit: int = 50):
         """Return the most recently added faces (by face id) as a list of dicts
         containing 'bbox' and 'abs_path'. This is useful to preview faces
@@ -168,20 +974,96 @@ class FaceDB:
         with self.lock:
             cur = self.conn.cursor()
             cur.execute("""
-                SELECT f.bbox, i.abs_path
+                SELECT f.bbox, COALESCE(f.frame_path, i.abs_path)
                 FROM faces f
                 JOIN images i ON i.id = f.image_id
+                WHERE f.embedding IS NOT NULL
                 ORDER BY f.id DESC
                 LIMIT ?
             """, (limit,))
             rows = cur.fetchall()
         return [{"bbox": json.loads(b), "abs_path": p} for (b, p) in rows]
 
+    def quality_stats(self):
+        """How much the quality gate kept out of the index.
+
+        Returns dict with 'kept', 'gated', 'gated_share', 'by_reason' and
+        'embedding_bytes_saved' (what the gated embeddings would have cost).
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT COUNT(1) FROM faces WHERE quality_flags IS NULL")
+            kept = cur.fetchone()[0]
+            cur.execute("SELECT quality_flags, COUNT(1) FROM faces WHERE quality_flags IS NOT NULL GROUP BY quality_flags")
+            rows = cur.fetchall()
+            cur.execute("SELECT LENGTH(embedding) FROM faces WHERE embedding IS NOT NULL LIMIT 1")
+            row = cur.fetchone()
+        gated = sum(n for _, n in rows)
+        by_reason = {}
+        for flags, n in rows:
+            for r in flags.split(","):
+                by_reason[r] = by_reason.get(r, 0) + n
+        emb_bytes = row[0] if row else 512 * 4
+        return {
+            "kept": kept,
+            "gated": gated,
+            "gated_share": gated / max(1, kept + gated),
+            "by_reason": by_reason,
+            "embedding_bytes_saved": gated * emb_bytes,
+        }
+
+    # ---------- Representatives ----------
+    def update_representatives(self):
+        """Pick a representative face for every cluster whose membership changed.
+
+        The representative is the member closest to the cluster centroid
+        (an approximate medoid); near-ties go to the higher det_score.
+        Clusters that are not flagged dirty are left alone, so this is cheap
+        to call before showing the People list. Returns the number updated.
+        """
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT id FROM clusters WHERE rep_dirty IS NULL OR rep_dirty=1 OR rep_face_id IS NULL")
+            dirty = [r[0] for r in cur.fetchall()]
+        for cid in dirty:
+            with self.lock:
+                cur = self.conn.cursor()
+                cur.execute("SELECT id, embedding, det_score FROM faces WHERE cluster_id=? AND embedding IS NOT NULL",
+                            (cid,))
+                rows = cur.fetchall()
+            rep = None
+            if rows:
+                X = np.vstack([r[1] for r in rows]).astype(np.float32)
+                c = X.mean(axis=0)
+                c /= (np.linalg.norm(c) + 1e-9)
+                sims = X @ c
+                # round so faces that are equally central compare on det_score
+                best = max(range(len(rows)), key=lambda i: (round(float(sims[i]), 3), rows[i][2] or 0.0))
+                rep = rows[best][0]
+            with self.lock:
+                cur = self.conn.cursor()
+                cur.execute("UPDATE clusters SET rep_face_id=?, rep_dirty=0 WHERE id=?", (rep, cid))
+                self.conn.commit()
+        return len(dirty)
+
+    def get_representatives(self):
+        """Return {cluster_id: {'bbox', 'abs_path'}} for clusters with a representative."""
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("""
+                SELECT c.id, f.bbox, COALESCE(f.frame_path, i.abs_path)
+                FROM clusters c
+                JOIN faces f ON f.id = c.rep_face_id
+                JOIN images i ON i.id = f.image_id
+            """)
+            rows = cur.fetchall()
+        return {cid: {"bbox": json.loads(b), "abs_path": p} for (cid, b, p) in rows}
+
     # ---------- Suggestions ----------
     def _cluster_centroid(self, cluster_id: int):
         with self.lock:
             cur = self.conn.cursor()
-            cur.execute("SELECT embedding FROM faces WHERE cluster_id=?", (cluster_id,))
+            cur.execute("SELECT embedding FROM faces WHERE cluster_id=? AND embedding IS NOT NULL", (cluster_id,))
             embs = [r[0] for r in cur.fetchall()]
         if not embs:
             return None
@@ -209,38 +1091,36 @@ class FaceDB:
         return out[:topk]
 
     # ---------- Export ----------
-    def export_cluster(self, cluster_id: int, library_root: str, out_root: str) -> int:
+    def get_cluster_files(self, cluster_id: int):
+        """Return (label, [abs_path, ...]) for every photo of a cluster."""
         with self.lock:
             cur = self.conn.cursor()
             cur.execute("SELECT label FROM clusters WHERE id=?", (cluster_id,))
             row = cur.fetchone()
-        label = row[0] if row else f"Person_{cluster_id}"
-        person_dir = os.path.join(out_root, label.replace("/", "_"))
-        os.makedirs(person_dir, exist_ok=True)
-
-        with self.lock:
-            cur = self.conn.cursor()
+            # burst duplicates tagged against a member photo come along
             cur.execute("""
                 SELECT DISTINCT i.abs_path
                 FROM faces f
                 JOIN images i ON i.id = f.image_id
                 WHERE f.cluster_id=?
-            """, (cluster_id,))
+                UNION
+                SELECT d.abs_path
+                FROM images d
+                JOIN faces f ON f.image_id = d.duplicate_of
+                WHERE f.cluster_id=?
+            """, (cluster_id, cluster_id))
             rows = cur.fetchall()
+        label = row[0] if row else f"Person_{cluster_id}"
+        return label, [r[0] for r in rows]
 
-        count = 0
-        for (src,) in rows:
-            if not os.path.exists(src):
-                continue
-            dst = os.path.join(person_dir, os.path.basename(src))
-            base, ext = os.path.splitext(dst)
-            j = 1
-            while os.path.exists(dst):
-                dst = f"{base}_{j}{ext}"
-                j += 1
-            try:
-                shutil.copy2(src, dst)
-                count += 1
-            except Exception:
-                pass
-        return count
\ No newline at end of file
+    def export_cluster(self, cluster_id: int, library_root: str, out_root: str,
+                       mode: str = "copy", progress=None, stop_event=None, workers=None):
+        """Export a person's photos into ``out_root/<label>``.
+
+        See ``backend.export.export_files`` for the modes. Returns an
+        ExportResult carrying the count and any per-file failures.
+        """
+        label, paths = self.get_cluster_files(cluster_id)
+        person_dir = os.path.join(out_root, label.replace("/", "_"))
+        return export_files(paths, person_dir, mode=mode, workers=workers,
+                            progress=progress, stop_event=stop_event)
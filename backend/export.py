@@ -0,0 +1,176 @@
+import os
+import shutil
+import tarfile
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MODES = ("copy", "hardlink", "symlink", "reflink", "zip", "tar")
+
+# Linux FICLONE ioctl: share extents on btrfs/XFS/... instead of copying bytes
+_FICLONE = 0x40049409
+
+
+class ExportResult:
+    def __init__(self, out_path):
+        self.out_path = out_path
+        self.exported = 0
+        self.skipped = 0  # duplicates of an already exported source
+        self.failed = []  # (src, error message)
+        self.cancelled = False
+
+    def summary(self):
+        msg = f"Exported {self.exported} files to {self.out_path}"
+        if self.failed:
+            msg += f"; {len(self.failed)} failed"
+        if self.cancelled:
+            msg += " (cancelled)"
+        return msg
+
+
+def plan_names(sources, taken=()):
+    """Map each unique source to a collision-free file name.
+
+    Computed up front from one directory listing (``taken``) instead of
+    probing the filesystem per file, so parallel workers never race for the
+    same destination. Duplicate sources are dropped.
+    """
+    used = {n.lower() for n in taken}
+    plan = []
+    seen = set()
+    for src in sources:
+        if src in seen:
+            continue
+        seen.add(src)
+        name = os.path.basename(src)
+        base, ext = os.path.splitext(name)
+        j = 1
+        while name.lower() in used:
+            name = f"{base}_{j}{ext}"
+            j += 1
+        used.add(name.lower())
+        plan.append((src, name))
+    return plan
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, "rb") as fi, open(dst, "wb") as fo:
+        fcntl.ioctl(fo.fileno(), _FICLONE, fi.fileno())
+    shutil.copystat(src, dst)
+
+
+def _place(src, dst, mode):
+    if mode == "copy":
+        shutil.copy2(src, dst)
+    elif mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == "reflink":
+        try:
+            _reflink(src, dst)
+        except OSError:
+            # filesystem can't share extents (or different device): plain copy
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            shutil.copy2(src, dst)
+    else:
+        raise ValueError(f"unknown export mode: {mode}")
+
+
+def export_files(sources, out_dir, mode="copy", workers=None, progress=None, stop_event=None):
+    """Export ``sources`` into ``out_dir``.
+
+    mode: 'copy', 'hardlink', 'symlink', 'reflink' (falls back to copy where
+    the filesystem can't clone), or 'zip' / 'tar' to stream everything into
+    a single archive ``<out_dir>.zip`` / ``<out_dir>.tar`` instead.
+    progress: optional callable(done, total)
+    stop_event: optional threading.Event; when set, pending work is dropped.
+    Returns an ExportResult; per-file failures are collected, not raised.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown export mode: {mode}")
+    stop_event = stop_event or threading.Event()
+    all_sources = list(sources)
+
+    if mode in ("zip", "tar"):
+        plan = plan_names(all_sources)
+        return _export_archive(plan, out_dir, mode, progress, stop_event, len(all_sources))
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    # files already in out_dir (earlier exports) keep their names
+    plan = plan_names(all_sources, taken=os.listdir(out_dir))
+    total = len(plan)
+    res = ExportResult(out_dir)
+    res.skipped = len(all_sources) - total
+
+    lock = threading.Lock()
+    done = [0]
+
+    def work(src, name):
+        if stop_event.is_set():
+            return src, None
+        try:
+            _place(src, os.path.join(out_dir, name), mode)
+            return src, True
+        except Exception as e:
+            return src, e
+
+    workers = workers or min(16, (os.cpu_count() or 2) * 2)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(work, src, name) for src, name in plan]
+        for fut in as_completed(futs):
+            if fut.cancelled():
+                continue  # dropped by a stop request: not exported
+            src, outcome = fut.result()
+            with lock:
+                if outcome is True:
+                    res.exported += 1
+                elif outcome is not None:
+                    res.failed.append((src, str(outcome)))
+                done[0] += 1
+                n = done[0]
+            if progress and (n % 25 == 0 or n == total):
+                progress(n, total)
+            if stop_event.is_set():
+                for f in futs:
+                    f.cancel()
+    res.cancelled = stop_event.is_set()
+    return res
+
+
+def _export_archive(plan, out_dir, mode, progress, stop_event, n_sources):
+    path = os.path.normpath(out_dir) + (".zip" if mode == "zip" else ".tar")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    res = ExportResult(path)
+    res.skipped = n_sources - len(plan)
+    total = len(plan)
+    # photos are already compressed; storing avoids burning CPU for ~0% gain
+    if mode == "zip":
+        arc = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        add = lambda src, arcname: arc.write(src, arcname)
+    else:
+        arc = tarfile.open(path, "w")
+        add = lambda src, arcname: arc.add(src, arcname=arcname, recursive=False)
+    try:
+        for i, (src, arcname) in enumerate(plan, 1):
+            if stop_event.is_set():
+                res.cancelled = True
+                break
+            try:
+                add(src, arcname)
+                res.exported += 1
+            except Exception as e:
+                res.failed.append((src, str(e)))
+            if progress and (i % 25 == 0 or i == total):
+                progress(i, total)
+    finally:
+        arc.close()
+    return res
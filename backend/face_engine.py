@@ -4,36 +4,177 @@ os.environ.setdefault("ORT_LOG_SEVERITY_LEVEL", "3")   # 0-4 (0=verbose, 3=error
 os.environ.setdefault("ORT_LOG_VERBOSITY_LEVEL", "1")
 os.environ.setdefault("INSIGHTFACE_LOG_LEVEL", "ERROR")
 
+import contextlib
 import logging
 logging.getLogger("insightface").setLevel(logging.ERROR)
 logging.getLogger("onnxruntime").setLevel(logging.ERROR)
 
 import cv2
 import numpy as np
-from insightface.app import FaceAnalysis
+
+try:
+    from backend.quality import sharpness
+    from backend.tiling import Tiler, merge as merge_detections
+except ModuleNotFoundError:
+    from quality import sharpness
+    from tiling import Tiler, merge as merge_detections
+
+
+def decode_image(image_path):
+    """Decode an image file to an RGB array the detector expects (None on failure)."""
+    img = cv2.imread(image_path)
+    if img is None:
+        return None
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+CHIP_SIZE = 112  # ArcFace input
+
+
+def encode_chip(chip, quality=95):
+    """JPEG bytes of an aligned chip (kept in the detector's channel order)."""
+    ok, buf = cv2.imencode(".jpg", chip, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
+
+
+def decode_chip(blob):
+    return cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_COLOR)
+
 
 class FaceEngine:
-    def __init__(self, det_size=(480, 480)):
+    def __init__(self, det_size=(480, 480), model=None, keep_chips=None, tiling=None):
         """
         Lighter, faster defaults:
         - Smaller det_size (480x480) vs 640x640
         - Only load detection + recognition modules
+        model: insightface model pack (default $FACEREC_MODEL or buffalo_l)
+        keep_chips: also return the aligned 112x112 chip of every face
+            (JPEG, ``det['chip']``) so it can be re-embedded without even
+            decoding the photo (default: $FACEREC_KEEP_CHIPS=1)
+        tiling: "auto" re-detects over tiles when a photo is far larger than
+            det_size or the first pass finds several tiny faces (see tiling.py),
+            "always" tiles every photo larger than a tile, "off" never
+            (default: $FACEREC_TILING or auto)
         """
+        # imported here so the decode helpers above work without insightface
+        from insightface.app import FaceAnalysis
+        self.model = model or os.environ.get("FACEREC_MODEL") or "buffalo_l"
+        if keep_chips is None:
+            keep_chips = os.environ.get("FACEREC_KEEP_CHIPS", "") not in ("", "0")
+        self.keep_chips = keep_chips
+        self.tiling = (tiling or os.environ.get("FACEREC_TILING") or "auto").lower()
+        self.tiler = Tiler()
+        self.det_size = det_size
         try:
-            self.app = FaceAnalysis(name="buffalo_l", allowed_modules=["detection","recognition"])
+            self.app = FaceAnalysis(name=self.model, allowed_modules=["detection","recognition"])
         except TypeError:
-            self.app = FaceAnalysis(name="buffalo_l")
+            self.app = FaceAnalysis(name=self.model)
         self.app.prepare(ctx_id=0, det_size=det_size)
+        self.rec = self.app.models.get("recognition")
+        rec_file = os.path.basename(getattr(self.rec, "model_file", "") or "")
+        # stored with every embedding; faces tagged with another version need re-embedding
+        self.model_version = f"{self.model}/{rec_file}" if rec_file else self.model
 
-    def extract_faces(self, image_path):
-        img = cv2.imread(image_path)
+    def extract_faces(self, image_path, metrics=None):
+        """Detect and embed faces; ``metrics`` (a RunMetrics) gets decode/detect/embed timings."""
+        if metrics is None or not metrics.enabled:
+            img = decode_image(image_path)
+        else:
+            with metrics.stage("decode"):
+                img = decode_image(image_path)
         if img is None:
             return []
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        faces = self.app.get(img)
+        return self.extract_faces_array(img, metrics)
+
+    def extract_faces_array(self, img, metrics=None):
+        """Like ``extract_faces`` for an already decoded RGB array (e.g. a video frame)."""
+        faces, tiled = self._get(img, metrics if metrics is not None and metrics.enabled else None)
+        h, w = img.shape[:2]
         out = []
         for f in faces:
             bbox = f.bbox.astype(int).tolist()
             emb = f.normed_embedding.astype(np.float32)
-            out.append({"bbox": bbox, "embedding": emb})
+            kps = getattr(f, "kps", None)
+            # measurements for QualityGate; cheap next to detection itself
+            det = {"bbox": bbox, "embedding": emb, "det_score": float(getattr(f, "det_score", 0.0)),
+                   "image_size": (w, h), "kps": kps.tolist() if kps is not None else None,
+                   "sharpness": sharpness(img, bbox)}
+            if tiled:
+                det["tiled"] = True
+            if self.keep_chips and kps is not None:
+                det["chip"] = encode_chip(self.align(img, kps))
+            out.append(det)
         return out
+
+    @staticmethod
+    def align(img, kps):
+        """The 112x112 chip the recognition model sees for landmarks ``kps``."""
+        from insightface.utils import face_align
+        return face_align.norm_crop(img, landmark=np.asarray(kps, dtype=np.float32), image_size=CHIP_SIZE)
+
+    def embed_chips(self, chips):
+        """Normalised embeddings for a batch of aligned chips (arrays), recognition model only."""
+        if not chips:
+            return np.zeros((0, 0), np.float32)
+        feats = np.asarray(self.rec.get_feat(list(chips)), dtype=np.float32).reshape(len(chips), -1)
+        return feats / (np.linalg.norm(feats, axis=1, keepdims=True) + 1e-12)
+
+    def _get(self, img, metrics=None):
+        # FaceAnalysis.get() split in two: detection (maybe tiled) and embedding, timed separately
+        det = getattr(self.app, "det_model", None)
+        if det is None:
+            with _stage(metrics, "detect+embed"):
+                return self.app.get(img), False
+        from insightface.app.common import Face
+        with _stage(metrics, "detect"):
+            bboxes, kpss = det.detect(img, max_num=0, metric="default")
+        tiled = False
+        if self.tiling != "off":
+            with _stage(metrics, "detect.tiles"):
+                tiled, bboxes, kpss = self._detect_tiles(det, img, bboxes, kpss, metrics)
+        faces = []
+        with _stage(metrics, "embed"):
+            for i in range(bboxes.shape[0]):
+                face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None,
+                            det_score=bboxes[i, 4])
+                for task, model in self.app.models.items():
+                    if task != "detection":
+                        model.get(img, face)
+                faces.append(face)
+        return faces, tiled
+
+    def _detect_tiles(self, det, img, bboxes, kpss, metrics=None):
+        """Second detection pass over tiles when the first one can't see small faces.
+
+        Returns (tiled, bboxes, kpss) with tile boxes merged into the first pass by NMS.
+        """
+        h, w = img.shape[:2]
+        side = self.tiler.tile_side((w, h), self.det_size, bboxes)
+        if side is None and self.tiling == "always" and max(w, h) > 2 * min(self.det_size):
+            side = 2 * min(self.det_size)
+        if side is None:
+            return False, bboxes, kpss
+        tiles = self.tiler.grid((w, h), side)
+        parts = [(bboxes, kpss)]
+        for tile in tiles:
+            x0, y0, x1, y1 = tile
+            b, k = det.detect(np.ascontiguousarray(img[y0:y1, x0:x1]), max_num=0, metric="default")
+            # faces cut by an inner tile edge are seen whole by the overlapping neighbour
+            keep = self.tiler.inside(b, tile, (w, h))
+            b = b[keep].copy()
+            b[:, [0, 2]] += x0
+            b[:, [1, 3]] += y0
+            if k is not None:
+                k = k[keep].copy()
+                k[..., 0] += x0
+                k[..., 1] += y0
+            parts.append((b, k))
+        bboxes, kpss = merge_detections(parts)
+        if metrics is not None:
+            metrics.count("images_tiled")
+            metrics.count("tiles", len(tiles))
+        return True, bboxes, kpss
+
+
+def _stage(metrics, name):
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
@@ -0,0 +1,278 @@
+import os
+
+try:
+    from backend.utils import find_images, rel_to, is_video
+    from backend.metrics import RunMetrics
+    from backend.profiling import profiled
+    from backend.video import index_video, frames_dir_for
+    from backend.phash import map_bbox, to_signed
+    from backend.shm_ring import FrameRing
+except ModuleNotFoundError:
+    from utils import find_images, rel_to, is_video
+    from metrics import RunMetrics
+    from profiling import profiled
+    from video import index_video, frames_dir_for
+    from phash import map_bbox, to_signed
+    from shm_ring import FrameRing
+
+
+def index_folder(db, engine, folder, images=None, thumbs=None, metrics=None, should_stop=None,
+                 progress=None, progress_every=5, gate=None, dedup=None, decoders=0, prefilter=None):
+    """Index every image and video under ``folder`` that ``db`` hasn't scanned yet.
+
+    engine: FaceEngine (or anything with ``extract_faces(path, metrics=None)``;
+        videos also need ``extract_faces_array``)
+    images: optional pre-walked list of image/video paths under ``folder``
+    thumbs: optional ThumbCache to pre-render face thumbnails into
+    metrics: optional RunMetrics; stages walk, db_lookup, decode, detect,
+        embed, db_write and thumbs are timed when it is enabled
+    gate: optional QualityGate; rejected faces are stored without an embedding
+    dedup: optional BurstDeduper; near-duplicates of a recently detected photo
+        skip detection and are tagged (or inherit its faces)
+    decoders: decode stills ahead in this many worker processes, handing the
+        frames over through shared memory (see shm_ring); 0 decodes inline
+    prefilter: optional Prefilter; stills it finds no face in are marked
+        scanned without the full decode and detection
+    should_stop: optional callable polled between images
+    progress: optional callable(done, total, faces_added)
+    Returns a dict with 'faces' (searchable faces added), 'images' (files
+    handled, skipped ones included), 'images_skipped', 'errors',
+    'faces_gated', 'duplicates', 'prefiltered' and 'images_tiled', counted
+    whether or not ``metrics`` is enabled. Per-image errors are counted, not raised.
+    """
+    m = metrics or RunMetrics(enabled=False)
+    model = getattr(engine, "model_version", None)
+    if images is None:
+        with m.stage("walk"):
+            images = find_images(folder, videos=True)
+    if dedup is not None:
+        # bursts are consecutive file names in one folder
+        images = sorted(images)
+    total = len(images)
+    m.count("images_found", total)
+    added = 0
+    counts = dict.fromkeys(("images", "images_skipped", "errors", "faces_gated", "duplicates", "prefiltered",
+                            "images_tiled"), 0)
+    plan = {}
+    frames = None
+    if decoders and hasattr(engine, "extract_faces_array"):
+        # look everything up first so only files that need detection are decoded ahead
+        with m.stage("db_lookup"):
+            for img in images:
+                try:
+                    img_id = db.ensure_image(rel_to(img, folder), img)
+                    plan[img] = (img_id, db.is_indexed(img_id))
+                except Exception:
+                    pass  # looked up (and counted) again in the loop
+        todo = [p for p in images if p in plan and not plan[p][1] and not is_video(p)]
+        if todo:
+            frames = FrameRing(todo, workers=decoders, metrics=m)
+    try:
+        for idx, img in enumerate(images, 1):
+            if should_stop and should_stop():
+                m.info["cancelled"] = True
+                break
+            m.gauge("pending_images", total - idx + 1)
+            try:
+                if img in plan:
+                    img_id, known = plan[img]
+                else:
+                    with m.stage("db_lookup"):
+                        img_id = db.ensure_image(rel_to(img, folder), img)
+                        known = db.is_indexed(img_id)
+                h = rep = None
+                if dedup is not None and not known and not is_video(img):
+                    with m.stage("phash"):
+                        h, size, rep = dedup.match(img)
+                if known:
+                    counts["images_skipped"] += 1
+                    m.count("images_skipped")
+                elif is_video(img):
+                    # a few faces per person track, not one per frame
+                    stored, gated = index_video(db, engine, img_id, img, frames_dir_for(db.path), gate, m)
+                    db.mark_scanned(img_id)
+                    added += stored
+                    m.count("videos")
+                    m.count("faces", stored)
+                    counts["faces_gated"] += gated
+                    m.count("faces_gated", gated)
+                elif rep is not None:
+                    added += _index_duplicate(db, img_id, h, size, rep, dedup.mode, m)
+                    counts["duplicates"] += 1
+                elif prefilter is not None and not _prefilter_pass(prefilter, img, m):
+                    db.mark_scanned(img_id, prefiltered=True)
+                    counts["prefiltered"] += 1
+                    m.count("prefiltered")
+                else:
+                    dets = _extract(engine, img, frames, m)
+                    m.count("detected")
+                    if any(d.get('tiled') for d in dets):
+                        counts["images_tiled"] += 1
+                    kept = []
+                    stored = []
+                    with m.stage("db_write"):
+                        for d in dets:
+                            flags = gate.reasons(d) if gate is not None else None
+                            db.add_face(img_id, d['bbox'], d['embedding'], d.get('det_score'), flags,
+                                        kps=d.get('kps'), chip=d.get('chip'), model=model)
+                            stored.append({'bbox': d['bbox'], 'embedding': d['embedding'],
+                                           'det_score': d.get('det_score'), 'flags': flags,
+                                           'chip': d.get('chip'), 'model': model})
+                            if flags:
+                                counts["faces_gated"] += 1
+                                m.count("faces_gated")
+                                for r in flags:
+                                    m.count("gated." + r)
+                            else:
+                                kept.append(d)
+                    if dedup is not None:
+                        dedup.remember(img, img_id, stored)
+                        if h is not None:
+                            db.set_image_hash(img_id, to_signed(h))
+                    db.mark_scanned(img_id)
+                    added += len(kept)
+                    m.count("faces", len(kept))
+                    if kept and thumbs is not None:
+                        with m.stage("thumbs"):
+                            thumbs.warm(img, [d['bbox'] for d in kept])
+                counts["images"] += 1
+                m.count("images")
+            except Exception:
+                counts["errors"] += 1
+                m.count("errors")
+            if progress and (idx % progress_every == 0 or idx == total):
+                progress(idx, total, added)
+    finally:
+        if frames is not None:
+            frames.close()
+    if dedup is not None:
+        m.info["dedup"] = _dedup_report(dedup, m)
+    if prefilter is not None:
+        m.info["prefilter"] = prefilter.report(_detect_cost(m))
+    return dict(counts, faces=added)
+
+
+def _prefilter_pass(prefilter, img, m):
+    with m.stage("prefilter"):
+        return prefilter.check(img)
+
+
+def _extract(engine, img, frames, m):
+    """Detect in ``img``, taking the decoded frame from ``frames`` when prefetching."""
+    if frames is None:
+        return engine.extract_faces(img, metrics=m)
+    with m.stage("decode.wait"):
+        fr = frames.get(img)
+    if fr is None:
+        return []
+    with fr:
+        return engine.extract_faces_array(fr.array, metrics=m)
+
+
+def _index_duplicate(db, img_id, h, size, rep, mode, m):
+    """Record ``img_id`` as a burst duplicate of ``rep`` instead of detecting it."""
+    rep_id, rep_size, rep_dets = rep
+    kept = 0
+    if mode == "inherit":
+        with m.stage("db_write"):
+            for d in rep_dets:
+                db.add_face(img_id, map_bbox(d['bbox'], rep_size, size), d['embedding'],
+                            d['det_score'], d['flags'], chip=d['chip'], model=d['model'])
+                kept += 0 if d['flags'] else 1
+    db.set_image_hash(img_id, to_signed(h), duplicate_of=rep_id)
+    db.mark_scanned(img_id)
+    m.count("duplicates")
+    m.count("faces", kept)
+    return kept
+
+
+def _detect_cost(m):
+    """Mean decode+detect+embed seconds of the images that went through the engine."""
+    detect_ns = sum(st.total_ns for name, st in m.stages.items()
+                    if name in ("decode", "detect", "detect.tiles", "embed", "detect+embed"))
+    detected = m.counters.get("detected", 0)
+    return detect_ns / 1e9 / detected if detected else None
+
+
+def _dedup_report(dedup, m):
+    # detection time saved, estimated from the mean cost of the images that were detected
+    per_image = _detect_cost(m)
+    return {
+        "mode": dedup.mode,
+        "max_dist": dedup.max_dist,
+        "window_s": dedup.window_s,
+        "checked": dedup.checked,
+        "duplicates": dedup.duplicates,
+        "detections_saved_share": dedup.duplicates / max(1, dedup.checked),
+        "detect_s_saved_est": per_image * dedup.duplicates if per_image is not None else None,
+    }
+
+
+def diff_folder(db, folder, images=None):
+    """Compare the files under ``folder`` with what the DB knows about them.
+
+    Returns (removed_ids, changed, fresh): image ids whose file is gone,
+    {image_id: new_mtime} for files modified since they were indexed, and
+    the paths that need (re-)indexing: new files, changed ones and those
+    whose row was never finished (failed, interrupted or reset to unscanned).
+    """
+    if images is None:
+        images = find_images(folder, videos=True)
+    on_disk = {os.path.normcase(os.path.abspath(p)): p for p in images}
+    removed, changed, seen = [], {}, set()
+    for img_id, path, mtime, scanned in db.get_images_under(folder):
+        key = os.path.normcase(os.path.abspath(path))
+        p = on_disk.get(key)
+        if p is None:
+            removed.append(img_id)
+            continue
+        seen.add(key)
+        try:
+            mt = os.stat(p).st_mtime
+        except OSError:
+            removed.append(img_id)
+            continue
+        if mtime is None or abs(mt - mtime) > 1e-6:
+            changed[img_id] = mt
+            seen.discard(key)
+        elif not scanned:
+            seen.discard(key)
+    fresh = [p for k, p in on_disk.items() if k not in seen]
+    return removed, changed, fresh
+
+
+def apply_diff(db, removed, changed):
+    """Forget deleted files and the faces of changed ones (see ``diff_folder``)."""
+    if removed:
+        db.remove_images(removed)
+    if changed:
+        db.forget_faces(changed, mtimes=changed)
+
+
+def cluster_library(db, metrics=None, clusterer=None):
+    """Re-cluster every stored embedding and refresh cluster representatives.
+
+    Returns the number of clusters found, or None when the library has no faces.
+    """
+    m = metrics or RunMetrics(enabled=False)
+    with m.stage("cluster.load"), profiled("get_all_embeddings", kinds=("mem",)):
+        embs = db.get_all_embeddings()
+    if not embs:
+        return None
+    if clusterer is None:
+        try:
+            from backend.cluster import Clusterer
+        except ModuleNotFoundError:
+            from cluster import Clusterer
+        clusterer = Clusterer()
+    with m.stage("cluster.fit"), profiled("cluster"):
+        labels = clusterer.cluster(embs)
+    with m.stage("cluster.apply"):
+        db.apply_cluster_labels(labels)
+    with m.stage("representatives"):
+        db.update_representatives()
+    with m.stage("person_index"):
+        db.refresh_person_index()
+    n = len({int(l) for l in labels if l != -1})
+    m.count("clusters", n)
+    return n
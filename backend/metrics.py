@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# log2 latency buckets in microseconds: bucket i holds samples < 2**i us
+_N_BUCKETS = 40
+
+
+def metrics_enabled():
+    """Scan instrumentation is on unless FACEREC_METRICS is set to 0/off/false."""
+    return os.environ.get("FACEREC_METRICS", "1").strip().lower() not in ("0", "off", "false", "no")
+
+
+def report_path_for(db_path):
+    """Run reports live next to the database: ``<dbdir>/last_scan.json``."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "last_scan.json")
+
+
+def peak_rss_bytes():
+    """Process memory high-water mark, or None where it can't be read."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", None) or info.rss
+    except Exception:
+        return None
+
+
+class _Stage:
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = [0] * _N_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(_N_BUCKETS - 1, (ns // 1000).bit_length())] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th sample, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(2 ** i * 1e-6, self.max_ns / 1e9)
+        return self.max_ns / 1e9
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_s": self.total_ns / 1e9,
+            "mean_ms": self.total_ns / max(1, self.count) / 1e6,
+            "min_ms": (self.min_ns or 0) / 1e6,
+            "p50_ms": self.percentile(0.50) * 1e3,
+            "p95_ms": self.percentile(0.95) * 1e3,
+            "max_ms": self.max_ns / 1e6,
+            # non-empty log2 buckets: "<upper bound in us>": samples
+            "histogram_us": {str(2 ** i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+
+class RunMetrics:
+    """Per-stage counters and latency histograms for one indexing run.
+
+    ``with m.stage('detect'): ...`` times a block; ``m.count('faces', n)``
+    bumps a counter; ``m.gauge('queue', depth)`` tracks a current value and
+    its high-water mark. With ``enabled=False`` every call returns
+    immediately, so call sites don't need their own checks.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}  # name -> [current, high-water]
+        self.info = {}
+        self.finished = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter_ns() - t0)
+
+    def observe(self, name, ns):
+        if not self.enabled:
+            return
+        with self._lock:
+            st = self.stages.get(name)
+            if st is None:
+                st = self.stages[name] = _Stage()
+            st.add(ns)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            g = self.gauges.get(name)
+            if g is None:
+                self.gauges[name] = [value, value]
+            else:
+                g[0] = value
+                if value > g[1]:
+                    g[1] = value
+
+    def finish(self):
+        self.finished = time.perf_counter() - self._t0
+
+    def elapsed(self):
+        return self.finished if self.finished is not None else time.perf_counter() - self._t0
+
+    def rates(self):
+        dt = max(1e-9, self.elapsed())
+        return {
+            "images_per_s": self.counters.get("images", 0) / dt,
+            "faces_per_s": self.counters.get("faces", 0) / dt,
+        }
+
+    def snapshot(self):
+        with self._lock:
+            stages = {k: v.to_dict() for k, v in self.stages.items()}
+            counters = dict(self.counters)
+            gauges = {k: {"current": v[0], "max": v[1]} for k, v in self.gauges.items()}
+        rss = peak_rss_bytes()
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "elapsed_s": self.elapsed(),
+            "finished": self.finished is not None,
+            **self.rates(),
+            "counters": counters,
+            "gauges": gauges,
+            "stages": stages,
+            "peak_rss_mb": rss / 2 ** 20 if rss else None,
+            "info": dict(self.info),
+        }
+
+    def status_text(self, snap=None):
+        """One-line summary for a status bar."""
+        snap = snap or self.snapshot()
+        parts = [f"{snap['images_per_s']:.1f} img/s", f"{snap['faces_per_s']:.1f} faces/s"]
+        if snap["stages"]:
+            # the stage that has eaten the most wall time so far
+            name, st = max(snap["stages"].items(), key=lambda kv: kv[1]["total_s"])
+            parts.append(f"slowest: {name} {st['mean_ms']:.0f} ms")
+        if snap["peak_rss_mb"]:
+            parts.append(f"peak {snap['peak_rss_mb']:.0f} MB")
+        return " · ".join(parts)
+
+    def write_report(self, path):
+        if not self.enabled:
+            return None
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp, path)
+            return path
+        except OSError:
+            return None
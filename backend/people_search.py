@@ -0,0 +1,172 @@
+"""Photo search by people: ``alice and bob``, ``alice or bob``, ``alice -carol``.
+
+Queries combine people with AND (also ``&``, ``+`` or ``,``), OR (``|``)
+and NOT (``-`` in front of a name), with parentheses for grouping. AND
+binds tighter than OR. Consecutive words form one name (``Alice Smith``);
+quote a name that contains an operator word (``"Bob and Sons"``).
+Each name is resolved with ``FaceDB.match_people``: an exact label, else
+every word as a prefix of the label (FTS5). ``#12`` is cluster 12.
+
+Names become the sorted image id lists of the person index
+(``FaceDB.person_images``), and the query is evaluated as set operations
+on those arrays. NOT is relative to the photos that show anyone at all.
+"""
+import re
+
+import numpy as np
+
+_TOKEN = re.compile(r'\s*(?:(?P<quoted>"[^"]*")|(?P<op>[()&|+,-])|(?P<word>[^\s()&|+,"]+))')
+_WORD_OPS = {"and": "&", "or": "|", "not": "-"}
+
+
+def tokenize(query):
+    """[(kind, text)] with kind 'op' (one of ( ) & | -) or 'name'."""
+    out = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        m = _TOKEN.match(query, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(f"can't read the query at {query[pos:]!r}")
+        pos = m.end()
+        if m.group("quoted") is not None:
+            out.append(("name", m.group("quoted")[1:-1].strip()))
+        elif m.group("op") is not None:
+            op = m.group("op")
+            out.append(("op", "&" if op in "+," else op))
+        else:
+            word = m.group("word")
+            if word.lower() in _WORD_OPS:
+                out.append(("op", _WORD_OPS[word.lower()]))
+            elif out and out[-1][0] == "word":
+                out[-1] = ("word", out[-1][1] + " " + word)
+            else:
+                out.append(("word", word))
+    return [("name", t) if k == "word" else (k, t) for k, t in out]
+
+
+def parse(query):
+    """Parse a query into nested tuples: ('or', [...]), ('and', [...]), ('not', x), ('name', text)."""
+    tokens = tokenize(query)
+    if not tokens:
+        raise ValueError("empty query")
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def either():
+        parts = [both()]
+        while peek() == ("op", "|"):
+            take()
+            parts.append(both())
+        return parts[0] if len(parts) == 1 else ("or", parts)
+
+    def both():
+        parts = [negated()]
+        while True:
+            kind, text = peek()
+            if (kind, text) == ("op", "&"):
+                take()
+            elif not (kind == "name" or (kind, text) in (("op", "-"), ("op", "("))):
+                break
+            parts.append(negated())
+        return parts[0] if len(parts) == 1 else ("and", parts)
+
+    def negated():
+        if peek() == ("op", "-"):
+            take()
+            return ("not", negated())
+        return atom()
+
+    def atom():
+        kind, text = peek()
+        if (kind, text) == ("op", "("):
+            take()
+            inner = either()
+            if peek() != ("op", ")"):
+                raise ValueError("missing )")
+            take()
+            return inner
+        if kind == "name":
+            take()
+            if not text:
+                raise ValueError("empty name")
+            return ("name", text)
+        raise ValueError(f"expected a name, got {text!r}" if text else "query ends too early")
+
+    tree = either()
+    if pos != len(tokens):
+        raise ValueError(f"unexpected {tokens[pos][1]!r}")
+    return tree
+
+
+def resolve(db, name):
+    """[(cluster_id, label)] a query name stands for (``#12`` is cluster 12)."""
+    m = re.fullmatch(r"#\s*(\d+)", name)
+    if m:
+        return [(int(m.group(1)), None)]
+    return db.match_people(name)
+
+
+def evaluate(tree, images_of, universe):
+    """Sorted image ids for a parsed query.
+
+    images_of: name -> sorted uint32 array
+    universe: callable returning every image id NOT is taken from
+    """
+    op = tree[0]
+    if op == "name":
+        return images_of(tree[1])
+    if op == "not":
+        return np.setdiff1d(universe(), evaluate(tree[1], images_of, universe), assume_unique=True)
+    if op == "or":
+        arrays = [evaluate(t, images_of, universe) for t in tree[1]]
+        return np.unique(np.concatenate(arrays))
+    # and: intersect the positive parts smallest first, then subtract the negated ones
+    pos = sorted((evaluate(t, images_of, universe) for t in tree[1] if t[0] != "not"), key=len)
+    neg = [evaluate(t[1], images_of, universe) for t in tree[1] if t[0] == "not"]
+    ids = pos[0] if pos else universe()
+    for a in pos[1:]:
+        if not len(ids):
+            break
+        ids = np.intersect1d(ids, a, assume_unique=True)
+    for a in neg:
+        ids = np.setdiff1d(ids, a, assume_unique=True)
+    return ids
+
+
+def names_in(tree, negated=False):
+    """(name, negated) for every name in a parsed query."""
+    if tree[0] == "name":
+        return [(tree[1], negated)]
+    if tree[0] == "not":
+        return names_in(tree[1], not negated)
+    return [n for t in tree[1] for n in names_in(t, negated)]
+
+
+def search(db, query, limit=None):
+    """Photos matching a people query.
+
+    Returns a dict with 'total' (matching images), 'images' (up to ``limit``
+    result dicts with 'image_id', 'abs_path', 'bbox' and 'source_path' of a
+    face of a searched person) and 'people' ({name: [(cluster_id, label)]},
+    empty lists for names nothing matched). Raises ValueError on a bad query.
+    """
+    tree = parse(query)
+    people = {}
+    for name, _ in names_in(tree):
+        if name not in people:
+            people[name] = resolve(db, name)
+    ids = evaluate(tree, lambda n: db.person_images([c for c, _ in people[n]]), db.people_images)
+    shown = ids[:limit] if limit else ids
+    # the face shown for a photo is one of the people searched for
+    prefer = {c for name, negated in names_in(tree) if not negated for c, _ in people[name]}
+    faces = db.image_faces(shown, prefer)
+    images = [dict(faces[i], image_id=i) for i in shown.tolist() if i in faces]
+    return {"total": int(len(ids)), "images": images, "people": people}
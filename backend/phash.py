@@ -0,0 +1,126 @@
+import os
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8      # 8x8 low-frequency DCT coefficients -> 64-bit hash
+_DCT_N = 32        # hash is computed on a 32x32 grey downscale
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(_DCT_N)
+
+
+def phash(path):
+    """64-bit perceptual hash of an image file, or None if it can't be read.
+
+    JPEGs are decoded at 1/8 scale via ``draft``; the grey 32x32 downscale
+    goes through a 2-D DCT and the 8x8 lowest frequencies (minus DC) are
+    thresholded at their median. Also returns the original (w, h).
+    """
+    try:
+        img = Image.open(path)
+        size = img.size
+        if img.format == "JPEG":
+            img.draft("L", (_DCT_N * 2, _DCT_N * 2))
+        g = img.convert("L").resize((_DCT_N, _DCT_N), Image.BILINEAR)
+    except Exception:
+        return None, None
+    x = np.asarray(g, dtype=np.float32)
+    d = (_DCT @ x @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    med = np.median(d[1:])
+    bits = d > med
+    bits[0] = False
+    h = 0
+    for b in bits:
+        h = (h << 1) | int(b)
+    return h, size
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def to_signed(h):
+    """SQLite INTEGER is signed 64-bit."""
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def map_bbox(bbox, src_size, dst_size):
+    """Scale a bbox between two images of (almost) the same aspect ratio."""
+    sx = dst_size[0] / float(src_size[0])
+    sy = dst_size[1] / float(src_size[1])
+    x1, y1, x2, y2 = bbox[:4]
+    return [int(round(x1 * sx)), int(round(y1 * sy)), int(round(x2 * sx)), int(round(y2 * sy))]
+
+
+class BurstDeduper:
+    """Find near-duplicates (burst shots, HDR brackets) among recently indexed images.
+
+    Keeps the last ``history`` representatives of the current directory;
+    an image is a duplicate when its pHash is within ``max_dist`` bits of
+    one of them, its aspect ratio matches and the files' mtimes are at most
+    ``window_s`` apart. ``mode`` is 'tag' (record the duplicate, store no
+    faces) or 'inherit' (copy the representative's faces, bbox-mapped).
+    """
+    def __init__(self, max_dist=6, window_s=10.0, history=8, mode="tag"):
+        if mode not in ("tag", "inherit"):
+            raise ValueError(f"unknown dedup mode: {mode}")
+        self.max_dist = max_dist
+        self.window_s = window_s
+        self.mode = mode
+        self._dir = None
+        self._recent = deque(maxlen=history)  # (hash, mtime, size, image_id, dets)
+        self._pending = None  # (hash, mtime, size) of the last non-duplicate
+        self.checked = 0
+        self.duplicates = 0
+
+    def match(self, path):
+        """Return (hash, size, rep) where rep is (image_id, size, dets) or None.
+
+        Call ``remember`` after detecting an image that had no match.
+        """
+        self.checked += 1
+        d = os.path.dirname(path)
+        if d != self._dir:
+            self._dir = d
+            self._recent.clear()
+        self._pending = None
+        h, size = phash(path)
+        if h is None:
+            return None, None, None
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return h, size, None
+        best = None
+        for rh, rmt, rsize, rid, rdets in self._recent:
+            if abs(mtime - rmt) > self.window_s:
+                continue
+            if abs(rsize[0] / float(rsize[1]) - size[0] / float(size[1])) > 0.01:
+                continue
+            dist = hamming(h, rh)
+            if dist <= self.max_dist and (best is None or dist < best[0]):
+                best = (dist, rid, rsize, rdets)
+        if best is None:
+            self._pending = (h, mtime, size)
+            return h, size, None
+        self.duplicates += 1
+        return h, size, best[1:]
+
+    def remember(self, path, image_id, dets):
+        """Record a freshly detected image as a representative for what follows."""
+        pend = self._pending
+        if pend is None:
+            return
+        h, mtime, size = pend
+        self._pending = None
+        self._recent.append((h, mtime, size, image_id, dets))
@@ -0,0 +1,190 @@
+"""Cheap "no face here" check ahead of the full decode and detection.
+
+Most photos in a library show no face, yet each one pays for a full-size
+decode plus a detector pass. ``Prefilter.check`` looks at a small version
+of the photo first: the EXIF thumbnail when it is big enough, otherwise a
+reduced JPEG decode (libjpeg scales the DCT, so a 1/8 decode costs a
+fraction of a full one). It runs the engine's own detector on it at a
+lowered threshold, or OpenCV's bundled Haar cascade when no detector is
+available. Only when nothing at all is found is the photo skipped.
+
+It's conservative by construction: the small image is never smaller than
+what the main pass feeds the detector (``side``, the engine's det_size),
+so faces the main pass could see are still visible, and the threshold is
+below the main pass's. Photos that can't be read small, and panoramas
+(see tiling.py), always pass. ``python -m bench prefilter FOLDER`` measures
+the miss rate and time saved on a folder of fixtures.
+"""
+import io
+import struct
+import time
+
+import numpy as np
+
+EXIF = "exif"
+REDUCED = "reduced"
+
+# EXIF orientation -> PIL transpose, as ImageOps.exif_transpose does for the full image
+_ORIENT = {2: "FLIP_LEFT_RIGHT", 3: "ROTATE_180", 4: "FLIP_TOP_BOTTOM", 5: "TRANSPOSE",
+           6: "ROTATE_270", 7: "TRANSVERSE", 8: "ROTATE_90"}
+
+
+def exif_thumbnail(app1):
+    """JPEG bytes of the thumbnail in an APP1 ``Exif`` segment, or None."""
+    if not app1 or not app1.startswith(b"Exif\x00\x00"):
+        return None
+    tiff = app1[6:]
+    try:
+        end = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        ifd0 = struct.unpack_from(end + "I", tiff, 4)[0]
+        n = struct.unpack_from(end + "H", tiff, ifd0)[0]
+        ifd1 = struct.unpack_from(end + "I", tiff, ifd0 + 2 + 12 * n)[0]
+        if not ifd1:
+            return None
+        n = struct.unpack_from(end + "H", tiff, ifd1)[0]
+        tags = {}
+        for i in range(n):
+            tag, _, _, value = struct.unpack_from(end + "HHII", tiff, ifd1 + 2 + 12 * i)
+            tags[tag] = value
+        off, length = tags.get(0x0201), tags.get(0x0202)
+    except (KeyError, struct.error):
+        return None
+    if not off or not length or off + length > len(tiff):
+        return None
+    return tiff[off:off + length]
+
+
+def _oriented(im, orientation):
+    name = _ORIENT.get(orientation)
+    if name is None:
+        return im
+    from PIL import Image
+    method = getattr(getattr(Image, "Transpose", Image), name)
+    return im.transpose(method)
+
+
+def small_image(path, side):
+    """RGB array of ``path`` with a long side of at least ``side`` px, as cheaply as possible.
+
+    Returns (array, source, (w, h) of the full image), or None when the
+    file can't be opened this way.
+    """
+    from PIL import Image
+    try:
+        im = Image.open(path)
+        size = im.size
+        try:
+            orientation = im.getexif().get(0x0112)
+        except Exception:
+            orientation = None
+        if im.format == "JPEG":
+            app1 = next((data for marker, data in getattr(im, "applist", []) if marker == "APP1"
+                         and data.startswith(b"Exif")), None)
+            thumb = exif_thumbnail(app1)
+            if thumb:
+                try:
+                    t = Image.open(io.BytesIO(thumb))
+                    if max(t.size) >= side:
+                        return np.asarray(_oriented(t.convert("RGB"), orientation)), EXIF, size
+                except Exception:
+                    pass
+            # DCT-scaled decode, never below the requested size
+            im.draft("RGB", (-(-side * size[0] // max(size)), -(-side * size[1] // max(size))))
+        im = _oriented(im.convert("RGB"), orientation)
+        if max(im.size) > 2 * side:
+            im.thumbnail((2 * side, 2 * side))
+        return np.asarray(im), REDUCED, size
+    except Exception:
+        return None
+
+
+class Prefilter:
+    """Decide from a small image whether a photo can be skipped as faceless.
+
+    engine: FaceEngine whose detector is reused (None: Haar cascade)
+    side: long side the small image must have (default: engine det_size, else 480)
+    thresh: detector score that counts as "maybe a face"; kept below the
+        main pass's (0.5) so borderline faces still get the full look
+    max_shrink: photos shrunk more than this for the detector are let
+        through (tiling may find faces there the small image can't show)
+    """
+    def __init__(self, engine=None, side=None, thresh=0.3, max_shrink=16.0, haar_neighbors=2):
+        self.det = getattr(getattr(engine, "app", None), "det_model", None)
+        det_size = getattr(engine, "det_size", None)
+        self.side = side or (max(det_size) if det_size else 480)
+        self.thresh = thresh
+        self.max_shrink = max_shrink
+        self.haar_neighbors = haar_neighbors
+        self._haar = None
+        self._forward = hasattr(self.det, "forward")
+        self.checked = self.rejected = 0
+        self.by_source = {}
+        self.elapsed_s = 0.0
+
+    def check(self, path):
+        """True if ``path`` may show a face (run the full pipeline), False to skip it."""
+        t0 = time.perf_counter()
+        try:
+            return self._check(path)
+        finally:
+            self.elapsed_s += time.perf_counter() - t0
+
+    def _check(self, path):
+        got = small_image(path, self.side)
+        if got is None:
+            return True
+        img, source, (w, h) = got
+        if max(w, h) > self.max_shrink * self.side:
+            return True
+        self.checked += 1
+        self.by_source[source] = self.by_source.get(source, 0) + 1
+        if self.score(img) >= self.thresh:
+            return True
+        self.rejected += 1
+        return False
+
+    def score(self, img):
+        """Best face score in an RGB array (Haar: 1.0 for any hit, else 0.0)."""
+        if self.det is not None and self._forward:
+            try:
+                return self._scrfd(img)
+            except Exception:
+                self._forward = False  # e.g. a detector exported with a fixed input size
+        if self.det is not None:
+            bboxes, _ = self.det.detect(img, max_num=0, metric="default")
+            return float(bboxes[:, 4].max()) if len(bboxes) else 0.0
+        return self._haar_score(img)
+
+    def _scrfd(self, img):
+        # SCRFD.detect with our own threshold and input size instead of the shared model's
+        import cv2
+        h, w = img.shape[:2]
+        scale = self.side / float(max(h, w))
+        nw, nh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        size = (-(-nw // 32) * 32, -(-nh // 32) * 32)
+        det_img = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        det_img[:nh, :nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_AREA)
+        scores_list = self.det.forward(det_img, self.thresh)[0]
+        return max((float(s.max()) for s in scores_list if len(s)), default=0.0)
+
+    def _haar_score(self, img):
+        import cv2
+        if self._haar is None:
+            self._haar = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        hits = self._haar.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=self.haar_neighbors, minSize=(12, 12))
+        return 1.0 if len(hits) else 0.0
+
+    def report(self, per_image_s=None):
+        """Counters for the run report; ``per_image_s`` is the measured full decode+detect cost."""
+        saved = None
+        if per_image_s is not None:
+            saved = per_image_s * self.rejected - self.elapsed_s
+        return {
+            "checked": self.checked,
+            "skipped": self.rejected,
+            "skipped_share": self.rejected / max(1, self.checked),
+            "by_source": dict(self.by_source),
+            "prefilter_s": round(self.elapsed_s, 3),
+            "detect_s_saved_est": round(saved, 3) if saved is not None else None,
+        }
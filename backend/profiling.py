@@ -0,0 +1,243 @@
+"""Opt-in profiling hooks.
+
+Enable with the environment variable ``FACEREC_PROFILE`` or the command
+line flag ``--profile`` (both take a comma separated list of kinds):
+
+    cpu    cProfile, written as ``<name>-<stamp>.pstats`` plus a text summary
+    mem    tracemalloc before/after snapshots, top allocations as JSON
+    stack  wall-clock stack samples every 10 ms, folded (flamegraph) format
+    all    everything above; ``1`` / an empty ``--profile`` means ``cpu``
+
+Artefacts go to ``FACEREC_PROFILE_DIR`` / ``--profile-dir``, by default a
+``profiles`` folder next to faces.db. When profiling is off, ``profiled()``
+returns a shared no-op context manager.
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+ENV = "FACEREC_PROFILE"
+ENV_DIR = "FACEREC_PROFILE_DIR"
+KINDS = ("cpu", "mem", "stack")
+
+_kinds = frozenset()
+_out_dir = None
+_local = threading.local()
+_seq_lock = threading.Lock()
+_seq = [0]
+
+
+def _parse(text):
+    text = (text or "").strip().lower()
+    if not text or text in ("0", "off", "false", "no"):
+        return frozenset()
+    out = set()
+    for part in text.split(","):
+        part = part.strip()
+        if part in ("1", "on", "true", "yes"):
+            out.add("cpu")
+        elif part == "all":
+            out.update(KINDS)
+        elif part in KINDS:
+            out.add(part)
+    return frozenset(out)
+
+
+def configure(kinds=None, out_dir=None, default_dir=None):
+    """Set what to profile and where to write it.
+
+    kinds: iterable or comma string; None reads FACEREC_PROFILE
+    out_dir: artefact folder; None reads FACEREC_PROFILE_DIR, then default_dir
+    """
+    global _kinds, _out_dir
+    if kinds is None:
+        kinds = os.environ.get(ENV, "")
+    _kinds = _parse(kinds) if isinstance(kinds, str) else frozenset(k for k in kinds if k in KINDS)
+    _out_dir = out_dir or os.environ.get(ENV_DIR) or default_dir or os.path.join(os.getcwd(), "profiles")
+    return _kinds
+
+
+def configure_from_argv(argv, default_dir=None):
+    """Apply ``--profile[=kinds]`` / ``--profile-dir DIR`` and strip them from ``argv`` in place."""
+    kinds = None
+    out_dir = None
+    rest = []
+    it = iter(argv)
+    for arg in it:
+        if arg == "--profile":
+            kinds = "cpu"
+        elif arg.startswith("--profile="):
+            kinds = arg.split("=", 1)[1] or "cpu"
+        elif arg == "--profile-dir":
+            out_dir = next(it, None)
+        elif arg.startswith("--profile-dir="):
+            out_dir = arg.split("=", 1)[1]
+        else:
+            rest.append(arg)
+    argv[:] = rest
+    return configure(kinds, out_dir, default_dir)
+
+
+def enabled(kind=None):
+    return bool(_kinds) if kind is None else kind in _kinds
+
+
+def output_dir():
+    return _out_dir
+
+
+def _artefact_base(name):
+    """Path prefix shared by all artefacts of one profiled block."""
+    with _seq_lock:
+        _seq[0] += 1
+        n = _seq[0]
+    os.makedirs(_out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+    return os.path.join(_out_dir, f"{safe}-{stamp}-{os.getpid()}-{n}")
+
+
+class _Null:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval=0.01):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            parts = [f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})"
+                     for f in traceback.extract_stack(frame)]
+            key = ";".join(parts)
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class _Profiled:
+    def __init__(self, name, kinds):
+        self.name = name
+        self.kinds = kinds
+        self._prof = None
+        self._snap = None
+        self._started_tm = False
+        self._sampler = None
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        self._base = _artefact_base(self.name)
+        if "mem" in self.kinds:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._started_tm = True
+            tracemalloc.reset_peak()
+            self._snap = tracemalloc.take_snapshot()
+        if "stack" in self.kinds:
+            self._sampler = _StackSampler(threading.get_ident())
+            self._sampler.start()
+        # cProfile can't nest within one thread: the outermost block wins
+        if "cpu" in self.kinds and not getattr(_local, "cpu_active", False):
+            import cProfile
+            self._prof = cProfile.Profile()
+            _local.cpu_active = True
+            self._prof.enable()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._t0
+        try:
+            if self._prof is not None:
+                self._prof.disable()
+                _local.cpu_active = False
+                self._write_cpu()
+            if self._sampler is not None:
+                self._sampler.stop()
+                self._write_stacks(elapsed)
+            if self._snap is not None:
+                self._write_mem(elapsed)
+        except Exception:
+            # profiling must never take the app down
+            pass
+        return False
+
+    def _write_cpu(self):
+        import pstats
+        self._prof.dump_stats(self._base + ".pstats")
+        buf = io.StringIO()
+        pstats.Stats(self._prof, stream=buf).sort_stats("cumulative").print_stats(40)
+        with open(self._base + ".txt", "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+
+    def _write_stacks(self, elapsed):
+        s = self._sampler
+        with open(self._base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in sorted(s.stacks.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {n}\n")
+        # leaf-function totals, for a quick look without a flamegraph tool
+        leaves = {}
+        for stack, n in s.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + n
+        top = sorted(leaves.items(), key=lambda kv: -kv[1])[:30]
+        with open(self._base + ".stack.json", "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "elapsed_s": elapsed, "interval_s": s.interval,
+                       "samples": s.samples,
+                       "top_leaves": [{"frame": k, "samples": n, "share": n / max(1, s.samples)}
+                                      for k, n in top]}, f, indent=2)
+
+    def _write_mem(self, elapsed):
+        import tracemalloc
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        diff = after.compare_to(self._snap, "lineno")[:30]
+        if self._started_tm:
+            tracemalloc.stop()
+        with open(self._base + ".mem.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "name": self.name,
+                "elapsed_s": elapsed,
+                "traced_current_mb": current / 2 ** 20,
+                "traced_peak_mb": peak / 2 ** 20,
+                "top_growth": [{"where": str(d.traceback[0]) if d.traceback else "?",
+                                "size_diff_kb": d.size_diff / 1024,
+                                "size_kb": d.size / 1024,
+                                "count_diff": d.count_diff} for d in diff],
+            }, f, indent=2)
+
+
+def profiled(name, kinds=None):
+    """Context manager profiling the enclosed block as ``name``.
+
+    kinds: restrict to a subset of the configured kinds (e.g. ``("mem",)``).
+    """
+    active = _kinds if kinds is None else _kinds.intersection(kinds)
+    if not active:
+        return _NULL
+    return _Profiled(name, active)
+
+
+configure()
@@ -0,0 +1,84 @@
+import numpy as np
+
+# reasons stored in faces.quality_flags (comma separated) for gated faces
+SMALL = "small"
+LOW_SCORE = "low_score"
+BLURRY = "blurry"
+PROFILE = "profile"
+
+
+def sharpness(img, bbox, size=64):
+    """Variance of the Laplacian over the face box, resampled to ``size`` px.
+
+    img: RGB/BGR uint8 array; higher is sharper. Resampling to a fixed size
+    keeps the value comparable between small and large faces.
+    """
+    import cv2
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = [int(v) for v in bbox[:4]]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+    crop = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_RGB2GRAY)
+    crop = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_32F).var())
+
+
+def yaw_ratio(kps):
+    """Rough head yaw from the 5 detector landmarks (eyes, nose, mouth corners).
+
+    0 for a frontal face, towards 1 for a full profile: the nose offset from
+    the eye midpoint relative to half the inter-eye distance.
+    """
+    if kps is None or len(kps) < 3:
+        return None
+    k = np.asarray(kps, dtype=np.float32)
+    le, re, nose = k[0], k[1], k[2]
+    half = float(np.linalg.norm(re - le)) / 2.0
+    if half < 1e-3:
+        return 1.0
+    mid = (le + re) / 2.0
+    return float(min(1.0, abs(nose[0] - mid[0]) / half))
+
+
+class QualityGate:
+    """Decide which detections are worth an embedding in the index.
+
+    min_rel: shorter bbox side as a fraction of the image's shorter side
+    min_px: shorter bbox side in pixels
+    min_score: detector confidence
+    min_sharpness: Laplacian variance (see ``sharpness``); None disables
+    max_yaw: ``yaw_ratio`` above which a face counts as profile; None disables
+    Checks whose measurement is missing from the detection are skipped.
+    """
+    def __init__(self, min_rel=0.02, min_px=24, min_score=0.6, min_sharpness=None, max_yaw=None):
+        self.min_rel = min_rel
+        self.min_px = min_px
+        self.min_score = min_score
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+
+    def reasons(self, det):
+        """Return the list of failed checks for a FaceEngine detection ([] = keep)."""
+        out = []
+        x1, y1, x2, y2 = det["bbox"][:4]
+        side = min(x2 - x1, y2 - y1)
+        small = self.min_px and side < self.min_px
+        size = det.get("image_size")
+        if not small and self.min_rel and size and not det.get("tiled"):
+            # in a tiled panorama or group photo every face is small next to the frame
+            small = side < self.min_rel * min(size)
+        if small:
+            out.append(SMALL)
+        score = det.get("det_score")
+        if self.min_score and score is not None and score < self.min_score:
+            out.append(LOW_SCORE)
+        sharp = det.get("sharpness")
+        if self.min_sharpness is not None and sharp is not None and sharp < self.min_sharpness:
+            out.append(BLURRY)
+        if self.max_yaw is not None and det.get("kps") is not None:
+            yaw = yaw_ratio(det["kps"])
+            if yaw is not None and yaw > self.max_yaw:
+                out.append(PROFILE)
+        return out
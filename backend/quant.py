@@ -0,0 +1,147 @@
+import os
+import struct
+
+import numpy as np
+
+# How embeddings are stored (faces.embedding BLOB) and held for search.
+# float32 blobs are raw, as they always were; the compact formats start with
+# a 4-byte tag so old and new rows can be mixed in one database.
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+MODES = (FLOAT32, FLOAT16, INT8)
+
+_TAG_F16 = b"EMF2"
+_TAG_I8 = b"EMI8"
+_SCALE = struct.Struct("<f")
+
+
+def quantize_int8(X):
+    """Per-row symmetric int8: X ~= codes * scales[:, None]. X: (n, d) float32."""
+    X = np.asarray(X, dtype=np.float32)
+    scales = np.abs(X).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(X / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def encode(vec, mode=FLOAT32):
+    """BLOB for one embedding in storage format ``mode``."""
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    if mode == FLOAT16:
+        return _TAG_F16 + v.astype(np.float16).tobytes()
+    if mode == INT8:
+        codes, scales = quantize_int8(v[None, :])
+        return _TAG_I8 + _SCALE.pack(float(scales[0])) + codes.tobytes()
+    return v.tobytes()
+
+
+def available_memory():
+    """Bytes of RAM free for new allocations, or None if unknown."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except Exception:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def search_mode(n, dim, stored):
+    """Format for an ``n`` x ``dim`` search matrix: float32 while that fits in
+    half the free memory (it scans fastest), else the ``stored`` format."""
+    free = available_memory()
+    if free is None or n * dim * 4 <= free // 2:
+        return FLOAT32
+    return stored
+
+
+def blob_format(blob):
+    tag = bytes(blob[:4])
+    if tag == _TAG_F16 and len(blob) % 2 == 0:
+        return FLOAT16
+    if tag == _TAG_I8 and len(blob) > 8:
+        return INT8
+    return FLOAT32
+
+
+def decode(blob):
+    """float32 vector from any stored format."""
+    fmt = blob_format(blob)
+    if fmt == FLOAT16:
+        return np.frombuffer(blob, dtype=np.float16, offset=4).astype(np.float32)
+    if fmt == INT8:
+        scale = _SCALE.unpack_from(blob, 4)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=8).astype(np.float32) * scale
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class QuantizedMatrix:
+    """Search matrix of L2-normalised embeddings held as float32, float16 or int8.
+
+    Rows are appended one at a time (``add``) into pre-sized arrays, so a
+    library is loaded without ever holding a full float32 copy. ``scores``
+    widens ``BLOCK`` rows at a time into one float32 buffer (2 MiB at 512-d,
+    so it stays in cache) and scores each block with BLAS. The compact
+    formats save memory; only int8 is about as fast as float32, and float16
+    is several times slower (NumPy converts half floats in software).
+    """
+    BLOCK = 1024
+
+    def __init__(self, n, dim, mode=FLOAT32):
+        if mode not in MODES:
+            raise ValueError(f"unknown embedding mode: {mode}")
+        self.mode = mode
+        self.n = 0
+        dtype = {FLOAT32: np.float32, FLOAT16: np.float16, INT8: np.int8}[mode]
+        self.data = np.zeros((n, dim), dtype=dtype)
+        self.scales = np.ones(n, dtype=np.float32) if mode == INT8 else None
+
+    @classmethod
+    def from_array(cls, X, mode=FLOAT32):
+        X = np.asarray(X, dtype=np.float32)
+        qm = cls(len(X), X.shape[1] if X.ndim == 2 else 0, mode)
+        if len(X) and mode == INT8:
+            qm.data[:], qm.scales[:] = quantize_int8(X)
+        elif len(X):
+            qm.data[:] = X
+        qm.n = len(X)
+        return qm
+
+    def add(self, vec):
+        v = np.asarray(vec, dtype=np.float32)
+        if self.mode == INT8:
+            codes, scales = quantize_int8(v[None, :])
+            self.data[self.n] = codes[0]
+            self.scales[self.n] = scales[0]
+        else:
+            self.data[self.n] = v
+        self.n += 1
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def nbytes(self):
+        return self.data[:self.n].nbytes + (self.scales[:self.n].nbytes if self.scales is not None else 0)
+
+    def scores(self, q):
+        """Approximate dot products of every row with the float32 vector ``q``."""
+        q = np.asarray(q, dtype=np.float32)
+        if self.mode == FLOAT32:
+            return self.data[:self.n] @ q
+        out = np.empty(self.n, dtype=np.float32)
+        # one buffer per call, reused for every block (calls may come from several threads).
+        # int8 rows are widened too: NumPy has no integer BLAS, and int32 accumulation
+        # measured 2-3x slower than this
+        buf = np.empty((min(self.BLOCK, self.n), self.data.shape[1]), dtype=np.float32)
+        for s in range(0, self.n, self.BLOCK):
+            e = min(self.n, s + self.BLOCK)
+            block = buf[:e - s]
+            np.copyto(block, self.data[s:e])
+            np.dot(block, q, out=out[s:e])
+        if self.scales is not None:
+            out *= self.scales[:self.n]
+        return out
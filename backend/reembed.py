@@ -0,0 +1,67 @@
+try:
+    from backend.face_engine import decode_image, decode_chip
+    from backend.metrics import RunMetrics
+except ModuleNotFoundError:
+    from face_engine import decode_image, decode_chip
+    from metrics import RunMetrics
+
+
+def reembed(db, engine, batch_size=64, metrics=None, should_stop=None, progress=None):
+    """Redo the embeddings of every face not made by ``engine.model_version``.
+
+    Only the recognition model runs: faces with a stored chip are embedded
+    from it directly; faces with only landmarks are re-aligned from their
+    source image (decoded once per image in a batch). Faces with neither
+    need a full re-index and are left alone. Each batch is committed with
+    its model tag, so an interrupted run picks up where it stopped.
+    progress: optional callable(done, total_estimate, failed)
+    Returns dict with 'reembedded', 'from_chip', 'from_image', 'failed'.
+    """
+    m = metrics or RunMetrics(enabled=False)
+    model = engine.model_version
+    total = sum(n for mod, n in db.model_stats()["by_model"].items() if mod != model)
+    done = from_chip = from_image = failed = 0
+    last_id = 0
+    while not (should_stop and should_stop()):
+        with m.stage("db_read"):
+            rows = db.faces_to_reembed(model, after_id=last_id, limit=batch_size)
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        ids, chips = [], []
+        src_cache = {}
+        for fid, chip, kps, src in rows:
+            try:
+                if chip is not None:
+                    with m.stage("chip_decode"):
+                        img = decode_chip(chip)
+                    if img is not None:
+                        from_chip += 1
+                else:
+                    if src not in src_cache:
+                        with m.stage("decode"):
+                            src_cache[src] = decode_image(src)
+                    full = src_cache[src]
+                    img = None
+                    if full is not None:
+                        with m.stage("align"):
+                            img = engine.align(full, kps)
+                        from_image += 1
+            except Exception:
+                img = None
+            if img is None:
+                failed += 1
+                continue
+            ids.append(fid)
+            chips.append(img)
+        if chips:
+            with m.stage("embed"):
+                E = engine.embed_chips(chips)
+            with m.stage("db_write"):
+                db.set_embeddings(zip(ids, E), model)
+        done += len(ids)
+        m.count("faces", len(ids))
+        if progress:
+            progress(done + failed, total, failed)
+    m.count("failed", failed)
+    return {"reembedded": done, "from_chip": from_chip, "from_image": from_image, "failed": failed}
@@ -0,0 +1,291 @@
+"""Priority job scheduler shared by the GUIs.
+
+Interactive work (Quick Find, search) comes first, incremental indexing
+next, reclustering and other maintenance last. Jobs run on their own
+threads, at most ``slots`` at a time, but a job that outranks everything
+running always starts at once. Lower-priority jobs yield at their
+checkpoints (``job.should_stop()``, polled between images) while a
+higher-priority one runs: "pause" waits until it is done, "throttle" keeps
+them going at a fraction of their speed (``FACEREC_PREEMPT``). Because
+preempted jobs stop between images, jobs can share one FaceEngine
+(``job.engine()``) without fighting over it.
+
+Listeners are called from worker threads on every change; GUIs hop to
+their own thread from there and read ``jobs()`` for the queue view.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+INTERACTIVE, INDEX, MAINTENANCE = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", INDEX: "indexing", MAINTENANCE: "maintenance"}
+
+QUEUED, RUNNING, PAUSED = "queued", "running", "paused"
+DONE, CANCELLED, FAILED = "done", "cancelled", "failed"
+
+
+class Job:
+    """One unit of work: ``fn(job)`` runs on a scheduler thread.
+
+    ``fn`` should poll ``should_stop()`` between items and report through
+    ``set_progress``; its return value ends up in ``result``.
+    """
+    def __init__(self, scheduler, job_id, name, priority, fn, on_done=None, key=None):
+        self.scheduler = scheduler
+        self.id = job_id
+        self.name = name
+        self.priority = priority
+        self.fn = fn
+        self.on_done = on_done
+        self.key = key
+        self.state = QUEUED
+        self.done = self.total = 0
+        self.text = ""
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+        self.paused_s = 0.0
+        self._cancel = threading.Event()
+        self._last = None  # perf_counter of the last checkpoint
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING, PAUSED)
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def engine(self):
+        """The scheduler's shared FaceEngine (None if it can't be built)."""
+        return self.scheduler.engine()
+
+    def should_stop(self):
+        """Checkpoint: yields to higher-priority jobs, then True once the job is cancelled.
+
+        Fits ``index_folder(..., should_stop=job.should_stop)``.
+        """
+        self.scheduler._yield(self)
+        return self._cancel.is_set()
+
+    def set_progress(self, done, total, text=None):
+        self.done, self.total = done, total
+        if text is not None:
+            self.text = text
+        self.scheduler._notify()
+
+    def snapshot(self):
+        return {"id": self.id, "name": self.name, "priority": self.priority,
+                "priority_name": PRIORITY_NAMES.get(self.priority, str(self.priority)),
+                "state": self.state, "done": self.done, "total": self.total, "text": self.text,
+                "error": str(self.error) if self.error else None, "paused_s": round(self.paused_s, 1)}
+
+
+class Scheduler:
+    """Runs submitted jobs by priority (lower number first, FIFO within one).
+
+    slots: jobs running at once; one that outranks all running jobs starts anyway
+    preempt: "pause" or "throttle" (default $FACEREC_PREEMPT or pause)
+    throttle: in throttle mode, outranked jobs sleep this many times as long
+        as they worked since their last checkpoint (3.0: about a quarter speed)
+    engine: callable building the FaceEngine the jobs share, called once
+    keep: finished jobs kept for the queue view
+    """
+    def __init__(self, slots=2, preempt=None, throttle=3.0, engine=None, keep=20):
+        self.slots = max(1, slots)
+        self.preempt = (preempt or os.environ.get("FACEREC_PREEMPT") or "pause").lower()
+        self.throttle = throttle
+        self.keep = keep
+        self._engine_factory = engine
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._queue = []    # heap of (priority, id, job)
+        self._running = []
+        self._finished = []
+        self._listeners = []
+        self._ids = itertools.count(1)
+
+    # ---------- shared resources ----------
+    def engine(self):
+        with self._engine_lock:
+            if self._engine is None and self._engine_factory is not None:
+                try:
+                    self._engine = self._engine_factory()
+                except Exception:
+                    self._engine = None
+            return self._engine
+
+    def subscribe(self, fn):
+        """Call ``fn()`` (from any thread) whenever a job is queued, changes state or reports progress."""
+        self._listeners.append(fn)
+
+    def unsubscribe(self, fn):
+        try:
+            self._listeners.remove(fn)
+        except ValueError:
+            pass
+
+    def _notify(self):
+        for fn in list(self._listeners):
+            try:
+                fn()
+            except Exception:
+                pass
+
+    # ---------- queue ----------
+    def submit(self, name, fn, priority=INDEX, on_done=None, key=None):
+        """Queue ``fn(job)``; returns the Job.
+
+        on_done: called with the job from its thread once it ends (also when
+            cancelled before it started)
+        key: while a job with the same key is still queued, return that one
+            instead of queueing another (e.g. one pending recluster)
+        """
+        with self._cond:
+            if key is not None:
+                for _, _, queued in self._queue:
+                    if queued.key == key:
+                        return queued
+            job = Job(self, next(self._ids), name, priority, fn, on_done, key)
+            heapq.heappush(self._queue, (priority, job.id, job))
+            self._dispatch()
+        self._notify()
+        return job
+
+    def _dispatch(self):
+        # with self._cond held
+        while self._queue:
+            job = self._queue[0][2]
+            top = min((r.priority for r in self._running), default=None)
+            if len(self._running) >= self.slots and (top is None or job.priority >= top):
+                break
+            heapq.heappop(self._queue)
+            job.state = RUNNING
+            job.started = time.time()
+            self._running.append(job)
+            threading.Thread(target=self._run, args=(job,), name=f"job-{job.id}", daemon=True).start()
+        # running jobs may now be outranked (or no longer)
+        self._cond.notify_all()
+
+    def _run(self, job):
+        try:
+            job.result = job.fn(job)
+            job.state = CANCELLED if job.cancelled else DONE
+        except Exception as e:
+            job.error = e
+            job.state = CANCELLED if job.cancelled else FAILED
+        job.finished = time.time()
+        with self._cond:
+            self._running.remove(job)
+            self._retire(job)
+            self._dispatch()
+        self._ended(job)
+
+    def _retire(self, job):
+        self._finished.append(job)
+        del self._finished[:-self.keep]
+
+    def _ended(self, job):
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                pass
+        self._notify()
+
+    def cancel(self, job):
+        """Cancel a queued job, or ask a running one to stop at its next checkpoint."""
+        dropped = False
+        with self._cond:
+            job._cancel.set()
+            if job.state == QUEUED:
+                self._queue = [e for e in self._queue if e[2] is not job]
+                heapq.heapify(self._queue)
+                job.state = CANCELLED
+                job.finished = time.time()
+                self._retire(job)
+                dropped = True
+            self._cond.notify_all()
+        if dropped:
+            self._ended(job)
+        else:
+            self._notify()
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            self.cancel(job)
+
+    def get(self, job_id):
+        with self._cond:
+            for job in itertools.chain(self._running, (e[2] for e in self._queue), self._finished):
+                if job.id == job_id:
+                    return job
+        return None
+
+    def active_jobs(self):
+        """Running and paused jobs by priority, then queued ones in the order they'll start."""
+        with self._cond:
+            running = sorted(self._running, key=lambda j: (j.priority, j.id))
+            return running + [e[2] for e in sorted(self._queue)]
+
+    def foreground(self):
+        """The highest-priority job that's actually running (not paused), or None."""
+        return next((j for j in self.active_jobs() if j.state == RUNNING), None)
+
+    def jobs(self):
+        """Snapshots for a queue view: active jobs first, then the latest finished ones."""
+        active = self.active_jobs()
+        with self._cond:
+            finished = list(reversed(self._finished))
+        return [j.snapshot() for j in active + finished]
+
+    def wait(self, job, timeout=None):
+        """Block until ``job`` has ended; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while job.active:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def shutdown(self, timeout=None):
+        """Cancel everything and wait (up to ``timeout`` s) for running jobs to stop."""
+        self.cancel_all()
+        for job in self.active_jobs():
+            self.wait(job, timeout)
+
+    # ---------- preemption ----------
+    def _outranked(self, job):
+        return any(r.priority < job.priority for r in self._running)
+
+    def _yield(self, job):
+        now = time.perf_counter()
+        worked = now - job._last if job._last is not None else 0.0
+        if self.preempt == "throttle":
+            with self._cond:
+                if self._outranked(job) and not job.cancelled:
+                    self._cond.wait(min(1.0, worked * self.throttle))
+        else:
+            with self._cond:
+                paused = self._outranked(job) and not job.cancelled
+                if paused:
+                    job.state = PAUSED
+            if paused:
+                # listeners may call back into the scheduler: never notify with the lock held
+                self._notify()
+                with self._cond:
+                    while self._outranked(job) and not job.cancelled:
+                        self._cond.wait(0.5)
+                    job.state = RUNNING
+                    job.paused_s += time.perf_counter() - now
+                self._notify()
+        job._last = time.perf_counter()
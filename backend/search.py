@@ -0,0 +1,80 @@
+import numpy as np
+
+
+def normalize(v):
+    """L2-normalise a vector (float32); zero vectors are returned unchanged."""
+    v = np.asarray(v, dtype=np.float32)
+    n = float(np.sqrt((v * v).sum()))
+    return v / n if n > 1e-8 else v
+
+
+def score_faces(ref, dets):
+    """Cosine similarity of every detection's embedding to ``ref``.
+
+    dets: list of dicts with an 'embedding' (as returned by FaceEngine)
+    Returns a float32 array aligned with ``dets``.
+    """
+    if not dets:
+        return np.zeros(0, dtype=np.float32)
+    r = normalize(ref)
+    E = np.vstack([np.asarray(d["embedding"], dtype=np.float32) for d in dets])
+    norms = np.sqrt((E * E).sum(axis=1))
+    norms[norms < 1e-8] = 1e-8
+    return (E @ r) / norms
+
+
+def best_match(ref, dets):
+    """Return (similarity, det) for the detection most similar to ``ref``,
+    or (None, None) when there are no detections."""
+    sims = score_faces(ref, dets)
+    if not len(sims):
+        return None, None
+    i = int(np.argmax(sims))
+    return float(sims[i]), dets[i]
+
+
+def top_k(ref, X, k=50, min_sim=None):
+    """Indices and similarities of the ``k`` rows of ``X`` most similar to ``ref``.
+
+    X: (n, d) float32 matrix of L2-normalised embeddings
+    Returns (idx, sims) sorted by descending similarity, filtered by ``min_sim``.
+    """
+    if X is None or not len(X):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    sims = X @ normalize(ref)
+    k = min(k, len(sims)) if k else len(sims)
+    # partial sort: O(n) selection, then order only the winners
+    idx = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+    idx = idx[np.argsort(-sims[idx], kind="stable")]
+    if min_sim is not None:
+        idx = idx[sims[idx] >= min_sim]
+    return idx, sims[idx]
+
+
+def top_k_quantized(ref, qm, k=50, min_sim=None, exact=None, rerank=4, margin=0.02):
+    """``top_k`` over a QuantizedMatrix, re-ranked at full precision.
+
+    The compact matrix is scanned for ``k * rerank`` candidates (and a
+    ``margin`` below ``min_sim``, which quantisation error can't cross);
+    ``exact(idx)`` returns their float32 rows, whose scores decide the
+    final order. Without ``exact`` the approximate scores are returned.
+    """
+    if qm is None or not len(qm):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    r = normalize(ref)
+    approx = qm.scores(r)
+    n = len(approx)
+    c = min(n, k * rerank) if k else n
+    idx = np.argpartition(-approx, c - 1)[:c] if c < n else np.arange(n)
+    if min_sim is not None:
+        idx = idx[approx[idx] >= min_sim - margin]
+    if exact is not None and qm.mode != "float32" and len(idx):
+        sims = np.asarray(exact(idx), dtype=np.float32) @ r
+    else:
+        sims = approx[idx]
+    order = np.argsort(-sims, kind="stable")[:k or None]
+    idx, sims = idx[order], sims[order]
+    if min_sim is not None:
+        keep = sims >= min_sim
+        idx, sims = idx[keep], sims[keep]
+    return idx, sims
@@ -0,0 +1,337 @@
+"""Decode images in worker processes into a shared-memory ring of frames.
+
+Pickling a decoded 24 MP RGB array to another process costs more than the
+decode. Here worker processes decode at full resolution straight into
+fixed-size slots of one ``multiprocessing.shared_memory`` block; only
+``(seq, path, slot)`` tasks and small ``(h, w)`` results travel through
+the pipes, and the consumer gets each frame as a NumPy view of its slot,
+without a copy. Frames are pixel for pixel what inline decoding gives: an
+image larger than a slot (``max_pixels``) is decoded again by the consumer
+rather than downscaled.
+
+Slot ownership is passed by message: the consumer hands a free slot out
+with every task and gets it back when it releases the frame, so a decoder
+never waits for a slot and frames can't be overwritten while in use.
+Tasks are dispatched in path order and frames are consumed in that order;
+getting a later path releases any earlier one that was skipped. Each
+decoder has its own pipe (no shared queue lock a crash could leave held):
+one that dies is replaced, the file it was on counts as unreadable and
+its other tasks are re-sent; after repeated crashes the consumer decodes
+by itself. ``close`` (also on cancellation or
+error) stops the workers and unlinks the block.
+"""
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+def _attach(name):
+    from multiprocessing import shared_memory
+    try:
+        # 3.13+: the creating process alone owns the segment's lifetime
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def decode_into(path, buf, offset, slot_bytes):
+    """Decode ``path`` as RGB into ``buf`` at ``offset``, as ``decode_image`` would.
+
+    Returns (h, w, fits): ``fits`` is False (and nothing is written) when the
+    image needs more than ``slot_bytes``. None if the file can't be read.
+    """
+    import cv2
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if h * w * 3 > slot_bytes:
+        return h, w, False
+    view = np.ndarray((h, w, 3), dtype=np.uint8, buffer=buf, offset=offset)
+    cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=view)
+    del view
+    return h, w, True
+
+
+def _decode_local(path):
+    import cv2
+    img = cv2.imread(path)
+    return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def _decoder(conn, shm_name, slot_bytes):
+    try:
+        import cv2
+        cv2.setNumThreads(1)  # one decode per process; the processes are the parallelism
+    except ImportError:
+        pass
+    shm = _attach(shm_name)
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+            seq, path, slot = task
+            try:
+                meta = decode_into(path, shm.buf, slot * slot_bytes, slot_bytes)
+            except Exception:
+                meta = None
+            conn.send((seq, meta))
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass  # consumer went away
+    finally:
+        shm.close()
+
+
+class Frame:
+    """A decoded image living in a ring slot; release it (or use ``with``) when done."""
+    __slots__ = ("array", "_ring", "_seq")
+
+    def __init__(self, array, ring, seq):
+        self.array = array    # (h, w, 3) uint8 RGB view of the slot (own memory for oversized images)
+        self._ring = ring
+        self._seq = seq
+
+    def release(self):
+        if self._ring is not None:
+            self.array = None
+            self._ring._release(self._seq)
+            self._ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Worker:
+    __slots__ = ("proc", "conn", "seqs")
+
+    def __init__(self, proc, conn):
+        self.proc = proc
+        self.conn = conn
+        self.seqs = []  # tasks sent and not answered, in order
+
+
+class FrameRing:
+    """Prefetch ``paths`` with ``workers`` decoder processes into ``slots`` shared slots.
+
+    ``get(path)`` blocks until that image is decoded and returns a Frame, or
+    None when it couldn't be read. Slots hold ``max_pixels`` (default 4096 x
+    3072); larger images are decoded in this process when their turn comes.
+    """
+    PER_WORKER = 2      # tasks queued on one decoder at a time
+    MAX_RESTARTS = 8    # decoder crashes tolerated before decoding in this process
+
+    def __init__(self, paths, workers=2, slots=None, max_pixels=4096 * 3072, metrics=None):
+        from multiprocessing import shared_memory
+        self.paths = list(paths)
+        self._index = {p: i for i, p in enumerate(self.paths)}
+        self.slot_bytes = max_pixels * 3
+        workers = max(1, workers)
+        # every decoder kept busy, plus the frame the consumer is working on
+        self.n_slots = slots or workers * self.PER_WORKER + 1
+        self.metrics = metrics
+        self._ctx = mp.get_context("spawn")  # no fork: onnxruntime threads live in this process
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.n_slots)
+        self._free = list(range(self.n_slots))
+        self._next = 0            # next seq to dispatch
+        self._cursor = 0          # seqs below this were handed out or skipped
+        self._slot_of = {}        # seq -> slot, dispatched and not yet released
+        self._meta = {}           # seq -> decode result waiting to be consumed
+        self._abandoned = set()   # skipped while still being decoded
+        self._workers = []
+        self.remote = self.fallback = self.restarts = self.crashed = self.oversized = 0
+        try:
+            for _ in range(workers):
+                self._workers.append(self._spawn())
+            self._dispatch()
+        except Exception:
+            self.close()
+            raise
+
+    def _spawn(self):
+        ours, theirs = self._ctx.Pipe()
+        p = self._ctx.Process(target=_decoder, name="facerec-decode", daemon=True,
+                              args=(theirs, self._shm.name, self.slot_bytes))
+        p.start()
+        theirs.close()  # so a dead decoder shows up as EOF on ours
+        return _Worker(p, ours)
+
+    def _send(self, w, seq):
+        w.seqs.append(seq)
+        w.conn.send((seq, self.paths[seq], self._slot_of[seq]))
+
+    def _dispatch(self):
+        while self._free and self._next < len(self.paths):
+            w = min(self._workers, key=lambda w: len(w.seqs), default=None)
+            if w is None or len(w.seqs) >= self.PER_WORKER:
+                break
+            seq = self._next
+            self._next += 1
+            self._slot_of[seq] = self._free.pop()
+            try:
+                self._send(w, seq)
+            except OSError:
+                self._replace(w)
+        if self.metrics is not None:
+            self.metrics.gauge("ring_slots_busy", self.n_slots - len(self._free))
+
+    def _release(self, seq):
+        slot = self._slot_of.pop(seq, None)
+        self._meta.pop(seq, None)
+        if slot is not None:
+            self._free.append(slot)
+            self._dispatch()
+
+    def _skip(self, seq):
+        if seq in self._meta or seq not in self._slot_of:
+            self._release(seq)
+        else:
+            # still being decoded: free the slot when the result comes in
+            self._abandoned.add(seq)
+
+    def _result(self, seq, meta):
+        if seq in self._abandoned:
+            self._abandoned.discard(seq)
+            self._release(seq)
+        elif seq in self._slot_of:
+            self._meta[seq] = meta
+
+    def _pump(self, timeout):
+        from multiprocessing.connection import wait
+        conns = {w.conn: w for w in self._workers}
+        for conn in wait(list(conns), timeout):
+            w = conns[conn]
+            try:
+                seq, meta = conn.recv()
+            except (EOFError, OSError):
+                self._replace(w)
+                continue
+            if seq in w.seqs:
+                w.seqs.remove(seq)
+            self.remote += 1
+            self._result(seq, meta)
+        self._dispatch()
+
+    def _replace(self, w):
+        """A decoder died: start another and hand it the dead one's tasks."""
+        if w not in self._workers:
+            return
+        self._workers.remove(w)
+        w.conn.close()
+        w.proc.join(0.1)
+        self.restarts += 1
+        if w.seqs:
+            # the file it was decoding is what killed it: treat as unreadable, don't retry
+            self.crashed += 1
+            self._result(w.seqs[0], None)
+        lost = [s for s in w.seqs[1:] if s in self._slot_of]
+        if self.restarts <= self.MAX_RESTARTS:
+            nw = self._spawn()
+            self._workers.append(nw)
+            for seq in lost:
+                self._send(nw, seq)
+        else:
+            for seq in lost:
+                self._result(seq, self._decode_here(seq))
+
+    def _decode_here(self, seq):
+        self.fallback += 1
+        try:
+            return decode_into(self.paths[seq], self._shm.buf, self._slot_of[seq] * self.slot_bytes, self.slot_bytes)
+        except Exception:
+            return None
+
+    def get(self, path, poll=1.0):
+        seq = self._index[path]
+        if seq < self._cursor:
+            return None  # handed out or skipped already
+        # earlier paths the caller passed over are never decoded (or freed if they were)
+        self._next = max(self._next, seq)
+        for s in range(self._cursor, seq):
+            self._skip(s)
+        self._cursor = seq + 1
+        self._dispatch()
+        while seq not in self._slot_of and self._abandoned and self._workers:
+            self._pump(poll)  # skipped frames still decoding hand their slots back
+        if seq not in self._slot_of:
+            if not self._workers:
+                # every decoder given up on
+                self._slot_of[seq] = self._free.pop()
+                self._next = max(self._next, seq + 1)
+                self._meta[seq] = self._decode_here(seq)
+            else:
+                raise RuntimeError("every ring slot is held by an unreleased Frame")
+        while seq not in self._meta:
+            self._pump(poll)
+        meta = self._meta.pop(seq)
+        if meta is None:
+            self._release(seq)
+            return None
+        h, w, fits = meta
+        if not fits:
+            # bigger than a slot: full resolution matters more than the prefetch
+            self._release(seq)
+            self.oversized += 1
+            try:
+                img = _decode_local(self.paths[seq])
+            except Exception:
+                img = None
+            return Frame(img, None, seq) if img is not None else None
+        view = np.ndarray((h, w, 3), dtype=np.uint8, buffer=self._shm.buf,
+                          offset=self._slot_of[seq] * self.slot_bytes)
+        return Frame(view, self, seq)
+
+    def close(self, timeout=5.0):
+        for w in self._workers:
+            try:
+                w.conn.send(None)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for w in self._workers:
+            w.proc.join(max(0.0, deadline - time.monotonic()))
+            if w.proc.is_alive():
+                w.proc.terminate()
+                w.proc.join(1.0)
+            w.conn.close()
+        self._workers = []
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # a Frame view is still referenced; the mapping goes with the process
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        if self.metrics is not None:
+            self.metrics.count("decoded_remote", self.remote)
+            self.metrics.count("decode_fallback", self.fallback)
+            self.metrics.count("decoder_restarts", self.restarts)
+            self.metrics.count("decode_crashed", self.crashed)
+            self.metrics.count("decoded_oversized", self.oversized)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def default_workers():
+    """Decoder processes worth starting: leave a couple of cores to inference."""
+    return max(1, min(8, (os.cpu_count() or 2) - 2))
+
+
+def workers_from_env():
+    """``FACEREC_DECODERS``: a process count, ``auto`` for ``default_workers()``, unset/0 for inline decoding."""
+    val = os.environ.get("FACEREC_DECODERS", "").strip().lower()
+    if val == "auto":
+        return default_workers()
+    try:
+        return max(0, int(val or 0))
+    except ValueError:
+        return 0
@@ -0,0 +1,103 @@
+"""Fast GUI start-up: background engine warm-up and start-up timing.
+
+The GUIs show their window first and build the FaceEngine (insightface,
+onnxruntime, cv2 and the ONNX models) on a background thread right after.
+
+With ``FACEREC_STARTUP_REPORT=<path>`` set, a GUI records when its window
+was shown and when the engine was ready, writes them to ``<path>`` as JSON
+(seconds since ``FACEREC_STARTUP_T0``, the launcher's ``time.time()``, or
+since this module was imported) and quits. ``python -m bench startup``
+drives this for the scripts and the PyInstaller build.
+"""
+import json
+import os
+import threading
+import time
+
+_IMPORTED = time.time()
+_marks = {}
+
+
+def report_path():
+    return os.environ.get("FACEREC_STARTUP_REPORT") or None
+
+
+def _t0():
+    try:
+        return float(os.environ["FACEREC_STARTUP_T0"])
+    except (KeyError, ValueError):
+        return _IMPORTED
+
+
+def mark(name):
+    """Record the first time ``name`` happened (no-op without a report path)."""
+    if report_path() and name not in _marks:
+        _marks[name] = round(time.time() - _t0(), 4)
+
+
+def write_report(**extra):
+    """Write the recorded marks to the report path; returns True if one was requested."""
+    path = report_path()
+    if not path:
+        return False
+    doc = dict(_marks, **extra)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return True
+
+
+def _default_factory():
+    try:
+        from backend.face_engine import FaceEngine
+    except ModuleNotFoundError:
+        from face_engine import FaceEngine
+    return FaceEngine()
+
+
+class EngineWarmup:
+    """Build the FaceEngine on a daemon thread.
+
+    ``on_done(engine, error)`` is called from that thread once loading ends
+    (GUIs hop to their own thread from there). ``wait()`` blocks until the
+    engine is ready and returns it, or None if loading failed.
+    """
+    def __init__(self, factory=None, on_done=None):
+        self.factory = factory or _default_factory
+        self.on_done = on_done
+        self.engine = None
+        self.error = None
+        self.elapsed_s = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="engine-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            self.engine = self.factory()
+        except Exception as e:
+            self.error = e
+        self.elapsed_s = time.perf_counter() - t0
+        mark("engine_ready_s" if self.error is None else "engine_failed_s")
+        self._done.set()
+        if self.on_done is not None:
+            self.on_done(self.engine, self.error)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self.start()
+        self._done.wait(timeout)
+        return self.engine
@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+try:
+    from backend.utils import render_face_crops
+except ModuleNotFoundError:
+    from utils import render_face_crops
+
+# Size rendered at index time; smaller requests are derived from it so a
+# cache hit never has to touch the original photo.
+BASE_SIZE = 160
+# Part of every key; bump when rendering changes so old thumbnails are redone.
+RENDER_VERSION = 2
+
+
+class ThumbCache:
+    """On-disk face thumbnail cache shared by the Tk and Qt frontends.
+
+    Entries are content addressed: the key is a hash of the source path,
+    its mtime and size, the face bbox (upright coordinates, as stored by the
+    indexer) and the thumbnail size, so editing or replacing a photo
+    naturally invalidates its thumbnails. The cache is
+    bounded by ``max_bytes`` and evicts least-recently-used files first.
+    """
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024, quality: int = 85):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.lock = threading.Lock()
+        self._index = None  # OrderedDict key -> file size, oldest first
+        self._total = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    # ---------- Keys ----------
+    def key(self, abs_path: str, bbox, size: int):
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            return None
+        bbox = [int(v) for v in bbox]
+        raw = json.dumps([RENDER_VERSION, os.path.abspath(abs_path), st.st_mtime_ns, st.st_size, bbox, int(size)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".jpg")
+
+    # ---------- LRU bookkeeping ----------
+    def _load_index(self):
+        if self._index is not None:
+            return
+        entries = []
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(".jpg"):
+                    st = e.stat()
+                    entries.append((st.st_mtime, e.name[:-4], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((k, sz) for _, k, sz in entries)
+        self._total = sum(self._index.values())
+
+    def _touch(self, key: str):
+        self._index.move_to_end(key)
+        try:
+            os.utime(self._file(key), None)
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        # trim to 90% so we don't evict on every single insert
+        target = int(self.max_bytes * 0.9)
+        while self._index and self._total > target:
+            key, sz = self._index.popitem(last=False)
+            self._total -= sz
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+
+    # ---------- Public API ----------
+    def lookup(self, key: str):
+        """Return the cached thumbnail for ``key`` or None."""
+        if key is None:
+            return None
+        with self.lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            self._touch(key)
+        try:
+            with Image.open(self._file(key)) as im:
+                return im.convert("RGB")
+        except Exception:
+            with self.lock:
+                sz = self._index.pop(key, 0)
+                self._total -= sz
+            return None
+
+    def store(self, key: str, thumb: Image.Image):
+        if key is None:
+            return
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        try:
+            thumb.convert("RGB").save(tmp, "JPEG", quality=self.quality)
+            os.replace(tmp, path)
+            sz = os.path.getsize(path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self.lock:
+            self._load_index()
+            old = self._index.pop(key, 0)
+            self._index[key] = sz
+            self._total += sz - old
+            self._evict()
+
+    def get(self, abs_path: str, bbox, size: int = BASE_SIZE):
+        """Return a face thumbnail (PIL RGB image), rendering it on a miss.
+
+        Sizes below ``BASE_SIZE`` are derived from the base thumbnail when it
+        is cached, so the original image is only decoded once per face.
+        """
+        key = self.key(abs_path, bbox, size)
+        if key is None:
+            return None
+        thumb = self.lookup(key)
+        if thumb is not None:
+            return thumb
+        if size < BASE_SIZE:
+            base = self.lookup(self.key(abs_path, bbox, BASE_SIZE))
+            if base is not None:
+                base.thumbnail((size, size))
+                self.store(key, base)
+                return base
+        thumb = render_face_crops([(abs_path, bbox)], size=size)[0]
+        if thumb is None:
+            return None
+        self.store(key, thumb)
+        return thumb
+
+    def warm(self, abs_path: str, bboxes, sizes=(BASE_SIZE,)):
+        """Pre-render thumbnails for all faces of one image (index time).
+
+        The original is decoded once no matter how many faces it holds (see
+        ``render_face_crops``).
+        Returns the number of thumbnails written.
+        """
+        todo = []
+        for bbox in bboxes:
+            for size in sizes:
+                key = self.key(abs_path, bbox, size)
+                if key is None:
+                    return 0
+                if not os.path.exists(self._file(key)):
+                    todo.append((key, bbox, size))
+        n = 0
+        for size in sorted({t[2] for t in todo}):
+            group = [t for t in todo if t[2] == size]
+            crops = render_face_crops([(abs_path, t[1]) for t in group], size=size)
+            for (key, _, _), thumb in zip(group, crops):
+                if thumb is not None:
+                    self.store(key, thumb)
+                    n += 1
+        return n
+
+    def stats(self):
+        with self.lock:
+            self._load_index()
+            return {"entries": len(self._index), "bytes": self._total, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self.lock:
+            self._load_index()
+            for key in list(self._index):
+                try:
+                    os.remove(self._file(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._total = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_thumb_cache(root: str, **kwargs) -> ThumbCache:
+    """Return the process-wide cache for ``root`` so all windows share one LRU."""
+    root = os.path.abspath(root)
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = ThumbCache(root, **kwargs)
+        return cache
+
+
+def thumb_dir_for(db_path: str) -> str:
+    """Default cache location: a ``thumbs`` folder next to ``faces.db``."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "thumbs")
@@ -0,0 +1,131 @@
+"""Tiled detection for panoramas and group photos.
+
+The detector sees every photo shrunk to ``det_size``: a 12,000 px panorama
+at 480 px leaves faces a few pixels wide. ``Tiler`` decides when a second,
+tiled pass is worth it (the photo is far larger than the detector input,
+or the normal pass found several faces at the edge of what it can see),
+lays out overlapping tiles sized so those faces come out large enough,
+and merges the tiles' boxes with the first pass by NMS.
+Only NumPy here; FaceEngine runs the detector on the tiles.
+"""
+import numpy as np
+
+
+def iou(box, boxes):
+    """IoU of one (x1, y1, x2, y2) box with each row of ``boxes``."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+def nms(boxes, thresh=0.4):
+    """Indices of ``boxes`` (n, 5: x1, y1, x2, y2, score) kept by greedy NMS, best first."""
+    order = np.argsort(-boxes[:, 4], kind="stable")
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        order = rest[iou(boxes[i], boxes[rest]) <= thresh]
+    return keep
+
+
+class Tiler:
+    """When and how to run the detector over tiles.
+
+    max_shrink: tile when the photo is shrunk more than this to fit the
+        detector (16 at 480 px: long side over 7,680 px, panoramas and scans)
+    crowd: ... or when the normal pass found at least this many faces
+        smaller than ``small_px`` as the detector saw them
+    target_px: face side in detector pixels the tiles are sized for
+    overlap: tile overlap as a fraction of the tile side; faces cut by a
+        tile edge are dropped, the overlapping neighbour sees them whole
+    max_tiles: tiles are enlarged until there are at most this many
+    """
+    def __init__(self, max_shrink=16.0, crowd=3, small_px=20, target_px=32, overlap=0.25, max_tiles=48):
+        self.max_shrink = max_shrink
+        self.crowd = crowd
+        self.small_px = small_px
+        self.target_px = target_px
+        self.overlap = overlap
+        self.max_tiles = max_tiles
+
+    @staticmethod
+    def scale(size, det_size):
+        """How the detector resizes a (w, h) image: it fits it inside det_size."""
+        w, h = size
+        return min(det_size[0] / float(w), det_size[1] / float(h))
+
+    def tile_side(self, size, det_size, bboxes):
+        """Tile side in image pixels, or None when the first pass (``bboxes``) is good enough."""
+        s = self.scale(size, det_size)
+        sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1]) if len(bboxes) else np.zeros(0)
+        small = sides[sides * s < self.small_px]
+        base = min(det_size)
+        if len(small) >= self.crowd:
+            # zoom so the typical small face reaches target_px
+            side = base * float(np.median(small)) / self.target_px
+        elif s < 1.0 / self.max_shrink:
+            side = base * 2.0
+        else:
+            return None
+        side = int(max(base, side))
+        # one tile the size of the photo is just the first pass again
+        return side if side < max(size) else None
+
+    def grid(self, size, side):
+        """Overlapping (x0, y0, x1, y1) tiles covering a (w, h) image."""
+        w, h = size
+        while True:
+            side = int(min(side, max(w, h)))
+            step = max(1, int(side * (1.0 - self.overlap)))
+            xs = self._starts(w, side, step)
+            ys = self._starts(h, side, step)
+            if len(xs) * len(ys) <= self.max_tiles or side >= max(w, h):
+                return [(x, y, min(w, x + side), min(h, y + side)) for y in ys for x in xs]
+            side = int(side * 1.25)
+
+    @staticmethod
+    def _starts(length, side, step):
+        if length <= side:
+            return [0]
+        starts = list(range(0, length - side, step))
+        starts.append(length - side)  # last tile flush with the edge
+        return starts
+
+    @staticmethod
+    def inside(bboxes, tile, size, margin=2):
+        """Mask of boxes (tile coordinates) that don't touch an inner edge of ``tile``."""
+        x0, y0, x1, y1 = tile
+        w, h = size
+        ok = np.ones(len(bboxes), dtype=bool)
+        if x0 > 0:
+            ok &= bboxes[:, 0] > margin
+        if y0 > 0:
+            ok &= bboxes[:, 1] > margin
+        if x1 < w:
+            ok &= bboxes[:, 2] < (x1 - x0) - margin
+        if y1 < h:
+            ok &= bboxes[:, 3] < (y1 - y0) - margin
+        return ok
+
+
+def merge(parts, thresh=0.4):
+    """NMS over [(bboxes (n, 5), kpss (n, 5, 2) or None)] in image coordinates.
+
+    Returns (bboxes, kpss) of the kept detections, best score first.
+    """
+    parts = [(b, k) for b, k in parts if len(b)]
+    if not parts:
+        return np.zeros((0, 5), np.float32), None
+    boxes = np.concatenate([b for b, _ in parts]).astype(np.float32)
+    kpss = None
+    if all(k is not None for _, k in parts):
+        kpss = np.concatenate([k for _, k in parts]).astype(np.float32)
+    keep = nms(boxes, thresh)
+    return boxes[keep], kpss[keep] if kpss is not None else None
@@ -0,0 +1,423 @@
+"""Bulk export and import of the face index as columnar files.
+
+``export_index`` writes the faces, images and people of a FaceDB as
+columns: one contiguous (n, d) embedding matrix, bbox/landmark arrays,
+and packed strings. The default format is a single ``.npz`` (NumPy only).
+With pyarrow installed, ``fmt="parquet"`` writes a folder of Parquet
+files (faces, images, clusters) for Arrow, pandas or DuckDB.
+Machine-local state is left out: queue leases, shards and the person index.
+
+``import_index`` loads such an export with bulk inserts in one
+transaction. Into an empty DB it restores the library as it was.
+Into an existing one it merges:
+- Images are matched by path after ``path_map`` (SRC=DST prefixes, as
+  for queue workers), then by rel_path.
+- Images this DB has already scanned keep their faces unless
+  ``replace`` is set.
+- Named people join a person with the same label here; other people are
+  added as new clusters.
+"""
+import json
+import os
+import re
+import sqlite3
+import zipfile
+
+import numpy as np
+
+try:
+    from backend import quant
+    from backend.workqueue import map_path
+except ModuleNotFoundError:
+    import quant
+    from workqueue import map_path
+
+FORMAT_VERSION = 1
+FORMATS = ("npz", "parquet")
+
+_DEFAULT_LABEL = re.compile(r"Person[ _#]*\d+")
+
+# NULLs become NaN / -1 (with a has_* mask where neither fits); strings and blobs are packed
+_IMAGE_COLS = ("id", "rel_path", "abs_path", "mtime", "scanned", "phash", "duplicate_of", "prefiltered")
+_STRINGS = {"faces": ("quality_flags", "frame_path", "model"), "images": ("rel_path", "abs_path"),
+            "clusters": ("label",)}
+_BLOBS = {"faces": ("chip",)}
+
+
+# ---------- reading the DB ----------
+def _json_array(text, shape):
+    try:
+        return np.asarray(json.loads(text), dtype=np.float32).reshape(shape)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_tables(db, chips=True, dtype="float32"):
+    """The index as {'faces': {...}, 'images': {...}, 'clusters': {...}, 'meta': {...}} columns.
+
+    chips: include the aligned face chips (JPEG bytes), usually the bulk of the size
+    dtype: embedding matrix dtype, float32 or float16
+    """
+    # a second connection without converters: blobs come back as bytes, undecoded
+    conn = sqlite3.connect(db.path)
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(faces)")
+        have_chip = chips and "chip" in {r[1] for r in cur.fetchall()}
+        cur.execute(f"""SELECT id, image_id, bbox, CAST(embedding AS BLOB), det_score, cluster_id, quality_flags,
+                               frame_ts, frame_path, kps, model{', chip' if have_chip else ''}
+                        FROM faces ORDER BY id""")
+        rows = cur.fetchall()
+        cur.execute(f"SELECT {', '.join(_IMAGE_COLS)} FROM images ORDER BY id")
+        images = cur.fetchall()
+        cur.execute("SELECT id, label FROM clusters ORDER BY id")
+        clusters = cur.fetchall()
+    finally:
+        conn.close()
+
+    n = len(rows)
+    blobs = [r[3] for r in rows]
+    X = _embedding_matrix(blobs, dtype)
+    kps = np.full((n, 5, 2), np.nan, dtype=np.float32)
+    for i, r in enumerate(rows):
+        if r[9]:
+            k = _json_array(r[9], (-1, 2))
+            if k is not None and k.shape == (5, 2):
+                kps[i] = k
+    faces = {
+        "id": np.fromiter((r[0] for r in rows), np.int64, n),
+        "image_id": np.fromiter((r[1] for r in rows), np.int64, n),
+        "bbox": np.array([json.loads(r[2]) if r[2] else [0, 0, 0, 0] for r in rows], dtype=np.int32).reshape(n, 4),
+        "embedding": X,
+        "has_embedding": np.fromiter((b is not None for b in blobs), bool, n),
+        "det_score": np.fromiter((np.nan if r[4] is None else r[4] for r in rows), np.float64, n),
+        "cluster_id": np.fromiter((-1 if r[5] is None else r[5] for r in rows), np.int64, n),
+        "quality_flags": [r[6] for r in rows],
+        "frame_ts": np.fromiter((np.nan if r[7] is None else r[7] for r in rows), np.float64, n),
+        "frame_path": [r[8] for r in rows],
+        "kps": kps,
+        "model": [r[10] for r in rows],
+    }
+    if have_chip:
+        faces["chip"] = [r[11] for r in rows]
+    m = len(images)
+    imgs = {
+        "id": np.fromiter((r[0] for r in images), np.int64, m),
+        "rel_path": [r[1] for r in images],
+        "abs_path": [r[2] for r in images],
+        "mtime": np.fromiter((np.nan if r[3] is None else r[3] for r in images), np.float64, m),
+        "scanned": np.fromiter((r[4] or 0 for r in images), np.int8, m),
+        "phash": np.fromiter((r[5] or 0 for r in images), np.int64, m),
+        "has_phash": np.fromiter((r[5] is not None for r in images), bool, m),
+        "duplicate_of": np.fromiter((-1 if r[6] is None else r[6] for r in images), np.int64, m),
+        "prefiltered": np.fromiter((r[7] or 0 for r in images), np.int8, m),
+    }
+    cl = {"id": np.fromiter((r[0] for r in clusters), np.int64, len(clusters)),
+          "label": [r[1] for r in clusters]}
+    meta = {"format_version": FORMAT_VERSION, "faces": n, "images": m, "clusters": len(clusters),
+            "dim": int(X.shape[1]), "dtype": str(X.dtype), "embedding_format": db.embedding_format,
+            "models": sorted({r[10] for r in rows if r[10]})}
+    return {"faces": faces, "images": imgs, "clusters": cl, "meta": meta}
+
+
+def _embedding_matrix(blobs, dtype):
+    present = [b for b in blobs if b is not None]
+    dim = len(quant.decode(present[0])) if present else 0
+    X = np.zeros((len(blobs), dim), dtype=dtype)
+    if not present:
+        return X
+    raw = dim * 4
+    if len(present) == len(blobs) and all(len(b) == raw and quant.blob_format(b) == quant.FLOAT32 for b in blobs):
+        # the common case: every row raw float32, decoded in one go
+        X[:] = np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(blobs), dim)
+        return X
+    for i, b in enumerate(blobs):
+        if b is not None:
+            X[i] = quant.decode(b)
+    return X
+
+
+# ---------- files ----------
+def _pack(values):
+    """Strings or bytes (None allowed) -> (data uint8, offsets int64 (n+1), present bool)."""
+    enc = [v.encode("utf-8") if isinstance(v, str) else (v or b"") for v in values]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in enc], out=offsets[1:])
+    data = np.frombuffer(b"".join(enc), dtype=np.uint8)
+    return data, offsets, np.fromiter((v is not None for v in values), bool, len(values))
+
+
+def _unpack(data, offsets, present, text=True):
+    buf = data.tobytes()
+    out = []
+    for i, ok in enumerate(present.tolist()):
+        if not ok:
+            out.append(None)
+            continue
+        v = buf[offsets[i]:offsets[i + 1]]
+        out.append(v.decode("utf-8") if text else v)
+    return out
+
+
+def write_npz(tables, path):
+    arrays = {"meta": np.frombuffer(json.dumps(tables["meta"]).encode("utf-8"), dtype=np.uint8)}
+    for table in ("faces", "images", "clusters"):
+        for col, v in tables[table].items():
+            if isinstance(v, list):
+                arrays[f"{table}.{col}.data"], arrays[f"{table}.{col}.offsets"], arrays[f"{table}.{col}.present"] = \
+                    _pack(v)
+            else:
+                arrays[f"{table}.{col}"] = v
+    # uncompressed: embeddings don't compress, and the matrix can be memory-mapped straight out of it
+    np.savez(path, **arrays)
+    return path if path.endswith(".npz") else path + ".npz"
+
+
+def read_npz(path):
+    with np.load(path, allow_pickle=False) as z:
+        keys = set(z.files)
+        tables = {"meta": json.loads(z["meta"].tobytes().decode("utf-8"))}
+        for table in ("faces", "images", "clusters"):
+            cols = {}
+            for key in sorted(keys):
+                if not key.startswith(table + "."):
+                    continue
+                col = key[len(table) + 1:]
+                if col.endswith(".data"):
+                    name = col[:-5]
+                    cols[name] = _unpack(z[key], z[f"{table}.{name}.offsets"], z[f"{table}.{name}.present"],
+                                         text=name not in _BLOBS.get(table, ()))
+                elif not col.endswith((".offsets", ".present")):
+                    cols[col] = z[key]
+            tables[table] = cols
+    return tables
+
+
+def write_parquet(tables, path):
+    """A folder with faces.parquet, images.parquet and clusters.parquet (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(path, exist_ok=True)
+    meta = {b"facerec": json.dumps(tables["meta"]).encode("utf-8")}
+    for table in ("faces", "images", "clusters"):
+        cols = {}
+        for col, v in tables[table].items():
+            if isinstance(v, list):
+                cols[col] = pa.array(v, type=pa.binary() if col in _BLOBS.get(table, ()) else pa.string())
+            elif v.ndim == 1:
+                cols[col] = pa.array(v)
+            else:
+                # (n, ...) -> fixed size list of the flattened row
+                width = int(np.prod(v.shape[1:]))
+                flat = pa.array(np.ascontiguousarray(v).reshape(-1))
+                cols[col] = pa.FixedSizeListArray.from_arrays(flat, width)
+        t = pa.table(cols).replace_schema_metadata(meta)
+        pq.write_table(t, os.path.join(path, f"{table}.parquet"))
+    return path
+
+
+def read_parquet(path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tables = {}
+    for table in ("faces", "images", "clusters"):
+        t = pq.read_table(os.path.join(path, f"{table}.parquet"))
+        if "meta" not in tables:
+            tables["meta"] = json.loads((t.schema.metadata or {}).get(b"facerec", b"{}").decode("utf-8"))
+        cols = {}
+        for name in t.column_names:
+            col = t.column(name).combine_chunks()
+            if name in _STRINGS.get(table, ()) or name in _BLOBS.get(table, ()):
+                cols[name] = col.to_pylist()
+            elif pa.types.is_fixed_size_list(col.type):
+                cols[name] = col.flatten().to_numpy(zero_copy_only=False).reshape(len(col), -1)
+            else:
+                cols[name] = col.to_numpy(zero_copy_only=False)
+        tables[table] = cols
+    n = len(tables["faces"].get("id", ()))
+    if n:
+        tables["faces"]["kps"] = tables["faces"]["kps"].reshape(n, 5, 2)
+    return tables
+
+
+def export_index(db, path, fmt=None, chips=True, dtype="float32"):
+    """Write the index of ``db`` to ``path``; returns (path written, meta).
+
+    fmt: "npz" (default) or "parquet" (needs pyarrow; ``path`` becomes a folder)
+    """
+    fmt = fmt or ("parquet" if path.endswith(".parquet") or os.path.isdir(path) else "npz")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    tables = read_tables(db, chips=chips, dtype=dtype)
+    if fmt == "parquet":
+        return write_parquet(tables, path), tables["meta"]
+    return write_npz(tables, path), tables["meta"]
+
+
+def read_export(path):
+    if os.path.isdir(path):
+        return read_parquet(path)
+    if not zipfile.is_zipfile(path):
+        raise ValueError(f"not an index export: {path}")
+    return read_npz(path)
+
+
+# ---------- importing ----------
+def import_index(db, path, path_map=(), replace=False, progress=None, batch=50000):
+    """Load an ``export_index`` file or folder into ``db``.
+
+    path_map: [(src, dst)] prefixes rewriting image and frame paths
+    replace: also take the exported faces of images this DB has already scanned
+    progress: optional callable(done, total, faces_added)
+    Returns a dict with 'images_added', 'images_updated', 'images_skipped',
+    'faces', 'clusters_added' and 'clusters_joined'.
+    """
+    t = read_export(path)
+    meta = t.get("meta", {})
+    if meta.get("format_version", FORMAT_VERSION) > FORMAT_VERSION:
+        raise ValueError(f"export format {meta['format_version']} is newer than this version reads")
+    faces, images, clusters = t["faces"], t["images"], t["clusters"]
+    path_map = list(path_map or ())
+    stats = {"images_added": 0, "images_updated": 0, "images_skipped": 0, "faces": 0,
+             "clusters_added": 0, "clusters_joined": 0}
+    with db.lock:
+        try:
+            cur = db.conn.cursor()
+            # ----- images -----
+            cur.execute("SELECT id, rel_path, abs_path, scanned FROM images")
+            by_abs, by_rel, scanned = {}, {}, {}
+            for iid, rel, ab, sc in cur.fetchall():
+                by_abs[os.path.normcase(ab or "")] = iid
+                by_rel[rel] = iid
+                scanned[iid] = sc
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM images")
+            next_id = cur.fetchone()[0] + 1
+            ids = {}          # exported image id -> id here
+            take = set()      # exported image ids whose faces are imported
+            new_rows, upd_rows = [], []
+            dup = images["duplicate_of"].tolist()
+            has_ph = images["has_phash"].tolist()
+            for k, (eid, rel, ab, mt, sc, ph, pre) in enumerate(zip(
+                    images["id"].tolist(), images["rel_path"], images["abs_path"], images["mtime"].tolist(),
+                    images["scanned"].tolist(), images["phash"].tolist(), images["prefiltered"].tolist())):
+                ab = map_path(ab, path_map) if ab and path_map else ab
+                mt = None if mt != mt else mt  # NaN
+                ph = ph if has_ph[k] else None
+                here = by_abs.get(os.path.normcase(ab or ""))
+                if here is None:
+                    for r in (rel, rel.replace("/", "\\"), rel.replace("\\", "/")):
+                        here = by_rel.get(r)
+                        if here is not None:
+                            break
+                if here is None:
+                    here = next_id
+                    next_id += 1
+                    by_rel[rel] = here
+                    new_rows.append((here, rel, ab, mt, sc, ph, pre))
+                    stats["images_added"] += 1
+                elif scanned.get(here) and not replace:
+                    ids[eid] = here
+                    stats["images_skipped"] += 1
+                    continue
+                else:
+                    upd_rows.append((sc, ph, pre, here))
+                    stats["images_updated"] += 1
+                ids[eid] = here
+                take.add(eid)
+            cur.executemany("INSERT INTO images(id, rel_path, abs_path, mtime, scanned, phash, prefiltered) "
+                            "VALUES(?,?,?,?,?,?,?)", new_rows)
+            if upd_rows:
+                gone = [(r[3],) for r in upd_rows]
+                cur.executemany("""UPDATE clusters SET rep_dirty=1, images_dirty=1 WHERE id IN
+                                   (SELECT DISTINCT cluster_id FROM faces WHERE image_id=?)""", gone)
+                cur.executemany("DELETE FROM faces WHERE image_id=?", gone)
+                cur.executemany("UPDATE images SET scanned=?, phash=?, prefiltered=?, lease_owner=NULL, "
+                                "lease_until=NULL, shard=NULL WHERE id=?", upd_rows)
+                # unnamed people whose every face was just replaced would be left empty
+                cur.execute("SELECT id, label FROM clusters c WHERE rep_dirty=1 AND NOT EXISTS "
+                            "(SELECT 1 FROM faces WHERE cluster_id=c.id)")
+                cur.executemany("DELETE FROM clusters WHERE id=?",
+                                [(cid,) for cid, lab in cur.fetchall() if not lab or _DEFAULT_LABEL.fullmatch(lab)])
+            cur.executemany("UPDATE images SET duplicate_of=? WHERE id=?",
+                            [(ids[d], ids[e]) for e, d in zip(images["id"].tolist(), dup)
+                             if e in take and d >= 0 and d in ids])
+
+            # ----- people -----
+            fimg = faces["image_id"]
+            keep = np.isin(fimg, np.fromiter(take, np.int64, len(take)))
+            used = {int(c) for c in np.unique(faces["cluster_id"][keep]) if c >= 0}
+            cur.execute("SELECT id, label FROM clusters")
+            existing = cur.fetchall()
+            taken = {cid for cid, _ in existing}
+            by_label = {(lab or "").casefold(): cid for cid, lab in existing
+                        if lab and not _DEFAULT_LABEL.fullmatch(lab)}
+            next_cid = max(taken, default=0) + 1
+            cmap, new_clusters = {}, []
+            for cid, lab in zip(clusters["id"].tolist(), clusters["label"]):
+                if cid not in used:
+                    continue
+                named = lab and not _DEFAULT_LABEL.fullmatch(lab)
+                if named and lab.casefold() in by_label:
+                    cmap[cid] = by_label[lab.casefold()]
+                    stats["clusters_joined"] += 1
+                    continue
+                if cid in taken:
+                    new, next_cid = next_cid, next_cid + 1
+                else:
+                    new = cid
+                    next_cid = max(next_cid, cid + 1)
+                taken.add(new)
+                cmap[cid] = new
+                if named:
+                    by_label[lab.casefold()] = new
+                new_clusters.append((new, lab if named else f"Person #{new}"))
+            cur.executemany("INSERT INTO clusters(id, label, rep_dirty, images_dirty) VALUES(?,?,1,1)", new_clusters)
+            cur.executemany("UPDATE clusters SET rep_dirty=1, images_dirty=1 WHERE id=?",
+                            [(c,) for c in set(cmap.values()) - {c for c, _ in new_clusters}])
+            stats["clusters_added"] = len(new_clusters)
+
+            # ----- faces -----
+            rows = np.flatnonzero(keep)
+            fmt = db.embedding_format
+            X = faces["embedding"]
+            has_emb = faces["has_embedding"]
+            chips = faces.get("chip")
+            total = len(rows)
+            kps_ok = ~np.isnan(faces["kps"]).any(axis=(1, 2))
+            for s in range(0, total, batch):
+                part = rows[s:s + batch]
+                if fmt == quant.FLOAT32:
+                    E = np.ascontiguousarray(X[part], dtype=np.float32)
+                    blobs = [sqlite3.Binary(e.tobytes()) if ok else None for e, ok in zip(E, has_emb[part].tolist())]
+                else:
+                    blobs = [sqlite3.Binary(quant.encode(X[i], fmt)) if has_emb[i] else None for i in part]
+                # plain Python values column by column; numpy scalars per row cost more than the inserts
+                score = [None if v != v else v for v in faces["det_score"][part].tolist()]
+                ts = [None if v != v else v for v in faces["frame_ts"][part].tolist()]
+                kps = [json.dumps(k) if ok else None
+                       for k, ok in zip(faces["kps"][part].tolist(), kps_ok[part].tolist())]
+                idx = part.tolist()
+                frames = [faces["frame_path"][i] for i in idx]
+                if path_map:
+                    frames = [map_path(fp, path_map) if fp else fp for fp in frames]
+                out = list(zip(
+                    [ids[i] for i in fimg[part].tolist()],
+                    ["[%d, %d, %d, %d]" % tuple(b) for b in faces["bbox"][part].tolist()], blobs,
+                    score, [cmap.get(c) for c in faces["cluster_id"][part].tolist()],
+                    [faces["quality_flags"][i] for i in idx], ts, frames, kps,
+                    [sqlite3.Binary(chips[i]) if chips[i] is not None else None for i in idx] if chips is not None
+                    else [None] * len(idx),
+                    [faces["model"][i] for i in idx]))
+                cur.executemany("""INSERT INTO faces(image_id, bbox, embedding, det_score, cluster_id, quality_flags,
+                                                     frame_ts, frame_path, kps, chip, model)
+                                   VALUES(?,?,?,?,?,?,?,?,?,?,?)""", out)
+                stats["faces"] += len(out)
+                if progress:
+                    progress(min(s + batch, total), total, stats["faces"])
+            db.conn.commit()
+        except BaseException:
+            # nothing half-imported may ride along with the next commit
+            db.conn.rollback()
+            raise
+    db._universe = None
+    return stats
@@ -1,17 +1,31 @@
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image, ImageOps
 
 IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".3gp", ".webm", ".mts"}
 
-def find_images(root):
+def find_images(root, videos=False):
+    """Image files under ``root``; with ``videos`` also video files."""
+    exts = IMG_EXTS | VIDEO_EXTS if videos else IMG_EXTS
     out = []
     for dirpath, _, filenames in os.walk(root):
         for fn in filenames:
             ext = os.path.splitext(fn)[1].lower()
-            if ext in IMG_EXTS:
+            if ext in exts:
                 out.append(os.path.join(dirpath, fn))
     return out
 
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMG_EXTS
+
+def is_video(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTS
+
+def is_media(path):
+    return is_image(path) or is_video(path)
+
 def rel_to(path, root):
     # Make path relative to root
     try:
@@ -22,62 +36,56 @@ def rel_to(path, root):
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
-def thumb_from_face(img: Image.Image, bbox, size=160, pad=0.2):
-    # Handle EXIF orientation: if present, map bbox coordinates then transpose image
+def _exif_orientation(img):
     try:
-        exif = img.getexif()
-        orientation = exif.get(274)
+        return img.getexif().get(274)
     except Exception:
-        orientation = None
+        return None
 
-    w, h = img.size
 
-    def map_coord(x, y, ori, w, h):
-        # Map a single coordinate depending on EXIF orientation
-        if not ori or ori == 1:
-            return x, y
-        if ori == 2:
-            return w - x, y
-        if ori == 3:
-            return w - x, h - y
-        if ori == 4:
-            return x, h - y
-        if ori == 5:
-            return y, x
-        if ori == 6:
-            return y, w - x
-        if ori == 7:
-            return h - y, w - x
-        if ori == 8:
-            return h - y, x
+def _map_coord(x, y, ori, w, h):
+    # Map a single coordinate depending on EXIF orientation
+    if not ori or ori == 1:
         return x, y
+    if ori == 2:
+        return w - x, y
+    if ori == 3:
+        return w - x, h - y
+    if ori == 4:
+        return x, h - y
+    if ori == 5:
+        return y, x
+    if ori == 6:
+        return y, w - x
+    if ori == 7:
+        return h - y, w - x
+    if ori == 8:
+        return h - y, x
+    return x, y
 
+
+def _map_bbox(bbox, orientation, w, h):
     # transform bbox corner points if orientation is present
     try:
         x1, y1, x2, y2 = bbox
         if orientation and orientation != 1:
-            pts = [map_coord(x1, y1, orientation, w, h),
-                   map_coord(x2, y2, orientation, w, h),
-                   map_coord(x1, y2, orientation, w, h),
-                   map_coord(x2, y1, orientation, w, h)]
+            pts = [_map_coord(x1, y1, orientation, w, h),
+                   _map_coord(x2, y2, orientation, w, h),
+                   _map_coord(x1, y2, orientation, w, h),
+                   _map_coord(x2, y1, orientation, w, h)]
             xs = [p[0] for p in pts]
             ys = [p[1] for p in pts]
-            x1t, x2t = int(min(xs)), int(max(xs))
-            y1t, y2t = int(min(ys)), int(max(ys))
-            x1, y1, x2, y2 = x1t, y1t, x2t, y2t
+            x1, x2 = int(min(xs)), int(max(xs))
+            y1, y2 = int(min(ys)), int(max(ys))
+        return x1, y1, x2, y2
     except Exception:
         # fallback: use provided bbox
-        x1, y1, x2, y2 = bbox
+        return tuple(bbox)
 
-    # transpose the image so it's upright for display
-    try:
-        img_t = ImageOps.exif_transpose(img)
-    except Exception:
-        img_t = img
 
-    # After transposing, image size may have changed
+def _crop_square(img_t, bbox, size, pad):
+    x1, y1, x2, y2 = bbox
     w2, h2 = img_t.size
-
     # expand bbox by pad around the center of the bbox
     bw = x2 - x1
     bh = y2 - y1
@@ -90,4 +98,139 @@ def thumb_from_face(img: Image.Image, bbox, size=160, pad=0.2):
     ny2 = min(h2, int(cy + s/2))
     crop = img_t.crop((nx1, ny1, nx2, ny2))
     crop.thumbnail((size, size))
-    return crop
\ No newline at end of file
+    return crop
+
+
+def thumb_from_face(img: Image.Image, bbox, size=160, pad=0.2):
+    # Handle EXIF orientation: if present, map bbox coordinates then transpose image
+    orientation = _exif_orientation(img)
+    w, h = img.size
+    bbox = _map_bbox(bbox, orientation, w, h)
+
+    # transpose the image so it's upright for display
+    try:
+        img_t = ImageOps.exif_transpose(img)
+    except Exception:
+        img_t = img
+    return _crop_square(img_t, bbox, size, pad)
+
+
+class DecodedImageLRU:
+    """Small in-memory LRU of decoded, upright RGB images.
+
+    Entries are keyed by path and mtime and remember the scale they were
+    decoded at, so a reduced decode can serve later small crops while a
+    request needing more detail replaces it. A per-path lock makes
+    concurrent callers wait for one decode instead of all decoding.
+    """
+    def __init__(self, max_items=8, max_pixels=24_000_000):
+        self.max_items = max_items
+        self.max_pixels = max_pixels
+        self._items = OrderedDict()  # (path, mtime_ns) -> (image, ratio)
+        self._lock = threading.Lock()
+        self._path_locks = {}
+
+    def _path_lock(self, key):
+        with self._lock:
+            lk = self._path_locks.get(key)
+            if lk is None:
+                lk = self._path_locks[key] = threading.Lock()
+            return lk
+
+    def get(self, path, min_ratio=1.0):
+        """Return (upright_rgb, ratio) for ``path``.
+
+        ``ratio`` is decoded size / original size and is at least ``min_ratio``
+        unless the image cannot be reduced. Returns None if decoding fails.
+        """
+        try:
+            key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        with self._path_lock(key):
+            with self._lock:
+                ent = self._items.get(key)
+                if ent is not None and ent[1] >= min_ratio - 1e-6:
+                    self._items.move_to_end(key)
+                    return ent
+            ent = _decode_upright(path, min_ratio)
+            if ent is None:
+                return None
+            with self._lock:
+                self._items[key] = ent
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_items or (
+                        len(self._items) > 1 and
+                        sum(e[0].width * e[0].height for e in self._items.values()) > self.max_pixels):
+                    old, _ = self._items.popitem(last=False)
+                    self._path_locks.pop(old, None)
+            return ent
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._path_locks.clear()
+
+
+def _decode_upright(path, min_ratio=1.0):
+    img = Image.open(path)
+    orig_size = img.size
+    if min_ratio < 1.0 and img.format == "JPEG":
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale for a fraction of the cost
+        want = (max(1, int(orig_size[0] * min_ratio)), max(1, int(orig_size[1] * min_ratio)))
+        try:
+            img.draft("RGB", want)
+        except Exception:
+            pass
+    img = img.convert("RGB")
+    ratio = img.size[0] / float(orig_size[0] or 1)
+    try:
+        img = ImageOps.exif_transpose(img)
+    except Exception:
+        pass
+    return img, ratio
+
+
+_decoded = DecodedImageLRU()
+
+
+def render_face_crops(requests, size=160, pad=0.2, lru=None):
+    """Render many face crops, decoding each source image only once.
+
+    requests: iterable of (abs_path, bbox)
+    Returns a list of PIL thumbnails (or None where the image could not be
+    read) in the same order as ``requests``. Bboxes are upright coordinates,
+    as the engine detected them (cv2 applies the EXIF orientation on load).
+    Requests are grouped by image; when every crop of an image is small
+    relative to the photo, JPEGs are decoded at reduced scale. Decoded images are kept in a small LRU so
+    consecutive batches touching the same group photo reuse the decode.
+    """
+    lru = lru or _decoded
+    requests = list(requests)
+    out = [None] * len(requests)
+    by_path = OrderedDict()
+    for i, (path, bbox) in enumerate(requests):
+        by_path.setdefault(path, []).append(i)
+
+    for path, idxs in by_path.items():
+        # the smallest face decides how far we may reduce the decode
+        sides = []
+        for i in idxs:
+            x1, y1, x2, y2 = requests[i][1]
+            sides.append(max(x2 - x1, y2 - y1) * (1 + pad))
+        min_side = max(1.0, min(sides))
+        min_ratio = min(1.0, size / min_side)
+        try:
+            ent = lru.get(path, min_ratio)
+        except Exception:
+            ent = None
+        if ent is None:
+            continue
+        img_t, ratio = ent
+        for i in idxs:
+            try:
+                bbox = [v * ratio for v in requests[i][1]]
+                out[i] = _crop_square(img_t, bbox, size, pad)
+            except Exception:
+                continue
+    return out
@@ -0,0 +1,193 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def frames_dir_for(db_path):
+    """Representative video frames are kept next to the DB: ``<dbdir>/video_frames``."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "video_frames")
+
+
+def sample_frames(path, probe_s=0.25, min_gap_s=0.5, max_gap_s=4.0, scene_thresh=0.10,
+                  max_side=1920, max_frames=600):
+    """Yield ``(t_seconds, rgb_frame)`` for the frames worth running detection on.
+
+    Frames are probed every ``probe_s`` seconds (the rest are only grabbed,
+    not converted). A probe is kept when the scene changed noticeably since
+    the last kept frame (mean absolute difference of a 32x18 grey thumbnail
+    above ``scene_thresh``, at most one per ``min_gap_s``), or when
+    ``max_gap_s`` passed without one, so static shots still get sampled.
+    Frames are downscaled so the longer side is at most ``max_side``.
+    """
+    import cv2
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps != fps or fps > 240:
+            fps = 30.0
+        step = max(1, int(round(fps * probe_s)))
+        last_sig = None
+        last_t = None
+        kept = 0
+        idx = -1
+        while kept < max_frames:
+            if not cap.grab():
+                break
+            idx += 1
+            if idx % step:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok or frame is None:
+                continue
+            t = idx / fps
+            grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            sig = cv2.resize(grey, (32, 18), interpolation=cv2.INTER_AREA).astype(np.float32)
+            gap = None if last_t is None else t - last_t
+            if last_sig is None:
+                keep = True
+            else:
+                change = float(np.abs(sig - last_sig).mean()) / 255.0
+                keep = (change >= scene_thresh and gap >= min_gap_s) or gap >= max_gap_s
+            if not keep:
+                continue
+            last_sig, last_t = sig, t
+            h, w = frame.shape[:2]
+            scale = max_side / max(h, w)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            kept += 1
+            yield t, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+class _Track:
+    __slots__ = ("items", "mean", "last_t")
+
+    def __init__(self, t, det, frame_key):
+        self.items = [(t, det, frame_key)]
+        self.mean = np.asarray(det["embedding"], dtype=np.float32).copy()
+        self.last_t = t
+
+    def add(self, t, det, frame_key):
+        self.items.append((t, det, frame_key))
+        self.mean += det["embedding"]
+        self.last_t = t
+
+    def centre(self):
+        return self.mean / (np.linalg.norm(self.mean) + 1e-9)
+
+
+def track_faces(frames, min_sim=0.5, max_gap_s=6.0):
+    """Link detections across sampled frames into per-person tracks.
+
+    frames: iterable of (t, frame_key, dets)
+    A detection joins the open track whose running mean embedding is most
+    similar (cosine >= ``min_sim``), greedily best pair first, one detection
+    per track per frame; tracks unseen for ``max_gap_s`` are closed.
+    Returns a list of tracks, each a list of (t, det, frame_key).
+    """
+    open_tracks, done = [], []
+    for t, key, dets in frames:
+        still = []
+        for tr in open_tracks:
+            (still if t - tr.last_t <= max_gap_s else done).append(tr)
+        open_tracks = still
+        if not dets:
+            continue
+        pairs = []
+        if open_tracks:
+            C = np.vstack([tr.centre() for tr in open_tracks])
+            E = np.vstack([d["embedding"] for d in dets]).astype(np.float32)
+            S = E @ C.T
+            pairs = sorted(((float(S[i, j]), i, j) for i in range(len(dets)) for j in range(len(open_tracks))
+                            if S[i, j] >= min_sim), reverse=True)
+        used_d, used_t = set(), set()
+        for _, i, j in pairs:
+            if i in used_d or j in used_t:
+                continue
+            used_d.add(i)
+            used_t.add(j)
+            open_tracks[j].add(t, dets[i], key)
+        for i, d in enumerate(dets):
+            if i not in used_d:
+                open_tracks.append(_Track(t, d, key))
+    return [tr.items for tr in done + open_tracks]
+
+
+def pick_representatives(track, per_minute=2, max_reps=3):
+    """Best detections of a track: one per time segment, by det_score.
+
+    Longer tracks get more segments (``per_minute``), capped at ``max_reps``.
+    """
+    t0, t1 = track[0][0], track[-1][0]
+    k = max(1, min(max_reps, int((t1 - t0) / 60.0 * per_minute) + 1, len(track)))
+    span = (t1 - t0) / k or 1.0
+    best = {}
+    for item in track:
+        seg = min(k - 1, int((item[0] - t0) / span))
+        cur = best.get(seg)
+        if cur is None or item[1].get("det_score", 0) > cur[1].get("det_score", 0):
+            best[seg] = item
+    return [best[s] for s in sorted(best)]
+
+
+def index_video(db, engine, image_id, path, frames_dir, gate=None, metrics=None):
+    """Detect faces in sampled frames of a video and store a few per track.
+
+    Each stored face keeps its timestamp (``frame_ts``) and points at a JPEG
+    of its frame under ``frames_dir`` (``frame_path``) so thumbnails and
+    previews work like for stills. Returns (faces_stored, faces_gated).
+    """
+    import cv2
+    m = metrics
+    frames = {}
+    sampled = []
+    gen = sample_frames(path)
+    while True:
+        if m is not None:
+            with m.stage("video.sample"):
+                item = next(gen, None)
+        else:
+            item = next(gen, None)
+        if item is None:
+            break
+        t, rgb = item
+        key = int(round(t * 1000))
+        dets = engine.extract_faces_array(rgb, metrics=m)
+        if dets:
+            # frames that may end up as a representative are kept, JPEG-encoded to bound memory
+            ok, buf = cv2.imencode(".jpg", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if ok:
+                frames[key] = buf
+        sampled.append((t, key, dets))
+    if m is not None:
+        m.count("video_frames", len(sampled))
+    tracks = track_faces(sampled)
+    if m is not None:
+        m.count("video_tracks", len(tracks))
+
+    os.makedirs(frames_dir, exist_ok=True)
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    written = {}
+    stored = gated = 0
+    for track in tracks:
+        for t, det, key in pick_representatives(track):
+            flags = gate.reasons(det) if gate is not None else None
+            fp = written.get(key)
+            if fp is None and not flags and key in frames:
+                fp = os.path.join(frames_dir, f"{tag}_{key:09d}.jpg")
+                with open(fp, "wb") as f:
+                    f.write(frames[key].tobytes())
+                written[key] = fp
+            db.add_face(image_id, det["bbox"], det["embedding"], det.get("det_score"), flags,
+                        frame_ts=t, frame_path=fp, kps=det.get("kps"), chip=det.get("chip"),
+                        model=getattr(engine, "model_version", None))
+            if flags:
+                gated += 1
+            else:
+                stored += 1
+    return stored, gated
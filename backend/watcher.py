@@ -0,0 +1,370 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+try:
+    from backend.utils import is_media
+    from backend.indexer import index_folder, diff_folder, apply_diff
+except ModuleNotFoundError:
+    from utils import is_media
+    from indexer import index_folder, diff_folder, apply_diff
+
+# event kinds queued for the indexer
+CHANGED = "changed"   # new or modified file: (re)detect
+DELETED = "deleted"   # file or directory gone: forget
+RESCAN = "rescan"     # lost track (start-up, inotify overflow): diff the whole root
+
+# <linux/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+def _walk_dirs(root):
+    """Yield ``root`` and every directory below it (scandir, no stat calls)."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        yield d
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+        except OSError:
+            continue
+
+
+class _InotifySource:
+    """Recursive inotify watches over ``roots`` (Linux only)."""
+    name = "inotify"
+
+    def __init__(self, roots, emit):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.emit = emit
+        self.wds = {}  # wd -> directory
+        try:
+            for root in roots:
+                self._watch_tree(root, announce=False)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _watch_tree(self, top, announce):
+        for d in _walk_dirs(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    # fs.inotify.max_user_watches exhausted: caller falls back to polling
+                    raise OSError(err, "inotify watch limit reached")
+                continue
+            self.wds[wd] = d
+            if announce:
+                # files may have landed before the watch existed
+                try:
+                    with os.scandir(d) as it:
+                        for e in it:
+                            if e.is_file() and is_media(e.name):
+                                self.emit(e.path, CHANGED)
+                except OSError:
+                    pass
+
+    def run(self, halt):
+        while not halt.is_set():
+            r, _, _ = select.select([self.fd], [], [], 0.5)
+            if not r:
+                continue
+            try:
+                buf = os.read(self.fd, 256 * 1024)
+            except BlockingIOError:
+                continue
+            self._parse(buf)
+        os.close(self.fd)
+
+    def _parse(self, buf):
+        off = 0
+        while off + _EVENT.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT.unpack_from(buf, off)
+            raw = buf[off + _EVENT.size:off + _EVENT.size + length]
+            off += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                for root in self.roots:
+                    self.emit(root, RESCAN)
+                continue
+            d = self.wds.get(wd)
+            if d is None:
+                continue
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self.emit(d, DELETED)
+                continue
+            name = os.fsdecode(raw.rstrip(b"\0"))
+            path = os.path.join(d, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._watch_tree(path, announce=True)
+                    except OSError:
+                        for root in self.roots:
+                            self.emit(root, RESCAN)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.emit(path, DELETED)
+                continue
+            if not is_media(name):
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.emit(path, CHANGED)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.emit(path, DELETED)
+
+
+class _PollSource:
+    """Portable fallback: periodic scandir snapshot of (mtime_ns, size) per media file."""
+    name = "poll"
+
+    def __init__(self, roots, emit, interval=30.0):
+        self.roots = roots
+        self.emit = emit
+        self.interval = interval
+        self.snap = self._snapshot()
+
+    def _snapshot(self):
+        out = {}
+        for root in self.roots:
+            for d in _walk_dirs(root):
+                try:
+                    with os.scandir(d) as it:
+                        for e in it:
+                            if not is_media(e.name):
+                                continue
+                            try:
+                                if not e.is_file():
+                                    continue
+                                st = e.stat()  # cached from the directory read on Windows
+                            except OSError:
+                                continue
+                            out[e.path] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue
+        return out
+
+    def run(self, halt):
+        while not halt.wait(self.interval):
+            new = self._snapshot()
+            old = self.snap
+            for p, sig in new.items():
+                if old.get(p) != sig:
+                    self.emit(p, CHANGED)
+            for p in old.keys() - new.keys():
+                self.emit(p, DELETED)
+            self.snap = new
+
+
+class FolderWatcher:
+    """Collect debounced file-system changes under ``roots``.
+
+    Uses inotify on Linux (``backend='auto'``) and falls back to scandir
+    polling elsewhere or when the watch limit is hit. Events for the same
+    path are coalesced; a path becomes ready once it has been quiet for
+    ``debounce`` seconds, or after ``max_delay`` seconds at the latest so a
+    constantly rewritten file can't starve the queue.
+    """
+    def __init__(self, roots, debounce=2.0, max_delay=30.0, poll_interval=30.0, backend="auto"):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> [kind, first_seen, last_seen]
+        self._halt = threading.Event()
+        self.events = 0
+        self.source = None
+        if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self.source = _InotifySource(self.roots, self._emit)
+            except (OSError, AttributeError):
+                if backend == "inotify":
+                    raise
+        if self.source is None:
+            self.source = _PollSource(self.roots, self._emit, poll_interval)
+        self._thread = threading.Thread(target=self.source.run, args=(self._halt,), daemon=True)
+
+    @property
+    def backend(self):
+        return self.source.name
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._halt.set()
+        self._thread.join(timeout=5)
+
+    def _emit(self, path, kind):
+        now = time.monotonic()
+        with self._lock:
+            self.events += 1
+            ent = self._pending.get(path)
+            if ent is None:
+                self._pending[path] = [kind, now, now]
+            else:
+                # a rescan subsumes everything; otherwise the latest event wins
+                ent[0] = RESCAN if RESCAN in (kind, ent[0]) else kind
+                ent[2] = now
+
+    def request_rescan(self):
+        for root in self.roots:
+            self._emit(root, RESCAN)
+
+    def take_ready(self):
+        """Pop the paths that have settled: returns {path: kind}."""
+        now = time.monotonic()
+        with self._lock:
+            ready = [p for p, (_, first, last) in self._pending.items()
+                     if now - last >= self.debounce or now - first >= self.max_delay]
+            return {p: self._pending.pop(p)[0] for p in ready}
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            oldest = min((first for _, first, _ in self._pending.values()), default=None)
+            return {
+                "backend": self.backend,
+                "queue_length": len(self._pending),
+                "lag_s": round(now - oldest, 3) if oldest is not None else 0.0,
+                "events": self.events,
+            }
+
+
+class WatchIndexer:
+    """Apply FolderWatcher batches to the DB: index changed images, forget
+    deleted ones and attach new faces to existing people without a full
+    re-cluster.
+    """
+    def __init__(self, db, engine, roots, thumbs=None, metrics=None, assign_dist=0.45, gate=None,
+                 dedup=None):
+        self.db = db
+        self.engine = engine
+        self.roots = sorted((os.path.abspath(r) for r in roots), key=len, reverse=True)
+        self.thumbs = thumbs
+        self.metrics = metrics
+        self.assign_dist = assign_dist
+        self.gate = gate
+        self.dedup = dedup
+        self.processed = 0
+        self.faces_added = 0
+        self.assigned = 0
+        self.removed = 0
+        self.batches = 0
+        self.last_batch = None
+        self.busy_since = None
+
+    def _root_of(self, path):
+        for r in self.roots:
+            if path == r or path.startswith(os.path.join(r, "")):
+                return r
+        return None
+
+    def handle(self, batch):
+        """Process one ``{path: kind}`` batch from ``FolderWatcher.take_ready``."""
+        if not batch:
+            return
+        self.busy_since = time.monotonic()
+        try:
+            self._handle(batch)
+        finally:
+            self.busy_since = None
+            self.batches += 1
+            self.last_batch = time.time()
+
+    def _handle(self, batch):
+        since = self.db.max_face_id()
+        added = 0
+        by_root = {}
+        deleted = []
+        for path, kind in batch.items():
+            if kind == DELETED:
+                deleted.append(path)
+            elif kind == RESCAN:
+                removed, changed, fresh = diff_folder(self.db, path)
+                apply_diff(self.db, removed, changed)
+                self.removed += len(removed)
+                by_root.setdefault(path, set()).update(fresh)
+            else:
+                root = self._root_of(path)
+                if root is not None and os.path.isfile(path):
+                    by_root.setdefault(root, set()).add(path)
+
+        if deleted:
+            ids = {iid for iid, _ in self.db.get_images_by_path(deleted).values()}
+            for d in deleted:
+                # a removed directory takes everything below it along
+                ids.update(row[0] for row in self.db.get_images_under(d))
+            if ids:
+                self.db.remove_images(ids)
+                self.removed += len(ids)
+
+        for root, paths in by_root.items():
+            paths = sorted(paths)
+            known = self.db.get_images_by_path(paths)
+            changed = {}
+            for p, (iid, _) in known.items():
+                try:
+                    changed[iid] = os.stat(p).st_mtime
+                except OSError:
+                    pass
+            if changed:
+                self.db.forget_faces(changed, mtimes=changed)
+            added += index_folder(self.db, self.engine, root, images=paths,
+                                  thumbs=self.thumbs, metrics=self.metrics, gate=self.gate,
+                                  dedup=self.dedup)["faces"]
+            self.processed += len(paths)
+        self.faces_added += added
+
+        if added:
+            self.assigned += self.db.assign_unclustered(since, self.assign_dist)
+            self.db.update_representatives()
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "faces_added": self.faces_added,
+            "assigned": self.assigned,
+            "removed": self.removed,
+            "batches": self.batches,
+            "last_batch": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.last_batch))
+            if self.last_batch else None,
+            "busy_s": round(time.monotonic() - self.busy_since, 3) if self.busy_since else 0.0,
+        }
+
+
+def watch_status_path(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "watch_status.json")
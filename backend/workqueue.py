@@ -0,0 +1,185 @@
+"""Index one library with several processes or machines pulling from a queue.
+
+The queue is the main faces.db: ``enqueue_folder`` records a folder's new
+and changed files as unscanned ``images`` rows, and each worker claims a
+batch of them (a lease, see ``FaceDB.claim_images``), keeps the lease alive
+from a heartbeat thread while its engine runs, and hands the batch back.
+A worker that dies simply lets its leases run out and another one picks
+the images up, up to ``max_attempts`` times.
+
+Results go either straight into the queue DB (shared mode: fine for
+processes on one box; SQLite locking over SMB/NFS can't be trusted with
+many writers) or into a private shard DB per worker, which only touches
+the queue to claim and finish batches. ``merge_shards`` folds the shards
+into the main DB afterwards.
+"""
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+try:
+    from backend.indexer import index_folder, diff_folder, apply_diff
+    from backend.metrics import RunMetrics
+    from backend.utils import rel_to
+except ModuleNotFoundError:
+    from indexer import index_folder, diff_folder, apply_diff
+    from metrics import RunMetrics
+    from utils import rel_to
+
+_SEP = re.compile(r"[\\/]+")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def shard_name(path):
+    """Name a shard DB is recorded under in the queue: its file name without extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def parse_path_map(specs):
+    """``["SRC=DST", ...]`` -> [(src, dst)]: where queued paths live on this machine."""
+    out = []
+    for spec in specs or ():
+        src, sep, dst = spec.partition("=")
+        if not sep or not src:
+            raise ValueError(f"path map must look like SRC=DST: {spec}")
+        out.append((src, dst))
+    return out
+
+
+def map_path(path, path_map):
+    """Rewrite ``path`` with the first matching (src, dst) prefix, in this OS's separators."""
+    for src, dst in path_map:
+        if os.path.normcase(path).startswith(os.path.normcase(src)):
+            rest = [p for p in _SEP.split(path[len(src):]) if p]
+            return os.path.join(dst, *rest)
+    return path
+
+
+def _root_of(path, rel):
+    """The library root ``path`` was queued under, given its stored ``rel`` path."""
+    parts = [p for p in _SEP.split(rel) if p]
+    tail = os.path.join(*parts) if parts else ""
+    if tail and path.endswith(tail) and len(path) > len(tail):
+        return path[:-len(tail)].rstrip("\\/") or os.sep
+    return os.path.dirname(path)
+
+
+def enqueue_folder(db, folder, images=None):
+    """Queue every new or changed file under ``folder`` (deleted ones are dropped).
+
+    Returns (queued, removed, changed).
+    """
+    removed, changed, fresh = diff_folder(db, folder, images)
+    apply_diff(db, removed, changed)
+    queued = 0
+    for p in fresh:
+        try:
+            db.ensure_image(rel_to(p, folder), p)
+            queued += 1
+        except OSError:
+            pass  # vanished since the walk
+    return queued, len(removed), len(changed)
+
+
+class _Heartbeat(threading.Thread):
+    """Renews a claim every third of its lease until stopped."""
+
+    def __init__(self, db, token, lease_s):
+        super().__init__(name="queue-heartbeat", daemon=True)
+        self.db = db
+        self.token = token
+        self.lease_s = lease_s
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.lease_s / 3.0):
+            try:
+                self.db.renew_claim(self.token, self.lease_s)
+            except sqlite3.Error:
+                pass  # queue busy: the next beat is still well inside the lease
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def run_worker(queue_db, engine, shard_db=None, worker_id=None, batch=16, lease_s=600.0, max_attempts=3,
+               path_map=(), gate=None, dedup=None, prefilter=None, thumbs=None, metrics=None, should_stop=None,
+               wait=False, progress=None):
+    """Claim and index batches from ``queue_db`` until nothing is left.
+
+    shard_db: FaceDB the results go into (default: the queue DB itself);
+        the queue credits it under ``shard_name(shard_db.path)``
+    path_map: [(src, dst)] prefixes translating queued paths to local ones
+    gate, dedup, prefilter, thumbs: passed on to ``index_folder`` for every batch
+    wait: when nothing is claimable but other workers still hold leases,
+        wait for them (a lease may expire and come back) instead of exiting
+    progress: optional callable(done, total, faces_added), per batch
+    Returns dict with 'batches', 'images', 'faces' and 'errors'.
+    """
+    m = metrics or RunMetrics(enabled=False)
+    target = shard_db if shard_db is not None else queue_db
+    shard = shard_name(shard_db.path) if shard_db is not None else None
+    owner = worker_id or default_worker_id()
+    m.info["worker"] = owner
+    res = {"batches": 0, "images": 0, "faces": 0, "errors": 0}
+    while not (should_stop and should_stop()):
+        with m.stage("queue.claim"):
+            token, rows = queue_db.claim_images(owner, batch, lease_s, max_attempts)
+        if not rows:
+            if wait and queue_db.queue_stats(max_attempts)["leased"]:
+                time.sleep(min(30.0, lease_s / 4.0))
+                continue
+            break
+        beat = _Heartbeat(queue_db, token, lease_s)
+        beat.start()
+        done_ids = []
+        try:
+            groups = {}
+            for iid, rel, abs_path, attempts in rows:
+                local = map_path(abs_path, path_map)
+                groups.setdefault(_root_of(local, rel), []).append((iid, local, attempts))
+            for root, items in groups.items():
+                paths = [p for _, p, _ in items]
+                retried = [(iid, p) for iid, p, a in items if a > 1]
+                if retried:
+                    # a worker died on these: drop whatever faces it got to write
+                    if shard is None:
+                        target.forget_faces(iid for iid, _ in retried)
+                    else:
+                        target.forget_faces(i for i, _ in target.get_images_by_path(p for _, p in retried).values())
+                done = index_folder(target, engine, root, images=paths, thumbs=thumbs, metrics=m,
+                                    should_stop=should_stop, gate=gate, dedup=dedup, prefilter=prefilter)
+                res["faces"] += done["faces"]
+                res["errors"] += done["errors"]
+                if shard is not None:
+                    known = target.get_images_by_path(paths)
+                    done_ids += [iid for iid, p, _ in items if p in known and target.is_indexed(known[p][0])]
+        finally:
+            beat.stop()
+            with m.stage("queue.finish"):
+                queue_db.finish_claim(token, shard=shard, done_ids=done_ids)
+        res["batches"] += 1
+        res["images"] += len(rows)
+        if progress:
+            q = queue_db.queue_stats(max_attempts)
+            progress(res["images"], res["images"] + q["pending"] + q["leased"], res["faces"])
+    return res
+
+
+def merge_shards(db, shard_paths, progress=None):
+    """Fold shard DBs into ``db``; returns one dict per shard (see ``FaceDB.merge_shard``)."""
+    out = []
+    paths = list(shard_paths)
+    for i, path in enumerate(paths):
+        res = db.merge_shard(path, shard=shard_name(path))
+        out.append(dict(res, shard=shard_name(path), path=path))
+        if progress:
+            progress(i + 1, len(paths), sum(r["faces"] for r in out))
+    return out
@@ -0,0 +1,6 @@
+"""Offline benchmark suite for the indexing, search and clustering hot paths.
+
+Runs without a GUI or the real face model: ``bench.stubs.StubEngine``
+stands in for FaceEngine and ``bench.synth`` generates images and
+embeddings. See ``python -m bench --help``.
+"""
@@ -0,0 +1,87 @@
+"""Miss rate and time saved by the faceless-image prefilter on a fixture folder.
+
+Every image goes through the prefilter's small decode and detector (its
+score is kept, so several thresholds are evaluated from one pass) and
+through the full FaceEngine pipeline. A miss is an image the prefilter
+would skip although the full pipeline finds a face the default
+QualityGate keeps. Needs the real face engine and a folder of photos that
+resembles the library (faceless shots, portraits, groups, small faces).
+"""
+import json
+import time
+
+DEFAULT_THRESHOLDS = (0.2, 0.3, 0.4, 0.5)
+
+
+def measure(paths, engine, log=print):
+    from backend.prefilter import Prefilter, small_image
+    from backend.quality import QualityGate
+    pf = Prefilter(engine)
+    gate = QualityGate()
+    rows = []
+    for i, path in enumerate(paths, 1):
+        t0 = time.perf_counter()
+        got = small_image(path, pf.side)
+        score = source = None
+        if got is not None and max(got[2]) <= pf.max_shrink * pf.side:
+            source = got[1]
+            score = pf.score(got[0])
+        t_pf = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        dets = engine.extract_faces(path)
+        t_full = time.perf_counter() - t0
+        kept = sum(1 for d in dets if not gate.reasons(d))
+        rows.append({"path": path, "score": score, "source": source, "prefilter_s": t_pf,
+                     "full_s": t_full, "faces": kept})
+        if i % 50 == 0:
+            log(f"  {i}/{len(paths)}")
+    return rows
+
+
+def evaluate(rows, thresh):
+    skipped = [r for r in rows if r["score"] is not None and r["score"] < thresh]
+    missed = [r for r in skipped if r["faces"]]
+    with_faces = sum(1 for r in rows if r["faces"])
+    full = sum(r["full_s"] for r in rows)
+    cost = sum(r["prefilter_s"] for r in rows)
+    saved = sum(r["full_s"] for r in skipped) - cost
+    return {
+        "thresh": thresh,
+        "skipped": len(skipped),
+        "skipped_share": len(skipped) / max(1, len(rows)),
+        "missed": len(missed),
+        "miss_rate": len(missed) / max(1, with_faces),
+        "faces_missed": sum(r["faces"] for r in missed),
+        "time_saved_share": saved / full if full else 0.0,
+        "missed_files": [r["path"] for r in missed],
+    }
+
+
+def main(args, log=print):
+    from backend.face_engine import FaceEngine
+    from backend.utils import find_images
+    paths = sorted(find_images(args.folder))
+    if args.limit:
+        paths = paths[:args.limit]
+    thresholds = [float(t) for t in args.thresholds.split(",")] if args.thresholds else DEFAULT_THRESHOLDS
+    engine = FaceEngine()
+    rows = measure(paths, engine, log)
+    with_faces = sum(1 for r in rows if r["faces"])
+    sources = {}
+    for r in rows:
+        sources[r["source"] or "passed"] = sources.get(r["source"] or "passed", 0) + 1
+    log(f"{len(rows)} images, {with_faces} with faces; small image from {sources}")
+    log(f"mean prefilter {1e3 * sum(r['prefilter_s'] for r in rows) / max(1, len(rows)):.1f} ms, "
+        f"full pipeline {1e3 * sum(r['full_s'] for r in rows) / max(1, len(rows)):.1f} ms per image")
+    out = []
+    for t in thresholds:
+        ev = evaluate(rows, t)
+        out.append(ev)
+        log(f"thresh {t:.2f}: skips {ev['skipped_share']:6.1%}  misses {ev['missed']} "
+            f"({ev['miss_rate']:.2%} of images with faces, {ev['faces_missed']} faces)  "
+            f"time saved {ev['time_saved_share']:6.1%}")
+    doc = {"images": len(rows), "with_faces": with_faces, "sources": sources, "thresholds": out, "rows": rows}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+    return doc
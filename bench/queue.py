@@ -0,0 +1,99 @@
+"""Several queue workers against a temporary library, checked against a single process.
+
+The library is empty image-named files; StubEngine makes faces up from each
+path, so every run knows exactly which faces each image must end up with.
+Workers are separate processes, first all writing into the shared queue DB,
+then each into its own shard DB followed by a merge. With ``crash`` one
+more worker claims a batch, writes a stray face and dies holding the lease,
+so the others have to wait for it to expire and clean up after it.
+"""
+import multiprocessing as mp
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from bench import synth
+from bench.stubs import StubEngine
+
+
+def _worker(db_path, shard_path, batch, lease_s, crash, results):
+    from backend.db import FaceDB
+    from backend.workqueue import run_worker
+    queue = FaceDB(db_path, timeout=60.0)
+    shard = FaceDB(shard_path) if shard_path else None
+    if crash:
+        target = shard or queue
+        _, rows = queue.claim_images("crasher", batch, lease_s)
+        if rows:
+            _, rel, abs_path, _ = rows[0]
+            target.add_face(target.ensure_image(rel, abs_path), [0, 0, 1, 1], None)
+        os._exit(1)
+    res = run_worker(queue, StubEngine(), shard_db=shard, batch=batch, lease_s=lease_s, wait=True)
+    results.put(dict(res, pid=os.getpid()))
+
+
+def _check(db_path, expected):
+    """Compare faces per image in the DB with what StubEngine gives; returns a list of problems."""
+    con = sqlite3.connect(db_path)
+    got = dict(con.execute("""SELECT i.abs_path, COUNT(f.id) FROM images i
+                              LEFT JOIN faces f ON f.image_id = i.id GROUP BY i.id"""))
+    unscanned = con.execute("SELECT COUNT(1) FROM images WHERE scanned=0 OR shard IS NOT NULL").fetchone()[0]
+    con.close()
+    problems = [f"{p}: {got.get(p)} faces, expected {n}" for p, n in expected.items() if got.get(p) != n]
+    if unscanned:
+        problems.append(f"{unscanned} image(s) not indexed")
+    return problems
+
+
+def run_mode(lib, paths, expected, workers, batch, lease_s, shards, crash, log=print):
+    from backend.db import FaceDB
+    from backend.workqueue import enqueue_folder, merge_shards
+    work = tempfile.mkdtemp(prefix="facerec-queue-")
+    db_path = os.path.join(work, "faces.db")
+    try:
+        queued = enqueue_folder(FaceDB(db_path), lib, images=paths)[0]
+        ctx = mp.get_context("spawn")
+        results = ctx.Queue()
+        procs = []
+        t0 = time.perf_counter()
+        for i in range(workers + (1 if crash else 0)):
+            shard = os.path.join(work, f"shard-{i}.db") if shards else None
+            p = ctx.Process(target=_worker, args=(db_path, shard, batch, lease_s, crash and i == 0, results))
+            p.start()
+            procs.append(p)
+            if crash and i == 0:
+                p.join()  # dies holding its claim before the others start
+        per_worker = [results.get() for _ in range(workers)]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        merged = None
+        if shards:
+            db = FaceDB(db_path)
+            merged = merge_shards(db, [os.path.join(work, f"shard-{i}.db") for i in range(len(procs))])
+        q = FaceDB(db_path).queue_stats()
+        problems = _check(db_path, expected)
+        mode = "shards" if shards else "shared"
+        log(f"{mode:7s} {workers} workers  {queued} images in {elapsed:6.2f} s  "
+            f"per worker: {sorted(r['images'] for r in per_worker)}  "
+            + ("OK" if not problems else f"{len(problems)} problem(s): {problems[:3]}"))
+        return {"mode": mode, "queued": queued, "elapsed_s": round(elapsed, 3), "workers": per_worker,
+                "merged": merged, "queue": q, "problems": problems}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main(args, log=print):
+    lib = tempfile.mkdtemp(prefix="facerec-lib-")
+    try:
+        paths = synth.file_tree(lib, args.images, per_dir=50)
+        engine = StubEngine()
+        expected = {p: len(engine.extract_faces(p)) for p in paths}
+        log(f"{len(paths)} images, {sum(expected.values())} faces expected")
+        out = [run_mode(lib, paths, expected, args.workers, args.batch, args.lease, shards, args.crash, log)
+               for shards in (False, True)]
+    finally:
+        shutil.rmtree(lib, ignore_errors=True)
+    return out
@@ -0,0 +1,69 @@
+"""Indexing with decoder processes (shm_ring) checked against inline decoding.
+
+A temporary library of synthetic JPEGs is indexed twice with a StubEngine
+that derives its faces from a hash of the decoded pixels: once decoding
+inline, once through the shared-memory ring. Any difference in the frames
+the engine sees (downscaling, a wrong slot, a stale frame) shows up as
+different faces. The library includes an image larger than a ring slot
+and an unreadable file.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from bench import synth
+from bench.stubs import StubEngine
+
+
+def _faces(db_path):
+    """{rel_path: sorted [(bbox, embedding bytes)]} of every scanned image."""
+    con = sqlite3.connect(db_path)
+    out = {}
+    for rel, bbox, emb in con.execute("""SELECT i.rel_path, f.bbox, f.embedding FROM images i
+                                         LEFT JOIN faces f ON f.image_id = i.id WHERE i.scanned = 1"""):
+        faces = out.setdefault(rel, [])
+        if bbox is not None:
+            faces.append((bbox, emb))
+    con.close()
+    return {rel: sorted(f) for rel, f in out.items()}
+
+
+def _index(lib, db_path, decoders):
+    from backend.db import FaceDB
+    from backend.indexer import index_folder
+    db = FaceDB(db_path)
+    t0 = time.perf_counter()
+    res = index_folder(db, StubEngine(decode=True), lib, decoders=decoders)["faces"]
+    elapsed = time.perf_counter() - t0
+    db.conn.close()
+    return res, elapsed
+
+
+def main(args, log=print):
+    lib = tempfile.mkdtemp(prefix="facerec-ring-")
+    work = tempfile.mkdtemp(prefix="facerec-ring-db-")
+    try:
+        paths = synth.jpeg_images(lib, args.images, size=(2400, 1600))
+        # a panorama over the slot size (4096 x 3072) is decoded by the consumer
+        paths += synth.jpeg_images(lib, 1, size=(7200, 1800), seed=1)
+        with open(os.path.join(lib, "broken.jpg"), "wb") as f:
+            f.write(b"not a jpeg")
+        inline, t_inline = _index(lib, os.path.join(work, "inline.db"), 0)
+        ring, t_ring = _index(lib, os.path.join(work, "ring.db"), args.decoders)
+        a, b = _faces(os.path.join(work, "inline.db")), _faces(os.path.join(work, "ring.db"))
+        problems = [f"{rel}: {len(b.get(rel, []))} faces via the ring, {len(a.get(rel, []))} inline"
+                    + ("" if len(a.get(rel, [])) != len(b.get(rel, [])) else " (different boxes or embeddings)")
+                    for rel in sorted(set(a) | set(b)) if a.get(rel) != b.get(rel)]
+        log(f"{len(paths) + 1} files: inline {inline} faces in {t_inline:.2f}s, "
+            f"{args.decoders} decoders {ring} faces in {t_ring:.2f}s")
+        for p in problems:
+            log("MISMATCH " + p)
+        if not problems:
+            log("ring and inline decoding gave the same faces")
+        return {"files": len(paths) + 1, "faces_inline": inline, "faces_ring": ring,
+                "inline_s": t_inline, "ring_s": t_ring, "problems": problems}
+    finally:
+        shutil.rmtree(lib, ignore_errors=True)
+        shutil.rmtree(work, ignore_errors=True)
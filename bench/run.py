@@ -0,0 +1,449 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import synth
+from bench.stubs import StubEngine
+
+# name -> (size group, function(size, workdir) -> (run_callable, items))
+BENCHES = {}
+
+
+def bench(name, group="sizes"):
+    def deco(fn):
+        BENCHES[name] = (group, fn)
+        return fn
+    return deco
+
+
+class Skip(Exception):
+    pass
+
+
+def _fresh_db(path, n_faces, n_people=None, seed=0):
+    """Create a FaceDB with ``n_faces`` synthetic faces, clustered by identity."""
+    from backend.db import FaceDB
+    if os.path.exists(path):
+        os.remove(path)
+    db = FaceDB(path)
+    n_people = n_people or max(2, n_faces // 20)
+    X, ids = synth.identity_embeddings(n_faces, n_people, seed=seed)
+    cur = db.conn.cursor()
+    n_images = max(1, n_faces // 2)
+    cur.executemany("INSERT INTO images(id, rel_path, abs_path, mtime) VALUES(?,?,?,0)",
+                    [(i + 1, f"img_{i}.jpg", f"/lib/img_{i}.jpg") for i in range(n_images)])
+    cur.executemany("INSERT INTO clusters(id, label) VALUES(?,?)",
+                    [(p + 1, f"Person #{p + 1}") for p in range(n_people)])
+    cur.executemany("INSERT INTO faces(image_id, bbox, embedding, cluster_id, det_score) VALUES(?,?,?,?,?)",
+                    [((i % n_images) + 1, "[0, 0, 100, 100]", X[i], int(ids[i]) + 1, 0.9) for i in range(n_faces)])
+    db.conn.commit()
+    return db
+
+
+# ---------- Benchmarks ----------
+@bench("find_images")
+def b_find_images(n, work):
+    from backend.utils import find_images
+    root = os.path.join(work, "tree")
+    synth.file_tree(root, n)
+    return (lambda: find_images(root)), n
+
+
+@bench("decode.face_engine", group="megapixels")
+def b_decode_engine(mp, work):
+    try:
+        from backend.face_engine import decode_image
+    except ImportError as e:
+        raise Skip(str(e))
+    w = int((mp * 1e6 * 4 / 3) ** 0.5)
+    paths = synth.jpeg_images(os.path.join(work, f"jpg{mp}"), 4, size=(w, w * 3 // 4))
+    return (lambda: [decode_image(p) for p in paths]), len(paths)
+
+
+@bench("decode.crop_batch", group="megapixels")
+def b_decode_crops(mp, work):
+    from backend.utils import render_face_crops, DecodedImageLRU
+    w = int((mp * 1e6 * 4 / 3) ** 0.5)
+    paths = synth.jpeg_images(os.path.join(work, f"jpgc{mp}"), 4, size=(w, w * 3 // 4))
+    s = w // 10
+    reqs = [(p, [x, s, x + s, 2 * s]) for p in paths for x in (s, 3 * s, 5 * s)]
+
+    def run():
+        # fresh LRU so every run pays the decode
+        render_face_crops(reqs, size=160, lru=DecodedImageLRU())
+    return run, len(reqs)
+
+
+@bench("db.insert")
+def b_db_insert(n, work):
+    from backend.db import FaceDB
+    X, _ = synth.identity_embeddings(n, max(2, n // 20))
+    path = os.path.join(work, "insert.db")
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        db = FaceDB(path)
+        img = db.ensure_image("a.jpg", __file__)
+        for e in X:
+            db.add_face(img, [0, 0, 10, 10], e, 0.9)
+        db.conn.close()
+    return run, n
+
+
+@bench("db.get_all_embeddings")
+def b_db_all(n, work):
+    db = _fresh_db(os.path.join(work, "all.db"), n)
+    return db.get_all_embeddings, n
+
+
+@bench("db.get_faces_by_cluster")
+def b_db_by_cluster(n, work):
+    db = _fresh_db(os.path.join(work, "bycl.db"), n)
+    ids = [r[0] for r in db.list_clusters()[:20]]
+    return (lambda: [db.get_faces_by_cluster(c) for c in ids]), len(ids)
+
+
+@bench("db.list_clusters")
+def b_db_list(n, work):
+    db = _fresh_db(os.path.join(work, "list.db"), n)
+    return db.list_clusters, 1
+
+
+@bench("db.export_index")
+def b_db_export(n, work):
+    from backend.transfer import export_index
+    db = _fresh_db(os.path.join(work, "export.db"), n)
+    return (lambda: export_index(db, os.path.join(work, "export.npz"))), n
+
+
+@bench("db.import_index")
+def b_db_import(n, work):
+    from backend.db import FaceDB
+    from backend.transfer import export_index, import_index
+    src = os.path.join(work, "export.npz")
+    export_index(_fresh_db(os.path.join(work, "export.db"), n), src)
+    path = os.path.join(work, "import.db")
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        db = FaceDB(path)
+        import_index(db, src)
+        db.conn.close()
+    return run, n
+
+
+@bench("cluster.dbscan", group="cluster_sizes")
+def b_cluster(n, work):
+    try:
+        from backend.cluster import Clusterer
+        Clusterer().cluster(list(synth.identity_embeddings(10, 2)[0]))
+    except ImportError as e:
+        raise Skip(str(e))
+    X, _ = synth.identity_embeddings(n, max(2, n // 20))
+    embs = list(X)
+    return (lambda: Clusterer().cluster(embs)), n
+
+
+@bench("suggest_merges", group="cluster_sizes")
+def b_suggest(n, work):
+    db = _fresh_db(os.path.join(work, "merge.db"), n)
+    return (lambda: db.suggest_merges()), len(db.list_clusters())
+
+
+@bench("quickfind.score")
+def b_quickfind(n, work):
+    from backend.search import best_match
+    eng = StubEngine()
+    dets = [eng.extract_faces(f"/lib/img_{i}.jpg") for i in range(n)]
+    ref = eng.centres[0]
+
+    def run():
+        for d in dets:
+            best_match(ref, d)
+    return run, n
+
+
+def _search_setup(n, mode, queries=20):
+    from backend.quant import QuantizedMatrix
+    X, ids = synth.identity_embeddings(n, max(2, n // 20))
+    rng = np.random.default_rng(1)
+    Q = X[rng.integers(0, n, size=queries)]
+    return X, QuantizedMatrix.from_array(X, mode), Q
+
+
+@bench("search.top_k")
+def b_search_f32(n, work):
+    from backend.search import top_k
+    X, _, Q = _search_setup(n, "float32")
+    return (lambda: [top_k(q, X, 50, 0.3) for q in Q]), len(Q)
+
+
+@bench("search.top_k.int8")
+def b_search_i8(n, work):
+    from backend.search import top_k_quantized
+    X, qm, Q = _search_setup(n, "int8")
+    return (lambda: [top_k_quantized(q, qm, 50, 0.3, exact=lambda ix: X[ix]) for q in Q]), len(Q)
+
+
+@bench("index.stub_engine")
+def b_index(n, work):
+    from backend.db import FaceDB
+    from backend.indexer import index_folder
+    from backend.metrics import RunMetrics
+    root = os.path.join(work, "idx")
+    synth.file_tree(root, n, other_every=0)
+    eng = StubEngine()
+    path = os.path.join(work, "index.db")
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        db = FaceDB(path)
+        # instrumentation on, so its overhead shows up here
+        index_folder(db, eng, root, metrics=RunMetrics())
+        db.conn.close()
+    return run, n
+
+
+# ---------- Runner ----------
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_suite(groups, only=None, repeat=3, log=print):
+    results = {}
+    for name, (group, fn) in BENCHES.items():
+        if only and not any(name.startswith(o) for o in only):
+            continue
+        results[name] = {}
+        for size in groups[group]:
+            work = tempfile.mkdtemp(prefix="facerec-bench-")
+            try:
+                try:
+                    run, items = fn(size, work)
+                except Skip as e:
+                    results[name][str(size)] = {"skipped": str(e)}
+                    log(f"{name:28s} {size:>8}  skipped ({e})")
+                    continue
+                run()  # warm-up (page cache, imports, sqlite statement cache)
+                times = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    run()
+                    times.append(time.perf_counter() - t0)
+                med = statistics.median(times)
+                results[name][str(size)] = {
+                    "median_s": med,
+                    "min_s": min(times),
+                    "runs": times,
+                    "items": items,
+                    "us_per_item": med / max(1, items) * 1e6,
+                }
+                log(f"{name:28s} {size:>8}  {med * 1e3:10.2f} ms  {med / max(1, items) * 1e6:10.2f} us/item")
+            finally:
+                shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def compare(base_path, new_path, threshold=0.15, log=print):
+    """Print per-benchmark ratios new/base; return the number of regressions."""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for name in sorted(set(base) & set(new)):
+        for size in sorted(set(base[name]) & set(new[name]), key=lambda s: float(s)):
+            a, b = base[name][size], new[name][size]
+            if "median_s" not in a or "median_s" not in b:
+                continue
+            ratio = b["median_s"] / max(a["median_s"], 1e-12)
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            log(f"{name:28s} {size:>8}  {a['median_s'] * 1e3:10.2f} -> {b['median_s'] * 1e3:10.2f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def quant_report(sizes, queries=200, k=50, rerank=4, log=print):
+    """Recall, speed and memory of the compact embedding formats against float32.
+
+    recall@k is the share of the exact float32 top-k that each format finds,
+    before and after re-ranking ``k * rerank`` candidates against the vectors
+    a DB in that format actually stores (``get_embeddings`` decodes them).
+    """
+    from backend.quant import MODES, QuantizedMatrix, decode, encode
+    from backend.search import top_k, top_k_quantized
+    out = {}
+    for n in sizes:
+        X, _ = synth.identity_embeddings(n, max(2, n // 20))
+        rng = np.random.default_rng(1)
+        Q = X[rng.integers(0, n, size=queries)]
+        truth = [set(top_k(q, X, k)[0].tolist()) for q in Q]
+        t0 = time.perf_counter()
+        for q in Q:
+            top_k(q, X, k)
+        base_s = (time.perf_counter() - t0) / queries
+        out[str(n)] = {}
+        for mode in MODES:
+            qm = QuantizedMatrix.from_array(X, mode)
+            stored = np.vstack([decode(encode(x, mode)) for x in X])
+            t0 = time.perf_counter()
+            raw = [top_k_quantized(q, qm, k, rerank=1)[0] for q in Q]
+            scan_s = (time.perf_counter() - t0) / queries
+            t0 = time.perf_counter()
+            rr = [top_k_quantized(q, qm, k, rerank=rerank, exact=lambda ix: stored[ix])[0] for q in Q]
+            rerank_s = (time.perf_counter() - t0) / queries
+            rec_raw = float(np.mean([len(truth[i] & set(r.tolist())) / k for i, r in enumerate(raw)]))
+            rec_rr = float(np.mean([len(truth[i] & set(r.tolist())) / k for i, r in enumerate(rr)]))
+            row = {
+                "matrix_bytes": qm.nbytes,
+                "memory_ratio": qm.nbytes / X.nbytes,
+                "blob_bytes": len(encode(X[0], mode)),
+                "query_ms": scan_s * 1e3,
+                "query_rerank_ms": rerank_s * 1e3,
+                "speedup_vs_float32": base_s / max(scan_s, 1e-12),
+                "recall": rec_raw,
+                "recall_rerank": rec_rr,
+            }
+            out[str(n)][mode] = row
+            log(f"{n:>9} {mode:8s} {qm.nbytes / 2**20:9.1f} MiB  blob {row['blob_bytes']:5d} B  "
+                f"{row['query_ms']:8.2f} ms ({row['speedup_vs_float32']:4.2f}x)  "
+                f"recall@{k} {rec_raw:.4f} -> {rec_rr:.4f} reranked")
+    return out
+
+
+def _sizes(text):
+    return [float(s) if "." in s else int(s) for s in text.split(",") if s.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    sub = ap.add_subparsers(dest="cmd")
+    r = sub.add_parser("run", help="run the suite and write JSON results")
+    r.add_argument("--sizes", default="1000,10000", help="dataset sizes for walk/db/search benchmarks")
+    r.add_argument("--cluster-sizes", default="1000,4000", help="face counts for clustering benchmarks (O(n^2) memory)")
+    r.add_argument("--megapixels", default="2,12", help="image sizes for decode benchmarks")
+    r.add_argument("--repeat", type=int, default=3)
+    r.add_argument("--only", action="append", help="run benchmarks whose name starts with this (repeatable)")
+    r.add_argument("-o", "--out", help="write results JSON here (default: bench_results/<commit>.json)")
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    sub.add_parser("list", help="list benchmarks")
+    q = sub.add_parser("quant", help="recall/speed/memory of float16 and int8 search against float32")
+    q.add_argument("--sizes", default="10000,100000")
+    q.add_argument("--queries", type=int, default=200)
+    q.add_argument("--k", type=int, default=50)
+    q.add_argument("--rerank", type=int, default=4, help="candidates re-ranked per result")
+    q.add_argument("-o", "--out", help="also write the report as JSON")
+    s = sub.add_parser("startup", help="import times of the entry modules and time until window/engine ready")
+    s.add_argument("--no-gui", action="store_true", help="only the -X importtime reports (no display needed)")
+    s.add_argument("--exe", help="also launch this PyInstaller build (dist/FaceRecognition/FaceRecognition)")
+    s.add_argument("--timeout", type=float, default=120.0)
+    s.add_argument("-o", "--out", help="also write the report as JSON")
+    f = sub.add_parser("prefilter", help="miss rate and time saved by --prefilter on a folder of fixture photos")
+    f.add_argument("folder")
+    f.add_argument("--limit", type=int, default=0, help="only the first N images")
+    f.add_argument("--thresholds", help="comma separated detector scores to evaluate (default 0.2,0.3,0.4,0.5)")
+    f.add_argument("-o", "--out", help="also write per-image results as JSON")
+    w = sub.add_parser("queue", help="several work-queue processes on a temp library, shared DB and shards")
+    w.add_argument("--workers", type=int, default=4)
+    w.add_argument("--images", type=int, default=400)
+    w.add_argument("--batch", type=int, default=8)
+    w.add_argument("--lease", type=float, default=3.0, help="lease seconds (short, so --crash recovers quickly)")
+    w.add_argument("--crash", action="store_true", help="also start a worker that dies holding a claim")
+    w.add_argument("-o", "--out", help="also write the report as JSON")
+    g = sub.add_parser("ring", help="check that decoder processes give the same faces as inline decoding")
+    g.add_argument("--images", type=int, default=12)
+    g.add_argument("--decoders", type=int, default=2)
+    g.add_argument("-o", "--out", help="also write the report as JSON")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "list":
+        for name, (group, _) in BENCHES.items():
+            print(f"{name:28s} ({group})")
+        return 0
+    if args.cmd == "startup":
+        from bench import startup
+        startup.main(args)
+        return 0
+    if args.cmd == "prefilter":
+        from bench import prefilter
+        prefilter.main(args)
+        return 0
+    if args.cmd == "queue":
+        from bench import queue
+        rep = queue.main(args)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(rep, f, indent=2)
+        return 1 if any(r["problems"] for r in rep) else 0
+    if args.cmd == "ring":
+        from bench import ring
+        rep = ring.main(args)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(rep, f, indent=2)
+        return 1 if rep["problems"] else 0
+    if args.cmd == "quant":
+        rep = quant_report(_sizes(args.sizes), args.queries, args.k, args.rerank)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(rep, f, indent=2)
+        return 0
+    if args.cmd == "compare":
+        return 1 if compare(args.base, args.new, args.threshold) else 0
+    if args.cmd != "run":
+        ap.print_help()
+        return 2
+
+    groups = {"sizes": _sizes(args.sizes), "cluster_sizes": _sizes(args.cluster_sizes),
+              "megapixels": _sizes(args.megapixels)}
+    commit = _git_commit()
+    results = run_suite(groups, args.only, args.repeat)
+    doc = {
+        "meta": {
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "groups": groups,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(ROOT, "bench_results", f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(f"wrote {out}")
+    return 0
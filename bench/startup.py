@@ -0,0 +1,114 @@
+"""Start-up cost: ``-X importtime`` per entry module, and time to window / engine ready.
+
+Import reports run each module in a fresh interpreter, so they work without
+a display. Window timings launch the GUI with FACEREC_STARTUP_REPORT set
+(see backend/startup.py) and need a display; a PyInstaller build can be
+measured the same way with ``--exe`` (build it with FACEREC_IMPORTTIME=1 to
+get its import times on stderr too).
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+ENTRY_MODULES = ("qt_main", "main", "facerec.cli", "backend.db", "backend.indexer", "backend.face_engine")
+GUI_SCRIPTS = ("qt_main.py", "main.py")
+# what a fast start must not pull in before the window shows
+HEAVY = ("sklearn", "scipy", "cv2", "insightface", "onnxruntime", "torch", "matplotlib")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(text, top=15):
+    """Summarise ``-X importtime`` stderr: total, slowest top-level imports, heavy modules seen."""
+    rows = []
+    for line in text.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2, m.group(4)))
+    roots = [r for r in rows if r[2] == 0]
+    heavy = sorted({name.split(".")[0] for _, _, _, name in rows if name.split(".")[0] in HEAVY})
+    return {
+        "total_ms": sum(r[1] for r in roots) / 1e3,
+        "modules": len(rows),
+        "slowest": [{"module": n, "cumulative_ms": c / 1e3, "self_ms": s / 1e3}
+                    for s, c, _, n in sorted(roots, key=lambda r: -r[1])[:top]],
+        "heavy": heavy,
+    }
+
+
+def _env():
+    env = dict(os.environ)
+    paths = [ROOT, os.path.join(ROOT, "backend")]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def import_report(modules=ENTRY_MODULES, log=print):
+    out = {}
+    for mod in modules:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {mod}"], cwd=ROOT,
+                              env=_env(), capture_output=True, text=True)
+        if proc.returncode != 0:
+            err = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+            out[mod] = {"skipped": err}
+            log(f"{mod:24s} skipped ({err})")
+            continue
+        rep = parse_importtime(proc.stderr)
+        out[mod] = rep
+        slow = ", ".join(f"{s['module']} {s['cumulative_ms']:.0f}" for s in rep["slowest"][:4])
+        log(f"{mod:24s} {rep['total_ms']:8.1f} ms  {rep['modules']:4d} modules  heavy: "
+            f"{','.join(rep['heavy']) or '-'}  [{slow}]")
+    return out
+
+
+def window_report(cmd, timeout=120.0, log=print, label=None):
+    """Launch ``cmd`` with a start-up report requested; returns its marks (seconds)."""
+    label = label or " ".join(cmd[-1:])
+    fd, path = tempfile.mkstemp(prefix="facerec-startup-", suffix=".json")
+    os.close(fd)
+    os.remove(path)
+    env = _env()
+    env["FACEREC_STARTUP_REPORT"] = path
+    env["FACEREC_STARTUP_T0"] = repr(time.time())
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        log(f"{label:24s} timed out after {timeout:.0f} s")
+        return {"skipped": "timeout"}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rep = json.load(f)
+        os.remove(path)
+    except (OSError, ValueError):
+        err = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+        log(f"{label:24s} skipped ({err})")
+        return {"skipped": err}
+    if "import time:" in proc.stderr:
+        rep["imports"] = parse_importtime(proc.stderr)
+    log(f"{label:24s} window {rep.get('window_shown_s', float('nan')):6.2f} s  "
+        f"engine {rep.get('engine_ready_s', float('nan')):6.2f} s"
+        + (f"  ({rep['error']})" if rep.get("error") else ""))
+    return rep
+
+
+def main(args, log=print):
+    doc = {"imports": import_report(log=log)}
+    if not args.no_gui:
+        doc["windows"] = {s: window_report([sys.executable, s], args.timeout, log) for s in GUI_SCRIPTS}
+    if args.exe:
+        doc["windows"] = dict(doc.get("windows", {}))
+        doc["windows"][os.path.basename(args.exe)] = window_report([os.path.abspath(args.exe)], args.timeout, log,
+                                                                   label=os.path.basename(args.exe))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+    return doc
@@ -0,0 +1,57 @@
+import hashlib
+import numpy as np
+
+from bench.synth import DIM
+
+
+class StubEngine:
+    """Deterministic stand-in for FaceEngine.
+
+    ``extract_faces(path)`` returns 0-``max_faces`` faces whose bboxes and
+    embeddings are derived from a hash of the path, with embeddings drawn
+    around ``n_people`` fixed identities so clustering has structure.
+    No image is read; ``decode=True`` decodes the file first (via the real
+    FaceEngine decode path) to include I/O in the measurement, and derives
+    the faces from the pixels instead, as ``extract_faces_array`` does.
+    """
+    def __init__(self, n_people=50, max_faces=3, spread=0.75, seed=0, decode=False):
+        rng = np.random.default_rng(seed)
+        C = rng.standard_normal((n_people, DIM)).astype(np.float32)
+        self.centres = C / np.linalg.norm(C, axis=1, keepdims=True)
+        self.max_faces = max_faces
+        self.spread = spread
+        self.decode = decode
+
+    def _rng(self, path):
+        h = hashlib.blake2b(path.encode("utf-8"), digest_size=8).digest()
+        return np.random.default_rng(int.from_bytes(h, "little"))
+
+    def extract_faces(self, image_path, metrics=None):
+        if self.decode:
+            from backend.face_engine import decode_image
+            img = decode_image(image_path)
+            if img is None:
+                return []
+            return self.extract_faces_array(img, metrics)
+        return self._faces(self._rng(image_path), 4000, 3000)
+
+    def extract_faces_array(self, img, metrics=None):
+        """Faces made up from a hash of the pixels: any change to the decoded frame changes them."""
+        h = hashlib.blake2b(img.tobytes(), digest_size=8)
+        h.update(repr(img.shape).encode("ascii"))
+        rng = np.random.default_rng(int.from_bytes(h.digest(), "little"))
+        return self._faces(rng, img.shape[1], img.shape[0])
+
+    def _faces(self, rng, w, h):
+        n = int(rng.integers(0, self.max_faces + 1))
+        out = []
+        for _ in range(n):
+            s = int(rng.integers(max(8, w // 40), max(16, w // 6)))
+            x = int(rng.integers(0, max(1, w - s)))
+            y = int(rng.integers(0, max(1, h - s)))
+            pid = int(rng.integers(0, len(self.centres)))
+            e = self.centres[pid] + self.spread * rng.standard_normal(DIM).astype(np.float32) / np.sqrt(DIM)
+            e = (e / np.linalg.norm(e)).astype(np.float32)
+            out.append({"bbox": [x, y, x + s, y + s], "embedding": e,
+                        "det_score": float(rng.uniform(0.5, 0.99))})
+        return out
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+
+DIM = 512
+
+
+def identity_embeddings(n_faces, n_people, dim=DIM, spread=0.75, seed=0):
+    """Return (embeddings, person_ids) with ``n_faces`` L2-normalised vectors
+    scattered around ``n_people`` random identity centres.
+
+    ``spread`` controls the intra-person noise: two faces of one person end
+    up at a cosine distance of about spread² / (1 + spread²), so the default
+    0.75 gives ~0.36, close to what buffalo_l produces.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_people, dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    ids = rng.integers(0, n_people, size=n_faces)
+    noise = rng.standard_normal((n_faces, dim)).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    X = centres[ids] + spread * noise
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    return X.astype(np.float32), ids
+
+
+def file_tree(root, n_files, per_dir=200, ext=".jpg", other_every=7):
+    """Create ``n_files`` empty image-named files (plus some non-images) under
+    ``root`` in nested folders, for directory-walk benchmarks."""
+    made = []
+    for i in range(n_files):
+        d = os.path.join(root, f"d{i // per_dir // 10:03d}", f"s{i // per_dir:04d}")
+        os.makedirs(d, exist_ok=True)
+        p = os.path.join(d, f"IMG_{i:07d}{ext}")
+        open(p, "wb").close()
+        made.append(p)
+        if other_every and i % other_every == 0:
+            open(os.path.join(d, f"notes_{i}.txt"), "wb").close()
+    return made
+
+
+def jpeg_images(root, count, size=(4000, 3000), seed=0, quality=90):
+    """Write ``count`` synthetic JPEGs of ``size`` (w, h) and return their paths.
+
+    Content is smooth noise so the encoder does real work and decode
+    timings resemble photos rather than flat colour.
+    """
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    out = []
+    w, h = size
+    for i in range(count):
+        small = rng.integers(0, 255, size=(max(1, h // 16), max(1, w // 16), 3), dtype=np.uint8)
+        img = Image.fromarray(small).resize((w, h), Image.BILINEAR)
+        p = os.path.join(root, f"synth_{w}x{h}_{i:04d}.jpg")
+        img.save(p, "JPEG", quality=quality)
+        out.append(p)
+    return out
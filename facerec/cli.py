@@ -0,0 +1,857 @@
+"""``python -m facerec`` — index, cluster, search and export without a GUI.
+
+Results go to stdout (tab separated, or one JSON document with ``--json``);
+progress and errors go to stderr. Exit codes: 0 success, 1 nothing found or
+some files failed, 2 usage error, 3 engine/database error, 130 interrupted.
+Backend modules are imported inside the commands so ``--help`` stays instant.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from backend.export import MODES  # stdlib only, cheap to import
+
+EXIT_OK = 0
+EXIT_EMPTY = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_INTERRUPTED = 130
+
+DEFAULT_DB = os.environ.get("FACEREC_DB") or os.path.join(HERE, "faces.db")
+
+
+class CliError(Exception):
+    """Fatal error reported on stderr with EXIT_ERROR."""
+
+
+# ---------- helpers ----------
+def _err(msg):
+    print(f"facerec: {msg}", file=sys.stderr)
+
+
+def _emit(args, doc, rows=None, header=None):
+    """Print ``doc`` as JSON, or ``rows`` (or ``doc`` as key/value lines) as TSV."""
+    if args.json:
+        json.dump(doc, sys.stdout, default=_json_default)
+        sys.stdout.write("\n")
+        return
+    if rows is not None:
+        if header and sys.stdout.isatty():
+            print("\t".join(header))
+        for r in rows:
+            print("\t".join("" if v is None else str(v) for v in r))
+    else:
+        for k, v in doc.items():
+            print(f"{k}\t{v}")
+
+
+def _json_default(o):
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    raise TypeError(f"not JSON serialisable: {type(o).__name__}")
+
+
+def _progress(args, verb, label="faces added"):
+    if args.quiet or not sys.stderr.isatty():
+        return None
+    state = {"t": 0.0}
+
+    def show(done, total, extra):
+        now = time.monotonic()
+        if now - state["t"] < 0.2 and done != total:
+            return
+        state["t"] = now
+        sys.stderr.write(f"\r{verb} {done}/{total} | {label}: {extra}   ")
+        if done == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+    return show
+
+
+def _open_db(args):
+    from backend.db import FaceDB
+    try:
+        return FaceDB(args.db)
+    except Exception as e:
+        raise CliError(f"cannot open database {args.db}: {e}")
+
+
+def _load_engine(args=None):
+    try:
+        from backend.face_engine import FaceEngine
+        return FaceEngine(model=getattr(args, "model", None),
+                          keep_chips=True if getattr(args, "chips", False) else None,
+                          tiling=getattr(args, "tiling", None))
+    except Exception as e:
+        raise CliError(f"face engine could not be loaded ({e}); check onnxruntime and insightface")
+
+
+def _folder(path):
+    if not os.path.isdir(path):
+        raise CliError(f"not a folder: {path}")
+    return os.path.abspath(path)
+
+
+def _gate(args):
+    if args.no_gate:
+        return None
+    from backend.quality import QualityGate
+    return QualityGate(min_rel=args.min_face_rel, min_px=args.min_face_px, min_score=args.min_score,
+                       min_sharpness=args.min_sharpness, max_yaw=args.max_yaw)
+
+
+def _dedup(args):
+    if not args.dedup_dist or args.dedup_dist < 0:
+        return None
+    from backend.phash import BurstDeduper
+    return BurstDeduper(max_dist=args.dedup_dist, window_s=args.dedup_window, mode=args.dedup_mode)
+
+
+def _prefilter(args, engine):
+    if not args.prefilter:
+        return None
+    from backend.prefilter import Prefilter
+    return Prefilter(engine, thresh=args.prefilter_thresh)
+
+
+def _decoders(args):
+    from backend.shm_ring import default_workers, workers_from_env
+    if args.decoders is None:
+        return workers_from_env()
+    return default_workers() if args.decoders < 0 else args.decoders
+
+
+def _largest_face(dets):
+    def area(d):
+        x1, y1, x2, y2 = d["bbox"][:4]
+        return max(0, x2 - x1) * max(0, y2 - y1)
+    return max(dets, key=area)
+
+
+# ---------- commands ----------
+def _run_index(args, db, folder, images=None, extra=None):
+    from backend.indexer import index_folder, cluster_library
+    from backend.metrics import RunMetrics, metrics_enabled, report_path_for
+    from backend.profiling import profiled
+    engine = _load_engine(args)
+    thumbs = None
+    if not args.no_thumbs:
+        from backend.thumbs import get_thumb_cache, thumb_dir_for
+        thumbs = get_thumb_cache(thumb_dir_for(db.path))
+    m = RunMetrics(metrics_enabled())
+    m.info["folder"] = folder
+    if args.recheck_prefiltered:
+        again = db.recheck_prefiltered(folder)
+        if images is not None:
+            images = list(images) + again
+    with profiled("index"):
+        res = index_folder(db, engine, folder, images=images, thumbs=thumbs, metrics=m,
+                             progress=_progress(args, "Indexing"), gate=_gate(args), dedup=_dedup(args),
+                             decoders=_decoders(args), prefilter=_prefilter(args, engine))
+        clusters = None if args.no_cluster else cluster_library(db, metrics=m)
+    m.finish()
+    report = m.write_report(report_path_for(db.path))
+    doc = dict(extra or {})
+    doc.update({
+        "folder": folder,
+        "images": res["images"],
+        "images_skipped": res["images_skipped"],
+        "errors": res["errors"],
+        "faces_added": res["faces"],
+        "faces_gated": res["faces_gated"],
+        "duplicates": res["duplicates"],
+        "images_tiled": res["images_tiled"],
+        "prefiltered": res["prefiltered"],
+        "clusters": clusters,
+        "elapsed_s": round(m.elapsed(), 3),
+        "report": report,
+    })
+    if args.json and "dedup" in m.info:
+        doc["dedup"] = m.info["dedup"]
+    if args.json and "prefilter" in m.info:
+        doc["prefilter"] = m.info["prefilter"]
+    _emit(args, doc)
+    return EXIT_OK
+
+
+def cmd_index(args):
+    db = _open_db(args)
+    return _run_index(args, db, _folder(args.folder))
+
+
+def cmd_sync(args):
+    """Bring the DB in line with a folder: drop deleted files, re-detect changed ones, add new ones."""
+    from backend.indexer import diff_folder, apply_diff
+    folder = _folder(args.folder)
+    db = _open_db(args)
+    removed, changed, fresh = diff_folder(db, folder)
+    apply_diff(db, removed, changed)
+    # only new, modified and unfinished files are decoded; scanned ones are left alone
+    return _run_index(args, db, folder, images=fresh,
+                      extra={"removed": len(removed), "changed": len(changed)})
+
+
+def cmd_cluster(args):
+    from backend.indexer import cluster_library
+    from backend.cluster import Clusterer
+    db = _open_db(args)
+    t0 = time.perf_counter()
+    n = cluster_library(db, clusterer=Clusterer(eps=args.eps, min_samples=args.min_samples))
+    if n is None:
+        _err("no faces in the database; run 'index' first")
+        return EXIT_EMPTY
+    _emit(args, {"clusters": n, "elapsed_s": round(time.perf_counter() - t0, 3)})
+    return EXIT_OK
+
+
+def cmd_search(args):
+    from backend.profiling import profiled
+    from backend.search import normalize, best_match, top_k_quantized
+    if not os.path.isfile(args.reference):
+        raise CliError(f"no such file: {args.reference}")
+    engine = _load_engine()
+    dets = engine.extract_faces(args.reference)
+    if not dets:
+        _err("no face found in the reference photo")
+        return EXIT_EMPTY
+    ref = normalize(_largest_face(dets)["embedding"])
+    results = []
+    with profiled("quick_find" if args.folder else "search"):
+        if args.folder:
+            from backend.utils import find_images
+            for path in find_images(_folder(args.folder)):
+                try:
+                    sim, det = best_match(ref, engine.extract_faces(path))
+                except Exception:
+                    continue
+                if sim is not None and sim >= args.threshold:
+                    results.append({"sim": sim, "abs_path": path, "bbox": det["bbox"], "cluster_id": None})
+            results.sort(key=lambda r: -r["sim"])
+            results = results[:args.limit] if args.limit else results
+        else:
+            db = _open_db(args)
+            recs, qm = db.get_face_index(args.quant)
+            # compact formats are re-ranked against the stored vectors
+            idx, sims = top_k_quantized(ref, qm, args.limit, args.threshold,
+                                        exact=lambda ix: db.get_embeddings([recs[i]["face_id"] for i in ix]))
+            results = [dict(recs[i], sim=float(s)) for i, s in zip(idx.tolist(), sims.tolist())]
+    for r in results:
+        r["sim"] = round(float(r["sim"]), 4)
+    _emit(args, {"matches": results},
+          rows=[(r["sim"], r["abs_path"], json.dumps(r["bbox"]), r.get("cluster_id")) for r in results],
+          header=("sim", "path", "bbox", "cluster"))
+    return EXIT_OK if results else EXIT_EMPTY
+
+
+def cmd_watch(args):
+    from backend.indexer import cluster_library
+    from backend.metrics import RunMetrics, metrics_enabled
+    from backend.watcher import FolderWatcher, WatchIndexer, watch_status_path
+    roots = [_folder(r) for r in args.roots]
+    db = _open_db(args)
+    engine = _load_engine(args)
+    thumbs = None
+    if not args.no_thumbs:
+        from backend.thumbs import get_thumb_cache, thumb_dir_for
+        thumbs = get_thumb_cache(thumb_dir_for(db.path))
+    watcher = FolderWatcher(roots, debounce=args.debounce, poll_interval=args.poll, backend=args.backend)
+    ix = WatchIndexer(db, engine, roots, thumbs=thumbs, metrics=RunMetrics(metrics_enabled()), gate=_gate(args),
+                      dedup=_dedup(args))
+    if not args.no_initial_sync:
+        # pick up whatever changed while nobody was watching
+        watcher.request_rescan()
+    watcher.start()
+    status_path = watch_status_path(db.path)
+    _err(f"watching {len(roots)} folder(s) with {watcher.backend}; status in {status_path}")
+    last_status = 0.0
+    reclustered_at = 0
+    try:
+        while True:
+            batch = watcher.take_ready()
+            if batch:
+                ix.handle(batch)
+                if args.recluster_after and ix.faces_added - reclustered_at >= args.recluster_after:
+                    cluster_library(db)
+                    reclustered_at = ix.faces_added
+            now = time.monotonic()
+            if batch or now - last_status >= args.status_every:
+                last_status = now
+                status = dict(watcher.stats(), **ix.stats(), time=time.strftime("%Y-%m-%dT%H:%M:%S"))
+                _write_json(status_path, status)
+                if batch:
+                    _emit(args, status, rows=[(status["time"], status["queue_length"], status["lag_s"],
+                                               status["processed"], status["faces_added"], status["removed"])])
+                    sys.stdout.flush()
+            time.sleep(0.25)
+    except KeyboardInterrupt:
+        watcher.stop()
+        return EXIT_OK
+
+
+def cmd_enqueue(args):
+    """Queue a folder's new and changed files for ``work`` processes."""
+    from backend.workqueue import enqueue_folder
+    folder = _folder(args.folder)
+    db = _open_db(args)
+    queued, removed, changed = enqueue_folder(db, folder)
+    doc = {"folder": folder, "queued": queued, "removed": removed, "changed": changed}
+    doc.update(db.queue_stats(args.max_attempts))
+    _emit(args, doc)
+    return EXIT_OK
+
+
+def cmd_work(args):
+    """Claim batches from the queue in --db and index them, into it or into a shard DB."""
+    from backend.db import FaceDB
+    from backend.metrics import RunMetrics, metrics_enabled, report_path_for
+    from backend.workqueue import run_worker, parse_path_map, default_worker_id
+    try:
+        path_map = parse_path_map(args.path_map)
+    except ValueError as e:
+        raise CliError(str(e))
+    worker = args.worker_id or default_worker_id()
+    try:
+        queue = FaceDB(args.db, timeout=args.busy_timeout)
+        shard_db = None
+        if args.shard:
+            path = args.shard
+            if os.path.isdir(path):
+                path = os.path.join(path, "shard-" + "".join(c if c.isalnum() or c in "-_." else "_"
+                                                             for c in worker) + ".db")
+            shard_db = FaceDB(path)
+    except Exception as e:
+        raise CliError(f"cannot open database: {e}")
+    engine = _load_engine(args)
+    m = RunMetrics(metrics_enabled())
+    t0 = time.perf_counter()
+    res = run_worker(queue, engine, shard_db=shard_db, worker_id=worker, batch=args.batch, lease_s=args.lease,
+                     max_attempts=args.max_attempts, path_map=path_map, gate=_gate(args), dedup=_dedup(args),
+                     prefilter=_prefilter(args, engine), metrics=m, wait=args.wait,
+                     progress=_progress(args, "Working"))
+    m.finish()
+    target = shard_db or queue
+    report = m.write_report(report_path_for(target.path))
+    doc = dict(res, worker=worker, shard=shard_db.path if shard_db else None,
+               elapsed_s=round(time.perf_counter() - t0, 3), report=report)
+    if shard_db is None and not args.quiet:
+        _err("run 'cluster' once every worker is done")
+    _emit(args, doc)
+    return EXIT_EMPTY if res["errors"] else EXIT_OK
+
+
+def cmd_merge(args):
+    """Fold shard DBs written by ``work --shard`` into --db."""
+    from backend.indexer import cluster_library
+    from backend.workqueue import merge_shards
+    for p in args.shards:
+        if not os.path.isfile(p):
+            raise CliError(f"no such shard: {p}")
+    db = _open_db(args)
+    t0 = time.perf_counter()
+    res = merge_shards(db, args.shards, progress=_progress(args, "Merging"))
+    clusters = None if args.no_cluster else cluster_library(db)
+    if args.delete:
+        for p in args.shards:
+            os.remove(p)
+    doc = {"shards": res, "images": sum(r["images"] for r in res), "faces": sum(r["faces"] for r in res),
+           "clusters": clusters, "elapsed_s": round(time.perf_counter() - t0, 3)}
+    _emit(args, doc, rows=[(r["shard"], r["images"], r["faces"], r["path"]) for r in res],
+          header=("shard", "images", "faces", "path"))
+    return EXIT_OK
+
+
+def cmd_queue(args):
+    """Where the work queue stands; optionally put failed or lost work back."""
+    db = _open_db(args)
+    requeued = 0
+    if args.retry_failed or args.requeue_shard:
+        requeued = db.requeue(failed=args.retry_failed, shard=args.requeue_shard)
+    doc = db.queue_stats(args.max_attempts)
+    doc["requeued"] = requeued
+    _emit(args, doc)
+    return EXIT_OK
+
+
+def _catalog(args):
+    from backend.catalog import Catalog, catalog_path_for
+    return Catalog(args.catalog or catalog_path_for(args.db), probe_timeout=args.probe_timeout)
+
+
+def _skipped(skipped):
+    for name, why in skipped.items():
+        _err(f"skipped library {name}: {why}")
+
+
+def cmd_catalog_add(args):
+    cat = _catalog(args)
+    for path in args.paths:
+        if not os.path.isfile(path):
+            raise CliError(f"no such database: {path}")
+        try:
+            cat.add(path, name=args.name if len(args.paths) == 1 else None)
+        except ValueError as e:
+            raise CliError(f"{e}; pass --name")
+    return cmd_catalog_list(args)
+
+
+def cmd_catalog_remove(args):
+    cat = _catalog(args)
+    missing = [n for n in args.names if not cat.remove(n)]
+    for n in missing:
+        _err(f"no library named {n}")
+    return EXIT_EMPTY if missing else EXIT_OK
+
+
+def cmd_catalog_list(args):
+    cat = _catalog(args)
+    ok, skipped = cat.available()
+    libs = [{"name": e["name"], "path": e["path"], "online": e["name"] in ok,
+             "status": "online" if e["name"] in ok else skipped.get(e["name"])} for e in cat.entries]
+    _emit(args, {"catalog": cat.path, "libraries": libs},
+          rows=[(r["name"], r["status"], r["path"]) for r in libs], header=("name", "status", "path"))
+    return EXIT_OK if libs else EXIT_EMPTY
+
+
+def cmd_catalog_search(args):
+    from backend.search import normalize
+    if not os.path.isfile(args.reference):
+        raise CliError(f"no such file: {args.reference}")
+    cat = _catalog(args)
+    engine = _load_engine()
+    dets = engine.extract_faces(args.reference)
+    if not dets:
+        _err("no face found in the reference photo")
+        return EXIT_EMPTY
+    results, skipped = cat.search(normalize(_largest_face(dets)["embedding"]), args.limit, args.threshold,
+                                  mode=args.quant)
+    _skipped(skipped)
+    for r in results:
+        r["sim"] = round(r["sim"], 4)
+    _emit(args, {"matches": results, "skipped": skipped},
+          rows=[(r["sim"], r["library"], r["abs_path"], json.dumps(r["bbox"]), r.get("cluster_id")) for r in results],
+          header=("sim", "library", "path", "bbox", "cluster"))
+    return EXIT_OK if results else EXIT_EMPTY
+
+
+def cmd_catalog_people(args):
+    rows, skipped = _catalog(args).people(args.text)
+    _skipped(skipped)
+    _emit(args, {"people": rows, "skipped": skipped},
+          rows=[(r["library"], r["cluster_id"], r["label"], r["faces"]) for r in rows],
+          header=("library", "id", "label", "faces"))
+    return EXIT_OK if rows else EXIT_EMPTY
+
+
+def cmd_catalog_together(args):
+    rows, skipped = _catalog(args).together(args.labels)
+    _skipped(skipped)
+    _emit(args, {"photos": rows, "skipped": skipped},
+          rows=[(r["library"], r["abs_path"]) for r in rows], header=("library", "path"))
+    return EXIT_OK if rows else EXIT_EMPTY
+
+
+def cmd_catalog_companions(args):
+    rows, skipped = _catalog(args).companions(args.label, args.limit)
+    _skipped(skipped)
+    _emit(args, {"companions": rows, "skipped": skipped},
+          rows=[(r["images"], r["label"], ",".join(r["libraries"])) for r in rows],
+          header=("images", "label", "libraries"))
+    return EXIT_OK if rows else EXIT_EMPTY
+
+
+def _write_json(path, doc):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def cmd_suggest_merges(args):
+    db = _open_db(args)
+    labels = {cid: label for cid, label, _ in db.list_clusters()}
+    pairs = db.suggest_merges(thresh=args.thresh, topk=args.topk)
+    doc = {"suggestions": [{"a": a, "b": b, "label_a": labels.get(a), "label_b": labels.get(b),
+                            "sim": round(sim, 4)} for a, b, sim in pairs]}
+    _emit(args, doc, rows=[(a, b, round(sim, 4), labels.get(a), labels.get(b)) for a, b, sim in pairs],
+          header=("a", "b", "sim", "label_a", "label_b"))
+    return EXIT_OK if pairs else EXIT_EMPTY
+
+
+def cmd_stats(args):
+    db = _open_db(args)
+    q = db.quality_stats()
+    doc = {"people": len(db.list_clusters()), "faces_kept": q["kept"], "faces_gated": q["gated"],
+           "gated_share": round(q["gated_share"], 4), "embedding_bytes_saved": q["embedding_bytes_saved"],
+           "gated_by_reason": q["by_reason"]}
+    e = db.model_stats()
+    doc.update({"faces_by_model": {k or "unknown": n for k, n in e["by_model"].items()},
+                "faces_with_chip": e["with_chip"], "faces_with_landmarks_only": e["with_kps_only"],
+                "faces_needing_detection": e["needs_detection"], "chip_bytes": e["chip_bytes"]})
+    _emit(args, doc)
+    return EXIT_OK
+
+
+def cmd_compact(args):
+    """Rewrite stored embeddings as float16/int8 (or back to float32)."""
+    db = _open_db(args)
+    before = os.path.getsize(db.path)
+    t0 = time.perf_counter()
+    n = db.convert_embeddings(args.format, progress=_progress(args, "Converting", "rewritten"))
+    if args.vacuum:
+        db.vacuum()
+    _emit(args, {"format": args.format, "rewritten": n, "bytes_before": before,
+                 "bytes_after": os.path.getsize(db.path), "elapsed_s": round(time.perf_counter() - t0, 3)})
+    return EXIT_OK
+
+
+def cmd_reembed(args):
+    """Re-run only the recognition model over stored chips/landmarks after a model change."""
+    from backend.metrics import RunMetrics, metrics_enabled
+    from backend.reembed import reembed
+    db = _open_db(args)
+    engine = _load_engine(args)
+    m = RunMetrics(metrics_enabled())
+    t0 = time.perf_counter()
+    res = reembed(db, engine, batch_size=args.batch, metrics=m, progress=_progress(args, "Re-embedding", "failed"))
+    db.update_representatives()
+    left = db.model_stats()
+    doc = dict(res, model=engine.model_version, needs_detection=left["needs_detection"],
+               elapsed_s=round(time.perf_counter() - t0, 3))
+    if left["needs_detection"]:
+        _err(f"{left['needs_detection']} face(s) have no chip or landmarks; re-index them with 'sync'")
+    _emit(args, doc)
+    return EXIT_EMPTY if res["failed"] else EXIT_OK
+
+
+def cmd_people(args):
+    db = _open_db(args)
+    rows = db.list_clusters()
+    _emit(args, {"people": [{"id": cid, "label": label, "faces": n} for cid, label, n in rows]},
+          rows=rows, header=("id", "label", "faces"))
+    return EXIT_OK if rows else EXIT_EMPTY
+
+
+def cmd_photos(args):
+    """Photos showing a combination of people (see backend/people_search.py)."""
+    from backend.people_search import search
+    db = _open_db(args)
+    try:
+        res = search(db, " ".join(args.query), limit=args.limit)
+    except ValueError as e:
+        _err(f"bad query: {e}")
+        return EXIT_USAGE
+    for name, found in res["people"].items():
+        if not found:
+            _err(f"nobody called {name!r}")
+    doc = {"total": res["total"], "people": {n: [{"id": c, "label": lab} for c, lab in found]
+                                             for n, found in res["people"].items()},
+           "photos": [r["source_path"] for r in res["images"]]}
+    _emit(args, doc, rows=[(r["image_id"], r["source_path"]) for r in res["images"]], header=("image", "path"))
+    return EXIT_OK if res["total"] else EXIT_EMPTY
+
+
+def cmd_export(args):
+    db = _open_db(args)
+    known = [cid for cid, _, _ in db.list_clusters()]
+    ids = known if args.all else args.ids
+    if not ids:
+        raise CliError("nothing to export: pass cluster ids or --all")
+    known = set(known)
+    out = []
+    failed = 0
+    for cid in ids:
+        if cid not in known:
+            _err(f"unknown cluster id {cid}")
+            failed += 1
+            continue
+        res = db.export_cluster(cid, None, args.out, mode=args.mode, workers=args.workers)
+        for src, e in res.failed:
+            _err(f"{src}: {e}")
+        failed += len(res.failed)
+        out.append({"id": cid, "path": res.out_path, "exported": res.exported,
+                    "skipped": res.skipped, "failed": len(res.failed)})
+    _emit(args, {"exports": out},
+          rows=[(r["id"], r["exported"], r["failed"], r["path"]) for r in out],
+          header=("id", "exported", "failed", "path"))
+    return EXIT_EMPTY if failed else EXIT_OK
+
+
+def cmd_export_index(args):
+    """Write the face index as columnar files (embedding matrix + metadata columns)."""
+    from backend.transfer import export_index
+    db = _open_db(args)
+    t0 = time.perf_counter()
+    try:
+        path, meta = export_index(db, args.out, fmt=args.format, chips=not args.no_chips,
+                                  dtype="float16" if args.float16 else "float32")
+    except (OSError, ValueError) as e:
+        raise CliError(f"cannot export: {e}")
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) if os.path.isdir(path) \
+        else os.path.getsize(path)
+    doc = {"path": path, "faces": meta["faces"], "images": meta["images"], "people": meta["clusters"],
+           "dim": meta["dim"], "bytes": size, "elapsed_s": round(time.perf_counter() - t0, 3)}
+    _emit(args, doc)
+    return EXIT_OK if meta["faces"] else EXIT_EMPTY
+
+
+def cmd_import_index(args):
+    """Load an 'export-index' file into --db, merging with what is already there."""
+    from backend.transfer import import_index
+    from backend.workqueue import parse_path_map
+    try:
+        path_map = parse_path_map(args.path_map)
+    except ValueError as e:
+        raise CliError(str(e))
+    if not os.path.exists(args.path):
+        raise CliError(f"no such export: {args.path}")
+    db = _open_db(args)
+    t0 = time.perf_counter()
+    try:
+        res = import_index(db, args.path, path_map=path_map, replace=args.replace,
+                           progress=_progress(args, "Importing"))
+    except (OSError, ValueError, KeyError) as e:
+        raise CliError(f"cannot import {args.path}: {e}")
+    _emit(args, dict(res, elapsed_s=round(time.perf_counter() - t0, 3)))
+    return EXIT_OK
+
+
+# ---------- parser ----------
+def build_parser():
+    ap = argparse.ArgumentParser(prog="python -m facerec",
+                                 description="Index, cluster, search and export faces without a GUI.")
+    ap.add_argument("--db", default=DEFAULT_DB, help=f"face database (default: $FACEREC_DB or {DEFAULT_DB})")
+    ap.add_argument("--json", action="store_true", help="print one JSON document instead of tab separated text")
+    ap.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    ap.add_argument("--profile", nargs="?", const="cpu", metavar="KINDS",
+                    help="profile the command (cpu,mem,stack or all); see backend/profiling.py")
+    ap.add_argument("--profile-dir", help="where profiling artefacts go (default: profiles/ next to the DB)")
+    sub = ap.add_subparsers(dest="command", metavar="COMMAND")
+    sub.required = True
+
+    def gating(p):
+        g = p.add_argument_group("quality gate", "faces failing a check are stored without an embedding")
+        g.add_argument("--no-gate", action="store_true", help="keep every detection")
+        g.add_argument("--min-face-px", type=int, default=24, help="minimum face side in pixels (default 24)")
+        g.add_argument("--min-face-rel", type=float, default=0.02,
+                       help="minimum face side relative to the image's shorter side (default 0.02)")
+        g.add_argument("--min-score", type=float, default=0.6, help="minimum detector score (default 0.6)")
+        g.add_argument("--min-sharpness", type=float, default=None, help="minimum Laplacian variance (off)")
+        g.add_argument("--max-yaw", type=float, default=None, help="maximum landmark yaw ratio 0..1 (off)")
+        g = p.add_argument_group("burst dedup", "near-duplicate shots skip detection")
+        g.add_argument("--dedup-dist", type=int, default=6, metavar="BITS",
+                       help="maximum perceptual-hash distance to a recent photo; 0 disables (default 6)")
+        g.add_argument("--dedup-window", type=float, default=10.0, metavar="S",
+                       help="maximum mtime difference in seconds (default 10)")
+        g.add_argument("--dedup-mode", choices=("tag", "inherit"), default="tag",
+                       help="tag: store no faces for duplicates; inherit: copy the first shot's faces")
+
+    def prefiltering(p):
+        g = p.add_argument_group("prefilter", "skip photos a quick look at a small version finds no face in")
+        g.add_argument("--prefilter", action="store_true", help="check the EXIF thumbnail or a reduced decode first")
+        g.add_argument("--prefilter-thresh", type=float, default=0.3, metavar="SCORE",
+                       help="detector score that still counts as a possible face (default 0.3)")
+
+    def indexing(p):
+        p.add_argument("folder")
+        p.add_argument("--chips", action="store_true",
+                       help="store each face's aligned chip (~5 KB) for fast re-embedding (or $FACEREC_KEEP_CHIPS=1)")
+        p.add_argument("--no-thumbs", action="store_true", help="don't pre-render face thumbnails")
+        p.add_argument("--tiling", choices=("auto", "always", "off"), default=None,
+                       help="re-detect over tiles in panoramas and crowded photos (default $FACEREC_TILING or auto)")
+        p.add_argument("--recheck-prefiltered", action="store_true",
+                       help="fully index the photos an earlier --prefilter run skipped")
+        p.add_argument("--no-cluster", action="store_true", help="skip re-clustering afterwards")
+        p.add_argument("--decoders", type=int, default=None, metavar="N",
+                       help="decode images in N worker processes via shared memory; -1 picks from the "
+                            "CPU count (default $FACEREC_DECODERS or 0: decode inline)")
+        gating(p)
+        prefiltering(p)
+
+    p = sub.add_parser("index", help="detect and embed faces in new images under a folder")
+    indexing(p)
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("sync", help="like index, but also forget deleted files and re-detect changed ones")
+    indexing(p)
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("watch", help="keep indexing as images are added, changed or deleted under folders")
+    p.add_argument("roots", nargs="+", metavar="FOLDER")
+    p.add_argument("--debounce", type=float, default=2.0, help="seconds a file must be quiet before indexing")
+    p.add_argument("--poll", type=float, default=30.0, help="polling interval when inotify is unavailable")
+    p.add_argument("--backend", choices=("auto", "inotify", "poll"), default="auto")
+    p.add_argument("--status-every", type=float, default=10.0, help="seconds between status file updates")
+    p.add_argument("--recluster-after", type=int, default=0, metavar="N",
+                   help="run a full re-cluster after N new faces (0: only attach to existing people)")
+    p.add_argument("--no-initial-sync", action="store_true", help="don't diff the folders on start-up")
+    p.add_argument("--no-thumbs", action="store_true", help="don't pre-render face thumbnails")
+    p.add_argument("--chips", action="store_true", help="store each face's aligned chip for fast re-embedding")
+    gating(p)
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("enqueue", help="queue a folder's new and changed files for 'work' processes")
+    p.add_argument("folder")
+    p.add_argument("--max-attempts", type=int, default=3, help="as given to 'work' (default 3)")
+    p.set_defaults(func=cmd_enqueue)
+
+    p = sub.add_parser("work", help="index queued files from --db until none are left (run several at once)")
+    p.add_argument("--shard", metavar="PATH",
+                   help="write results to this private DB (or a new one in this folder) instead of --db; "
+                        "fold it in with 'merge'. Use for workers on other machines")
+    p.add_argument("--batch", type=int, default=16, help="images claimed at a time (default 16)")
+    p.add_argument("--lease", type=float, default=600.0, metavar="S",
+                   help="seconds a claim lasts without a heartbeat before others take it over (default 600)")
+    p.add_argument("--max-attempts", type=int, default=3, help="times an image is handed out (default 3)")
+    p.add_argument("--path-map", action="append", metavar="SRC=DST",
+                   help="read queued paths starting with SRC from DST on this machine (repeatable)")
+    p.add_argument("--worker-id", help="name in the queue (default host:pid)")
+    p.add_argument("--busy-timeout", type=float, default=60.0, metavar="S",
+                   help="seconds to wait for the queue DB's write lock (default 60)")
+    p.add_argument("--wait", action="store_true", help="when the queue is empty, wait for other workers' leases")
+    p.add_argument("--chips", action="store_true", help="store each face's aligned chip for fast re-embedding")
+    gating(p)
+    prefiltering(p)
+    p.set_defaults(func=cmd_work)
+
+    p = sub.add_parser("merge", help="fold shard DBs written by 'work --shard' into --db")
+    p.add_argument("shards", nargs="+", metavar="SHARD")
+    p.add_argument("--no-cluster", action="store_true", help="skip re-clustering afterwards")
+    p.add_argument("--delete", action="store_true", help="delete the shard files once merged")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("queue", help="work queue status: pending, leased, failed and unmerged images")
+    p.add_argument("--max-attempts", type=int, default=3, help="as given to 'work' (default 3)")
+    p.add_argument("--retry-failed", action="store_true", help="queue images that ran out of attempts again")
+    p.add_argument("--requeue-shard", metavar="NAME", help="queue the images credited to a lost shard again")
+    p.set_defaults(func=cmd_queue)
+
+    p = sub.add_parser("catalog", help="register several face databases and search them as one library")
+    p.add_argument("--catalog", metavar="PATH",
+                   help="catalogue file (default: $FACEREC_CATALOG or catalog.json next to --db)")
+    p.add_argument("--probe-timeout", type=float, default=3.0, metavar="S",
+                   help="skip databases whose drive doesn't answer within S seconds (default 3)")
+    csub = p.add_subparsers(dest="action", metavar="ACTION")
+    csub.required = True
+    c = csub.add_parser("add", help="register databases")
+    c.add_argument("paths", nargs="+", metavar="DB")
+    c.add_argument("--name", help="name to list it under (default: the DB's folder or file name)")
+    c.set_defaults(func=cmd_catalog_add)
+    c = csub.add_parser("remove", help="unregister databases by name")
+    c.add_argument("names", nargs="+", metavar="NAME")
+    c.set_defaults(func=cmd_catalog_remove)
+    c = csub.add_parser("list", help="registered databases and whether they are reachable")
+    c.set_defaults(func=cmd_catalog_list)
+    c = csub.add_parser("search", help="faces similar to the largest face in a reference photo, in every library")
+    c.add_argument("reference")
+    c.add_argument("--threshold", type=float, default=0.5, help="minimum cosine similarity (default 0.5)")
+    c.add_argument("--limit", type=int, default=50, help="maximum matches overall; 0 for all (default 50)")
+    c.add_argument("--quant", choices=("float32", "float16", "int8"), default=None,
+                   help="in-memory search matrix format (default: float32 if it fits in memory, "
+                        "else each database's storage format)")
+    c.set_defaults(func=cmd_catalog_search)
+    c = csub.add_parser("people", help="people in every library, optionally whose label contains TEXT")
+    c.add_argument("text", nargs="?")
+    c.set_defaults(func=cmd_catalog_people)
+    c = csub.add_parser("together", help="photos in which all the named people appear")
+    c.add_argument("labels", nargs="+", metavar="LABEL")
+    c.set_defaults(func=cmd_catalog_together)
+    c = csub.add_parser("companions", help="who appears most often in photos with a named person")
+    c.add_argument("label")
+    c.add_argument("--limit", type=int, default=20)
+    c.set_defaults(func=cmd_catalog_companions)
+
+    p = sub.add_parser("cluster", help="re-cluster every face in the database")
+    p.add_argument("--eps", type=float, default=0.45, help="DBSCAN cosine distance (default 0.45)")
+    p.add_argument("--min-samples", type=int, default=3)
+    p.set_defaults(func=cmd_cluster)
+
+    p = sub.add_parser("search", help="find faces similar to the largest face in a reference photo")
+    p.add_argument("reference")
+    p.add_argument("--folder", help="scan this folder directly (Quick Find) instead of searching the database")
+    p.add_argument("--threshold", type=float, default=0.5, help="minimum cosine similarity (default 0.5)")
+    p.add_argument("--limit", type=int, default=50, help="maximum matches; 0 for all (default 50)")
+    p.add_argument("--quant", choices=("float32", "float16", "int8"), default=None,
+                   help="in-memory search matrix format (default: float32 if it fits in memory, "
+                        "else the database's storage format)")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("suggest-merges", help="list pairs of people that look like the same person")
+    p.add_argument("--thresh", type=float, default=0.35, help="maximum centroid cosine distance (default 0.35)")
+    p.add_argument("--topk", type=int, default=50)
+    p.set_defaults(func=cmd_suggest_merges)
+
+    p = sub.add_parser("compact", help="store embeddings as float16 or int8 to shrink the database")
+    p.add_argument("format", choices=("float32", "float16", "int8"))
+    p.add_argument("--vacuum", action="store_true", help="rebuild the file afterwards so it actually shrinks")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("reembed", help="recompute embeddings with the current model from stored chips/landmarks")
+    p.add_argument("--model", help="insightface model pack (default: $FACEREC_MODEL or buffalo_l)")
+    p.add_argument("--batch", type=int, default=64, help="faces per recognition batch (default 64)")
+    p.set_defaults(func=cmd_reembed)
+
+    p = sub.add_parser("stats", help="library size and how many faces the quality gate kept out")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("people", help="list people (clusters) with their ids")
+    p.set_defaults(func=cmd_people)
+
+    p = sub.add_parser("photos", help="photos showing a combination of people, e.g. 'alice and bob', 'alice -carol'")
+    p.add_argument("query", nargs="+", help="names joined by and/or/not (also & | -), with parentheses")
+    p.add_argument("--limit", type=int, default=0, help="list at most N photos (the total is still counted)")
+    p.set_defaults(func=cmd_photos)
+
+    p = sub.add_parser("export", help="export the photos of one or more people")
+    p.add_argument("ids", nargs="*", type=int, metavar="ID")
+    p.add_argument("--all", action="store_true", help="export every person")
+    p.add_argument("--out", required=True, help="destination folder (one sub-folder per person)")
+    p.add_argument("--mode", default="copy", choices=MODES)
+    p.add_argument("--workers", type=int, default=None, help="parallel copy threads")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("export-index", help="write faces, images and people as columnar files (npz or Parquet)")
+    p.add_argument("out", help="output .npz file, or a folder for --format parquet")
+    p.add_argument("--format", choices=("npz", "parquet"), default=None,
+                   help="npz (default) or parquet (needs pyarrow; a folder of .parquet files)")
+    p.add_argument("--no-chips", action="store_true", help="leave the stored face chips out")
+    p.add_argument("--float16", action="store_true", help="write the embedding matrix as float16 (half the size)")
+    p.set_defaults(func=cmd_export_index)
+
+    p = sub.add_parser("import-index", help="load an export-index file into --db, merging with its contents")
+    p.add_argument("path", help=".npz file or Parquet folder written by export-index")
+    p.add_argument("--path-map", action="append", metavar="SRC=DST",
+                   help="rewrite exported paths starting with SRC to DST (repeatable)")
+    p.add_argument("--replace", action="store_true",
+                   help="also replace the faces of photos this database has already indexed")
+    p.set_defaults(func=cmd_import_index)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from backend import profiling
+    profiling.configure(args.profile, args.profile_dir,
+                        default_dir=os.path.join(os.path.dirname(os.path.abspath(args.db)), "profiles"))
+    try:
+        return args.func(args)
+    except CliError as e:
+        _err(str(e))
+        return EXIT_ERROR
+    except ImportError as e:
+        _err(f"missing dependency: {e}")
+        return EXIT_ERROR
+    except KeyboardInterrupt:
+        _err("interrupted")
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # e.g. piped into `head`
+        return EXIT_OK
@@ -2,11 +2,9 @@
 # Flow: Find Person -> pick reference -> pick folder -> scans ONLY for that person
 # Requires: pillow, numpy, scikit-learn, opencv-python, insightface, onnxruntime
 
-import os, sys, threading, time, shutil
+import os, sys, threading, time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-import numpy as np
 
 # Prefer backend package if present; fall back to flat layout
 HERE = os.path.dirname(os.path.abspath(__file__))
@@ -16,17 +14,36 @@ for p in (HERE, BACKEND):
         sys.path.insert(0, p)
 
 try:
-    from backend.face_engine import FaceEngine
-    from backend.utils import find_images, ensure_dir, thumb_from_face, rel_to
-    from backend.db import FaceDB
-    
-    # people UI is optional and loaded lazily; import below when needed
+    from backend.thumbs import get_thumb_cache, thumb_dir_for
+    from backend.metrics import RunMetrics, metrics_enabled, report_path_for
+    from backend.scheduler import Scheduler, INTERACTIVE, INDEX, MAINTENANCE, PAUSED, QUEUED
+    import backend.profiling as profiling
+    import backend.startup as startup
+    # the database, search, export and indexing modules (and through them numpy,
+    # cv2, sklearn, insightface) are imported where they're used, so the window
+    # shows before any of them load; the people UI is loaded lazily as well
 except ModuleNotFoundError:
-    from face_engine import FaceEngine
-    from utils import find_images, ensure_dir, thumb_from_face, rel_to
-    from db import FaceDB
+    from thumbs import get_thumb_cache, thumb_dir_for
+    from metrics import RunMetrics, metrics_enabled, report_path_for
+    from scheduler import Scheduler, INTERACTIVE, INDEX, MAINTENANCE, PAUSED, QUEUED
+    import profiling
+    import startup
+from tk_export import ExportDialog
+from tk_jobs import JobsWindow
+from tk_thumbs import TkFaceGrid
+
+
+def _import(name):
+    """Backend module ``name``, from the package or the flat layout (as above)."""
+    import importlib
+    try:
+        return importlib.import_module("backend." + name)
+    except ModuleNotFoundError:
+        return importlib.import_module(name)
+
 
 APP_TITLE = "FaceRecognition — Quick Find"
+DB_PATH = os.path.join(HERE, "faces.db")
 THUMB_SIZE = 140
 
 class FaceRecApp(tk.Tk):
@@ -37,12 +54,54 @@ class FaceRecApp(tk.Tk):
         self.minsize(1000, 620)
 
         self.engine = None
+        # FaceEngine (cv2, insightface, ONNX models) loads in the background once the window is up
+        self._warmup = startup.EngineWarmup(on_done=lambda e, err: self.after(0, self._on_engine_loaded))
         self.library_root = None
-        self.worker = None
-        self.stop_event = threading.Event()
+        # Quick Find runs before indexing, indexing before reclustering; all share the one engine
+        self.scheduler = Scheduler(engine=self._warmup.wait)
+        self.scheduler.subscribe(self._on_jobs_changed)
+        self._jobs_pending = False
+        self._cluster_metrics = None
         self.find_results = []  # dicts: abs_path, bbox, sim, dist
+        self.thumbs = get_thumb_cache(thumb_dir_for(DB_PATH))
 
         self._build_ui()
+        self.after_idle(self._start_warmup)
+
+    def _start_warmup(self):
+        startup.mark("window_shown_s")
+        self.engine_state.set("Face engine: loading…")
+        self._warmup.start()
+
+    def _on_engine_loaded(self):
+        if self._warmup.engine is not None:
+            self.engine = self._warmup.engine
+            self.engine_state.set(f"Face engine: ready ({self._warmup.elapsed_s:.1f} s)")
+        else:
+            self.engine_state.set("Face engine: unavailable")
+            self._set_status(f"Failed to load face engine: {self._warmup.error}")
+        err = self._warmup.error
+        if startup.write_report(error=str(err) if err else None):
+            self.destroy()
+
+    def _get_engine(self):
+        """The warmed-up FaceEngine, waiting for it if it's still loading. None on failure."""
+        if self.engine is None:
+            if not self._warmup.done:
+                self._set_status("Waiting for the face engine to finish loading…")
+                self.config(cursor="watch")
+                self.update_idletasks()
+                self._warmup.wait()
+                self.config(cursor="")
+            self.engine = self._warmup.engine
+        if self.engine is None:
+            messagebox.showerror("Face engine", f"Face engine could not be loaded: {self._warmup.error}")
+        return self.engine
+
+    def _ensure_db(self):
+        if getattr(self, 'db', None) is None:
+            self.db = _import("db").FaceDB(DB_PATH)
+        return self.db
 
     def _build_ui(self):
         toolbar = ttk.Frame(self)
@@ -53,42 +112,86 @@ class FaceRecApp(tk.Tk):
         self.btn_scan = ttk.Button(toolbar, text="Scan Folder", command=self.on_scan_folder)
         self.btn_export = ttk.Button(toolbar, text="Export Matches", command=self.on_find_export, state=tk.DISABLED)
         self.btn_cancel = ttk.Button(toolbar, text="Cancel", command=self.on_cancel)
+        self.btn_jobs = ttk.Button(toolbar, text="Jobs", command=self.on_jobs)
 
         # pack People and Scan buttons at the leftmost position
         self.btn_people.pack(side=tk.LEFT, padx=4)
         self.btn_scan.pack(side=tk.LEFT, padx=4)
-        for b in (self.btn_find, self.btn_export, self.btn_cancel):
+        for b in (self.btn_find, self.btn_export, self.btn_cancel, self.btn_jobs):
             b.pack(side=tk.LEFT, padx=4)
 
+        # photos by people in the index: "alice and bob", "alice -carol"
+        self.query = tk.StringVar()
+        ttk.Button(toolbar, text="Search", command=self.on_search).pack(side=tk.RIGHT, padx=4)
+        entry = ttk.Entry(toolbar, textvariable=self.query, width=36)
+        entry.pack(side=tk.RIGHT, padx=4)
+        entry.bind("<Return>", lambda _ev: self.on_search())
+        ttk.Label(toolbar, text="People:").pack(side=tk.RIGHT)
+
         self.prog = ttk.Progressbar(self, mode="determinate")
         self.prog.pack(side=tk.TOP, fill=tk.X, padx=6, pady=(0,6))
 
         main = ttk.Frame(self)
         main.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=6, pady=6)
 
-        self.canvas = tk.Canvas(main, highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(main, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.thumb_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.thumb_frame, anchor="nw")
-        self.thumb_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        # windowed grid: only the visible rows exist as canvas items
+        self.grid_view = TkFaceGrid(main, self.thumbs, THUMB_SIZE, on_open=self._open_folder)
+        self.grid_view.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
         self.status = tk.StringVar(value="Ready. Click 'Find Person' → choose reference photo → choose folder to scan.")
-        ttk.Label(self, textvariable=self.status, anchor="w").pack(side=tk.BOTTOM, fill=tk.X)
-        self.thumb_cache = {}
+        bar = ttk.Frame(self)
+        bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.engine_state = tk.StringVar(value="Face engine: waiting")
+        ttk.Label(bar, textvariable=self.engine_state, anchor="e").pack(side=tk.RIGHT, padx=6)
+        self.jobs_state = tk.StringVar(value="")
+        ttk.Label(bar, textvariable=self.jobs_state, anchor="e").pack(side=tk.RIGHT, padx=6)
+        ttk.Label(bar, textvariable=self.status, anchor="w").pack(side=tk.LEFT, fill=tk.X, expand=True)
 
     # ------------ Actions ------------
     def on_cancel(self):
-        self.stop_event.set()
-        self._set_status("Cancelling…")
+        # the job the progress bar is showing; the Jobs window cancels any other
+        job = self.scheduler.foreground() or next(iter(self.scheduler.active_jobs()), None)
+        if job is None:
+            return
+        job.cancel()
+        self._set_status(f"Cancelling {job.name}…")
+
+    def on_jobs(self):
+        JobsWindow(self, self.scheduler)
+
+    def on_search(self):
+        query = self.query.get().strip()
+        if not query:
+            return
+        self._ensure_db()
+        self._set_status(f"Searching: {query}")
+        self._submit(f"Search {query}", INTERACTIVE, self._search_worker, query)
+
+    def _search_worker(self, job, query):
+        search_people = _import("people_search").search
+        try:
+            res = search_people(self.db, query, limit=2000)
+        except ValueError as e:
+            self._set_status(f"Can't search for {query!r}: {e}")
+            return
+        missing = [name for name, found in res["people"].items() if not found]
+
+        def done():
+            self.find_results = res["images"]
+            self._show_find_results(res["images"])
+            self.btn_export.configure(state=tk.NORMAL if res["images"] else tk.DISABLED)
+            text = f"{res['total']} photos for {query!r}"
+            if res["total"] > len(res["images"]):
+                text += f" (showing {len(res['images'])})"
+            if missing:
+                text += " — nobody called " + ", ".join(repr(n) for n in missing)
+            self._set_status(text)
+        self.after(0, done)
 
     def on_find_person(self):
         # 1) reference photo
-        if not self.engine:
-            self.engine = FaceEngine()
+        if self._get_engine() is None:
+            return
 
         ref_path = filedialog.askopenfilename(
             title="Choose reference photo (face)",
@@ -106,6 +209,9 @@ class FaceRecApp(tk.Tk):
             messagebox.showinfo("Find Person", "No face found in the reference photo.")
             return
 
+        import numpy as np
+        find_images = _import("utils").find_images
+
         # largest face if multiple
         def area(b):
             x,y,w,h = b
@@ -125,35 +231,33 @@ class FaceRecApp(tk.Tk):
             return
 
         self._set_status(f"Scanning {len(images)} images for this person…")
-        self._run_worker(self._quick_find_worker, images, ref_emb, [0.35, 0.45, 0.55])
+        self._submit(f"Find person in {folder}", INTERACTIVE, self._quick_find_worker, images, ref_emb, [0.35, 0.45, 0.55])
 
-    def _quick_find_worker(self, images, ref_emb, thresholds):
+    def _quick_find_worker(self, job, images, ref_emb, thresholds):
+        with profiling.profiled("quick_find"):
+            self._quick_find(job, images, ref_emb, thresholds)
+
+    def _quick_find(self, job, images, ref_emb, thresholds):
+        search = _import("search")
+        normalize, best_match = search.normalize, search.best_match
         # l2-normalize reference
-        r = ref_emb.astype("float32")
-        n = float((r*r).sum()) ** 0.5
-        if n > 1e-8:
-            r = r / n
+        r = normalize(ref_emb)
+        engine = job.engine()
 
         total = len(images)
         matches = []
         self._set_progress(0, total)
 
         for idx, img_path in enumerate(images, 1):
-            if self.stop_event.is_set():
+            if job.should_stop():
                 break
 
             try:
-                dets = self.engine.extract_faces(img_path)
+                dets = engine.extract_faces(img_path)
             except Exception:
                 dets = []
 
-            best_sim, best_det = None, None
-            for d in dets:
-                e = np.array(d["embedding"], dtype=np.float32)
-                den = float((e*e).sum()) ** 0.5 or 1e-8
-                sim = float((e @ r) / den)   # cosine similarity
-                if (best_sim is None) or (sim > best_sim):
-                    best_sim, best_det = sim, d
+            best_sim, best_det = best_match(r, dets)   # cosine similarity
 
             if best_sim is not None:
                 dist = 1.0 - best_sim
@@ -162,23 +266,21 @@ class FaceRecApp(tk.Tk):
                     matches.append({"abs_path": img_path, "bbox": best_det["bbox"], "sim": best_sim, "dist": dist})
 
             if (idx % 10 == 0) or (idx == total):
-                self._set_progress(idx, total, f"Scanning {idx}/{total} | matches: {len(matches)}")
+                self._job_progress(job, idx, total, f"Scanning {idx}/{total} | matches: {len(matches)}")
 
         matches.sort(key=lambda x: -x["sim"])
 
         def done():
             self.find_results = matches
-            if self.stop_event.is_set():
+            if job.cancelled:
                 self._set_status(f"Scan cancelled at {idx}/{total}. Matches so far: {len(matches)}")
-                self.stop_event.clear()
             else:
                 if not matches:
                     self._set_status("No matches found for this person. Try a clearer reference photo.")
-                    for w in self.thumb_frame.winfo_children():
-                        w.destroy()
+                    self.grid_view.set_faces([])
                 else:
-                    self._set_status(f"Found {len(matches)} possible matches (showing top {min(120, len(matches))}).")
-                    self._show_find_results(matches[:120])
+                    self._set_status(f"Found {len(matches)} possible matches.")
+                    self._show_find_results(matches)
                     self.btn_export.configure(state=tk.NORMAL)
         self.after(0, done)
 
@@ -194,34 +296,23 @@ class FaceRecApp(tk.Tk):
             return
         stamp = time.strftime("%Y%m%d_%H%M%S")
         out_dir = os.path.join(out_root, f"FindPerson_{stamp}")
-        os.makedirs(out_dir, exist_ok=True)
-        seen, copied = set(), 0
-        for rec in self.find_results:
-            src = rec["abs_path"]
-            if src in seen or not os.path.exists(src):
-                continue
-            seen.add(src)
-            dst = os.path.join(out_dir, os.path.basename(src))
-            base, ext = os.path.splitext(dst)
-            j = 1
-            while os.path.exists(dst):
-                dst = f"{base}_{j}{ext}"; j += 1
+        sources = [rec.get("source_path") or rec["abs_path"] for rec in self.find_results]
+
+        export_files = _import("export").export_files
+
+        def job(mode, progress, stop_event):
+            return export_files(sources, out_dir, mode=mode, progress=progress, stop_event=stop_event)
+
+        def opened(res):
             try:
-                shutil.copy2(src, dst); copied += 1
+                if os.name == "nt":
+                    os.startfile(os.path.dirname(res.out_path) if os.path.isfile(res.out_path) else res.out_path)
             except Exception:
                 pass
-        messagebox.showinfo("Export Matches", f"Exported {copied} files to {out_dir}")
-        try:
-            if os.name == "nt":
-                os.startfile(out_dir)
-        except Exception:
-            pass
+        ExportDialog(self, job, "Export Matches", on_done=opened)
 
     def on_people(self):
-        # lazy-create DB instance
-        if not hasattr(self, 'db') or self.db is None:
-            dbpath = os.path.join(HERE, 'faces.db')
-            self.db = FaceDB(dbpath)
+        self._ensure_db()
         try:
             from people_window import PeopleWindow
         except Exception:
@@ -233,15 +324,12 @@ class FaceRecApp(tk.Tk):
         folder = filedialog.askdirectory(title='Choose folder to index into DB')
         if not folder:
             return
-        # ensure DB
-        if not hasattr(self, 'db') or self.db is None:
-            dbpath = os.path.join(HERE, 'faces.db')
-            self.db = FaceDB(dbpath)
+        self._ensure_db()
         # create engine if needed
-        if not self.engine:
-            self.engine = FaceEngine()
-        # run indexing in background
-        self._run_worker(self._index_folder_worker, folder)
+        if self._get_engine() is None:
+            return
+        # run indexing in background, after any Quick Find
+        self._submit(f"Index {folder}", INDEX, self._index_folder_worker, folder)
 
     def _open_people_window(self):
         """Robustly import and open the PeopleWindow UI on the main thread."""
@@ -268,55 +356,91 @@ class FaceRecApp(tk.Tk):
             # if creating the window fails, silently ignore to avoid crashing the app
             pass
 
-    def _index_folder_worker(self, folder):
-        images = find_images(folder)
-        total = len(images)
-        self._set_progress(0, total)
-        added = 0
-        for idx, img in enumerate(images, 1):
-            try:
-                rel = rel_to(img, folder)
-                img_id = self.db.ensure_image(rel, img)
-                if self.db.has_faces(img_id):
-                    # already processed
-                    pass
-                else:
-                    dets = self.engine.extract_faces(img)
-                    for d in dets:
-                        self.db.add_face(img_id, d['bbox'], d['embedding'])
-                        added += 1
-            except Exception:
-                pass
-            if (idx % 10 == 0) or (idx == total):
-                self._set_progress(idx, total, f'Indexing {idx}/{total} | faces added: {added}')
+    def _index_folder_worker(self, job, folder):
+        with profiling.profiled('index'):
+            self._index_folder(job, folder)
+
+    def _index_folder(self, job, folder):
+        index_folder = _import("indexer").index_folder
+        QualityGate = _import("quality").QualityGate
+        BurstDeduper = _import("phash").BurstDeduper
+        workers_from_env = _import("shm_ring").workers_from_env
+        self._set_progress(0, 1)
+        m = RunMetrics(metrics_enabled())
+        m.info['folder'] = folder
+
+        def progress(idx, total, added):
+            text = f'Indexing {idx}/{total} | faces added: {added}'
+            if m.enabled:
+                text += f' | {m.status_text()}'
+            self._job_progress(job, idx, total, text)
+
+        # burst shots copy their representative's faces, so they stay in People and searches
+        added = index_folder(self.db, job.engine(), folder, thumbs=self.thumbs, metrics=m,
+                             should_stop=job.should_stop, progress=progress, progress_every=10,
+                             gate=QualityGate(), dedup=BurstDeduper(mode="inherit"), decoders=workers_from_env())['faces']
+        m.finish()
+        m.write_report(report_path_for(DB_PATH))
+        if job.cancelled:
+            self._set_status(f'Indexing cancelled. Faces added: {added}')
+            return added
         self._set_status(f'Indexing complete. Faces added: {added}')
-        # --- run clustering on all embeddings and apply labels ---
+        # --- recluster as maintenance: scans queued meanwhile share one run ---
+        self._cluster_metrics = m
+        self.scheduler.submit('Cluster people', self._cluster_worker, MAINTENANCE, key='cluster')
+        return added
+
+    def _cluster_worker(self, job):
+        cluster_library = _import("indexer").cluster_library
+        # clustering timings go into the report of the latest scan
+        m, self._cluster_metrics = self._cluster_metrics, None
         try:
-            embs = self.db.get_all_embeddings()
-            if embs:
-                from backend.cluster import Clusterer
-                cl = Clusterer()
-                labels = cl.cluster(embs)
-                self.db.apply_cluster_labels(labels)
-                clusters = self.db.list_clusters()
-                cnt = len(clusters)
-                self._set_status(f'Indexing complete. Faces added: {added}. Found {cnt} people.')
+            if cluster_library(self.db, metrics=m) is None:
+                self._set_status('Clustering complete. No faces found.')
             else:
-                self._set_status(f'Indexing complete. Faces added: {added}. No faces found.')
+                cnt = len(self.db.list_clusters())
+                self._set_status(f'Clustering complete. Found {cnt} people.')
         except Exception:
             # don't crash worker on clustering errors
             pass
+        if m is not None:
+            m.finish()
+            m.write_report(report_path_for(DB_PATH))
 
         # always try to open People window (even if clustering errored)
         self.after(0, self._open_people_window)
 
     # ------------ UI helpers ------------
-    def _run_worker(self, target, *args):
-        if self.worker and self.worker.is_alive():
-            messagebox.showwarning("Busy", "A job is already running.")
+    def _submit(self, name, priority, target, *args):
+        """Queue ``target(job, *args)`` on the scheduler; higher-priority jobs preempt it."""
+        return self.scheduler.submit(name, lambda job: target(job, *args), priority)
+
+    def _job_progress(self, job, val, total, status=None):
+        job.set_progress(val, total, status)
+        # a paused job doesn't get here; of several running ones the highest priority wins
+        if self.scheduler.foreground() in (None, job):
+            self._set_progress(val, total, status)
+
+    def _on_jobs_changed(self):
+        # called from job threads; coalesce into one update on the Tk thread
+        if not self._jobs_pending:
+            self._jobs_pending = True
+            self.after(200, self._show_jobs)
+
+    def _show_jobs(self):
+        self._jobs_pending = False
+        jobs = self.scheduler.active_jobs()
+        if not jobs:
+            self.jobs_state.set("")
             return
-        self.worker = threading.Thread(target=target, args=args, daemon=True)
-        self.worker.start()
+        paused = sum(1 for j in jobs if j.state == PAUSED)
+        queued = sum(1 for j in jobs if j.state == QUEUED)
+        text = f"Jobs: {len(jobs) - queued} running"
+        if paused:
+            text += f" ({paused} paused)"
+        if queued:
+            text += f", {queued} queued"
+        self.jobs_state.set(text)
 
     def _set_status(self, text):
         if threading.current_thread() is threading.main_thread():
@@ -335,40 +459,7 @@ class FaceRecApp(tk.Tk):
             self.after(0, upd)
 
     def _show_find_results(self, results):
-        for w in self.thumb_frame.winfo_children():
-            w.destroy()
-        self.thumb_cache.clear()
-
-        self.thumb_frame.update_idletasks()
-        width = self.canvas.winfo_width() or 900
-        cols = max(1, width // (THUMB_SIZE + 16))
-        r = c = 0
-        for rec in results:
-            path, bbox = rec["abs_path"], rec["bbox"]
-            try:
-                img = Image.open(path).convert("RGB")
-                thumb = thumb_from_face(img, bbox, THUMB_SIZE)
-                tkimg = ImageTk.PhotoImage(thumb)
-            except Exception:
-                continue
-
-            frame = ttk.Frame(self.thumb_frame, relief="flat", cursor="hand2")
-            lbl = ttk.Label(frame, image=tkimg, cursor="hand2")
-            lbl.image = tkimg
-            lbl.pack(side=tk.TOP, padx=2, pady=2)
-            cap = ttk.Label(frame, text=os.path.basename(path), cursor="hand2")
-            cap.pack(side=tk.TOP)
-
-            frame.grid(row=r, column=c, padx=6, pady=6)
-            self.thumb_cache[(r,c)] = tkimg
-
-            for w in (frame, lbl, cap):
-                w.bind("<Double-Button-1>", lambda e, p=path: self._open_folder(p))
-
-            c += 1
-            if c >= cols:
-                c = 0
-                r += 1
+        self.grid_view.set_faces(results)
 
     def _open_folder(self, path):
         try:
@@ -378,5 +469,10 @@ class FaceRecApp(tk.Tk):
             pass
 
 if __name__ == "__main__":
+    # decoder processes (FACEREC_DECODERS) are spawned; needed for frozen builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    # --profile[=cpu,mem,stack] / FACEREC_PROFILE; artefacts go to ./profiles next to faces.db
+    profiling.configure_from_argv(sys.argv, default_dir=os.path.join(os.path.dirname(DB_PATH), "profiles"))
     app = FaceRecApp()
     app.mainloop()
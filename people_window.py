@@ -1,8 +1,12 @@
 import os
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox, filedialog
-from PIL import Image, ImageTk
-from backend.utils import thumb_from_face
+from backend.thumbs import get_thumb_cache, thumb_dir_for
+from tk_export import ExportDialog
+from tk_thumbs import TkFaceGrid, TkThumbLoader
+from PIL import ImageTk
+
+AVATAR_SIZE = 40
 
 class PeopleWindow(tk.Toplevel):
     def __init__(self, parent, db):
@@ -10,6 +14,7 @@ class PeopleWindow(tk.Toplevel):
         self.title('People')
         self.geometry('900x600')
         self.db = db
+        self.thumbs = get_thumb_cache(thumb_dir_for(db.path))
 
         top = ttk.Frame(self)
         top.pack(side=tk.TOP, fill=tk.X, padx=6, pady=6)
@@ -20,7 +25,11 @@ class PeopleWindow(tk.Toplevel):
         for b in (self.btn_refresh, self.btn_rename, self.btn_merge, self.btn_export):
             b.pack(side=tk.LEFT, padx=4)
 
-        self.tree = ttk.Treeview(self, columns=('label', 'count'), show='headings', selectmode='extended')
+        style = ttk.Style(self)
+        style.configure('People.Treeview', rowheight=AVATAR_SIZE + 6)
+        self.tree = ttk.Treeview(self, columns=('label', 'count'), show='tree headings', selectmode='extended',
+                                 style='People.Treeview')
+        self.tree.column('#0', width=AVATAR_SIZE + 24, stretch=False)
         self.tree.heading('label', text='Label')
         self.tree.heading('count', text='Photos')
         self.tree.column('label', width=300)
@@ -30,22 +39,41 @@ class PeopleWindow(tk.Toplevel):
         self.preview = ttk.Frame(self)
         self.preview.pack(side=tk.RIGHT, fill=tk.BOTH, expand=False, padx=6, pady=6)
 
-        self.canvas = tk.Canvas(self.preview, width=320)
-        self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.preview_grid = TkFaceGrid(self.preview, self.thumbs, 140, captions=False, pad=4)
+        self.preview_grid.canvas.configure(width=4 * 148)
+        self.preview_grid.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
         # Bind selection and double-click handlers
         self.tree.bind('<<TreeviewSelect>>', self.on_select)
         self.tree.bind('<Double-1>', self.on_tree_double)
 
-        self._thumbs = []
+        # representative faces load in the background and fill in the rows
+        self._avatars = {}
+        self.avatar_loader = TkThumbLoader(self, self.thumbs)
         self.refresh()
 
     def refresh(self):
+        self.avatar_loader.cancel()
+        self._avatars.clear()
         for row in self.tree.get_children():
             self.tree.delete(row)
+        # cheap when nothing changed: only clusters flagged dirty are recomputed
+        self.db.update_representatives()
+        reps = self.db.get_representatives()
         rows = self.db.list_clusters()
-        for cid, label, cnt in rows:
+        for i, (cid, label, cnt) in enumerate(rows):
             self.tree.insert('', 'end', iid=str(cid), values=(label, cnt))
+            rep = reps.get(cid)
+            if rep is not None:
+                # earlier rows are on screen first
+                self.avatar_loader.request(cid, rep['abs_path'], rep['bbox'], AVATAR_SIZE, self._on_avatar, -i)
+
+    def _on_avatar(self, cid, thumb):
+        if thumb is None or not self.tree.exists(str(cid)):
+            return
+        img = ImageTk.PhotoImage(thumb)
+        self._avatars[cid] = img
+        self.tree.item(str(cid), image=img)
 
     def _get_selected_cluster_ids(self):
         return [int(i) for i in self.tree.selection()]
@@ -85,8 +113,8 @@ class PeopleWindow(tk.Toplevel):
         if not out:
             return
         libroot = os.getcwd()
-        n = self.db.export_cluster(cid, libroot, out)
-        messagebox.showinfo('Export', f'Exported {n} files to {out}')
+        ExportDialog(self, lambda mode, progress, stop: self.db.export_cluster(
+            cid, libroot, out, mode=mode, progress=progress, stop_event=stop))
 
     def on_select(self, _ev=None):
         sels = self._get_selected_cluster_ids()
@@ -95,26 +123,7 @@ class PeopleWindow(tk.Toplevel):
         cid = sels[0]
         faces = self.db.get_faces_by_cluster(cid)
         # show up to 16 thumbs
-        for w in self.preview.winfo_children():
-            w.destroy()
-        self._thumbs.clear()
-        cols = 4
-        r = c = 0
-        for rec in faces[:16]:
-            path = rec['abs_path']
-            bbox = rec['bbox']
-            try:
-                img = Image.open(path).convert('RGB')
-                thumb = thumb_from_face(img, bbox, size=140)
-                tkimg = ImageTk.PhotoImage(thumb)
-            except Exception:
-                continue
-            lbl = ttk.Label(self.preview, image=tkimg)
-            lbl.image = tkimg
-            lbl.grid(row=r, column=c, padx=4, pady=4)
-            c += 1
-            if c >= cols:
-                c = 0; r += 1
+        self.preview_grid.set_faces(faces[:16])
 
     def on_tree_double(self, ev=None):
         iid = self.tree.focus()
@@ -133,48 +142,20 @@ class PersonDetailWindow(tk.Toplevel):
         self.title(f'Person {cluster_id}')
         self.geometry('1000x700')
         self.db = db
+        self.thumbs = get_thumb_cache(thumb_dir_for(db.path))
         self.cluster_id = cluster_id
 
         top = ttk.Frame(self)
         top.pack(side=tk.TOP, fill=tk.X, padx=6, pady=6)
         ttk.Button(top, text='Export', command=self.export).pack(side=tk.LEFT)
 
-        self.canvas = tk.Canvas(self)
-        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0,0), window=self.frame, anchor='nw')
-        self.canvas.configure(yscrollcommand=self.scroll.set)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.frame.bind('<Configure>', lambda e: self.canvas.configure(scrollregion=self.canvas.bbox('all')))
-
-        self._thumbs = []
+        # windowed grid: only the visible rows exist as canvas items
+        self.grid_view = TkFaceGrid(self, self.thumbs, 160, on_open=self._open)
+        self.grid_view.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self._populate()
 
     def _populate(self):
-        for w in self.frame.winfo_children():
-            w.destroy()
-        faces = self.db.get_faces_by_cluster(self.cluster_id)
-        cols = 5
-        r = c = 0
-        for rec in faces:
-            path = rec['abs_path']
-            bbox = rec['bbox']
-            try:
-                img = Image.open(path).convert('RGB')
-                thumb = thumb_from_face(img, bbox, size=160)
-                tkimg = ImageTk.PhotoImage(thumb)
-            except Exception:
-                continue
-            lbl = ttk.Label(self.frame, image=tkimg, cursor='hand2')
-            lbl.image = tkimg
-            lbl.grid(row=r, column=c, padx=6, pady=6)
-            lbl.bind('<Double-1>', lambda e, p=path: self._open(p))
-            cap = ttk.Label(self.frame, text=os.path.basename(path))
-            cap.grid(row=r+1, column=c, padx=6, pady=(0,8))
-            c += 1
-            if c >= cols:
-                c = 0; r += 2
+        self.grid_view.set_faces(self.db.get_faces_by_cluster(self.cluster_id))
 
     def _open(self, path):
         try:
@@ -187,5 +168,6 @@ class PersonDetailWindow(tk.Toplevel):
         out = filedialog.askdirectory(title='Choose export folder')
         if not out:
             return
-        n = self.db.export_cluster(self.cluster_id, os.getcwd(), out)
-        messagebox.showinfo('Export', f'Exported {n} files to {out}', parent=self)
+        libroot = os.getcwd()
+        ExportDialog(self, lambda mode, progress, stop: self.db.export_cluster(
+            self.cluster_id, libroot, out, mode=mode, progress=progress, stop_event=stop))
@@ -0,0 +1,80 @@
+import threading
+from PyQt6 import QtWidgets, QtCore
+
+from backend.export import MODES
+
+MODE_LABELS = {
+    'copy': 'Copy files',
+    'hardlink': 'Hard links (same drive, no extra space)',
+    'symlink': 'Symbolic links',
+    'reflink': 'Reflink / clone (copy-on-write filesystems)',
+    'zip': 'Single .zip archive',
+    'tar': 'Single .tar archive',
+}
+
+
+class _ExportThread(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int, int)
+    done = QtCore.pyqtSignal(object)
+
+    def __init__(self, job, mode):
+        super().__init__()
+        self.job = job
+        self.mode = mode
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            res = self.job(self.mode, lambda d, t: self.progress.emit(d, t), self.stop_event)
+        except Exception as e:
+            res = e
+        self.done.emit(res)
+
+
+def run_export(parent, job, title='Export'):
+    """Ask for an export mode, run ``job(mode, progress, stop_event)`` off the
+    GUI thread behind a cancellable progress dialog and report the outcome.
+    """
+    labels = [MODE_LABELS[m] for m in MODES]
+    choice, ok = QtWidgets.QInputDialog.getItem(parent, title, 'Export as:', labels, 0, False)
+    if not ok:
+        return None
+    mode = MODES[labels.index(choice)]
+
+    dlg = QtWidgets.QProgressDialog('Exporting…', 'Cancel', 0, 0, parent)
+    dlg.setWindowTitle(title)
+    dlg.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+    dlg.setMinimumDuration(0)
+    th = _ExportThread(job, mode)
+    out = []
+
+    def on_progress(done, total):
+        dlg.setMaximum(total)
+        dlg.setValue(done)
+
+    def on_done(res):
+        out.append(res)
+        dlg.reset()
+
+    th.progress.connect(on_progress)
+    th.done.connect(on_done)
+    dlg.canceled.connect(th.stop_event.set)
+    th.start()
+    dlg.exec()
+    if not out:
+        # cancelled from the dialog: let in-flight copies finish cleanly
+        th.stop_event.set()
+        th.wait()
+        QtCore.QCoreApplication.processEvents()
+    res = out[0] if out else None
+    if isinstance(res, Exception) or res is None:
+        QtWidgets.QMessageBox.critical(parent, title, f'Export failed: {res}')
+        return None
+    box = QtWidgets.QMessageBox(parent)
+    box.setWindowTitle(title)
+    box.setText(res.summary())
+    if res.failed:
+        box.setIcon(QtWidgets.QMessageBox.Icon.Warning)
+        box.setDetailedText('\n'.join(f'{src}: {err}' for src, err in res.failed))
+    box.exec()
+    return res
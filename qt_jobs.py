@@ -0,0 +1,73 @@
+from PyQt6 import QtWidgets, QtCore
+
+
+class JobsDialog(QtWidgets.QDialog):
+    """Queue view of a backend Scheduler: running, paused, queued and recent jobs.
+
+    ``changed`` is the window's signal re-emitting scheduler changes on the
+    GUI thread. Cancel stops the selected jobs (queued ones are dropped,
+    running ones stop at their next checkpoint).
+    """
+    COLUMNS = ('Job', 'Priority', 'State', 'Progress', 'Status')
+
+    def __init__(self, parent, scheduler, changed):
+        super().__init__(parent)
+        self.setWindowTitle('Jobs')
+        self.resize(900, 320)
+        self.scheduler = scheduler
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        btns = QtWidgets.QHBoxLayout()
+        cancel = QtWidgets.QPushButton('Cancel Selected')
+        cancel.clicked.connect(self.cancel_selected)
+        close = QtWidgets.QPushButton('Close')
+        close.clicked.connect(self.accept)
+        btns.addStretch()
+        btns.addWidget(cancel)
+        btns.addWidget(close)
+        layout.addLayout(btns)
+
+        # progress arrives many times a second; redraw at most every 200 ms
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(200)
+        self._timer.timeout.connect(self.refresh)
+        changed.connect(self._timer.start)
+        self.refresh()
+
+    def refresh(self):
+        selected = {self._job_id(r) for r in {i.row() for i in self.table.selectedIndexes()}}
+        jobs = self.scheduler.jobs()
+        self.table.clearSelection()
+        self.table.setRowCount(len(jobs))
+        flags = QtCore.QItemSelectionModel.SelectionFlag
+        sel = self.table.selectionModel()
+        for row, j in enumerate(jobs):
+            progress = f"{j['done']}/{j['total']}" if j['total'] else ''
+            values = (j['name'], j['priority_name'], j['state'], progress, j['error'] or j['text'])
+            for col, v in enumerate(values):
+                item = QtWidgets.QTableWidgetItem(v)
+                item.setData(QtCore.Qt.ItemDataRole.UserRole, j['id'])
+                self.table.setItem(row, col, item)
+            if j['id'] in selected:
+                sel.select(self.table.model().index(row, 0), flags.Select | flags.Rows)
+
+    def _job_id(self, row):
+        item = self.table.item(row, 0)
+        return item.data(QtCore.Qt.ItemDataRole.UserRole) if item is not None else None
+
+    def cancel_selected(self):
+        for row in {i.row() for i in self.table.selectedIndexes()}:
+            job = self.scheduler.get(self._job_id(row))
+            if job is not None and job.active:
+                job.cancel()
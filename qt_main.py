@@ -1,5 +1,6 @@
 import sys
 import os
+import time
 from PyQt6 import QtWidgets, QtGui, QtCore
 import numpy as np
 
@@ -9,9 +10,21 @@ if BACKEND not in sys.path:
     sys.path.insert(0, BACKEND)
 
 from backend.db import FaceDB
-from backend.utils import find_images, thumb_from_face, rel_to
-
-from backend.cluster import Clusterer
+from backend.utils import find_images
+from backend.thumbs import get_thumb_cache, thumb_dir_for
+from backend.export import export_files
+from backend.metrics import RunMetrics, metrics_enabled, report_path_for
+from backend import profiling, startup
+from backend.profiling import profiled
+from backend.startup import EngineWarmup
+from backend.scheduler import Scheduler, INTERACTIVE, INDEX, MAINTENANCE, PAUSED, QUEUED
+# the indexing pipeline (and through it cv2, sklearn, insightface) is imported
+# where it's used, so the window shows before any of it loads
+from qt_export import run_export
+from qt_jobs import JobsDialog
+from qt_thumbs import FaceGridView
+
+DB_PATH = os.path.join(HERE, 'faces.db')
 
 
 class ThumbnailResultsDialog(QtWidgets.QDialog):
@@ -29,84 +42,10 @@ class ThumbnailResultsDialog(QtWidgets.QDialog):
         info = QtWidgets.QLabel(f'Showing top {len(results)} matches')
         layout.addWidget(info)
 
-        scroll = QtWidgets.QScrollArea(self)
-        scroll.setWidgetResizable(True)
-        w = QtWidgets.QWidget()
-        grid = QtWidgets.QGridLayout(w)
-        # tighten spacing so thumbnails are close together
-        grid.setSpacing(6)
-        grid.setContentsMargins(6, 6, 6, 6)
-
-        r = c = 0
-        for sim, path, bbox in results:
-            try:
-                import cv2
-                arr = cv2.imread(path)
-                if arr is None:
-                    continue
-                # face_engine uses cv2 coordinates (x1,y1,x2,y2)
-                x1, y1, x2, y2 = bbox
-                h_img, w_img = arr.shape[:2]
-                x1 = max(0, int(x1)); y1 = max(0, int(y1)); x2 = min(w_img, int(x2)); y2 = min(h_img, int(y2))
-                if x2 <= x1 or y2 <= y1:
-                    continue
-                face = arr[y1:y2, x1:x2]
-                face_rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-                fh, fw = face_rgb.shape[:2]
-
-                # convert to QImage
-                bytes_per_line = fw * 3
-                qimg = QtGui.QImage(face_rgb.data, fw, fh, bytes_per_line, QtGui.QImage.Format.Format_RGB888).copy()
-                pix = QtGui.QPixmap.fromImage(qimg)
-
-                # scale while keeping aspect ratio, then center on a square canvas
-                scaled = pix.scaled(thumb_size, thumb_size, QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
-                canvas = QtGui.QPixmap(thumb_size, thumb_size)
-                canvas.fill(QtGui.QColor('#f5f5f5'))
-                painter = QtGui.QPainter(canvas)
-                xoff = (thumb_size - scaled.width()) // 2
-                yoff = (thumb_size - scaled.height()) // 2
-                painter.drawPixmap(xoff, yoff, scaled)
-                painter.end()
-
-                btn = QtWidgets.QPushButton()
-                # remove visible button chrome and focus border
-                btn.setFlat(True)
-                btn.setStyleSheet('border: none; padding: 0; margin: 0;')
-                btn.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
-                btn.setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.PointingHandCursor))
-                btn.setFixedSize(thumb_size, thumb_size)
-                icon = QtGui.QIcon(canvas)
-                btn.setIcon(icon)
-                btn.setIconSize(QtCore.QSize(thumb_size, thumb_size))
-                btn.setToolTip(f"{os.path.basename(path)}")
-                btn._path = path
-                btn.clicked.connect(lambda _checked, p=path: QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(p)))
-
-                v = QtWidgets.QVBoxLayout()
-                # zero margins so items sit tightly together
-                v.setContentsMargins(0, 2, 0, 2)
-                v.setSpacing(2)
-                v.addWidget(btn)
-                fname = os.path.basename(path)
-                lbl = QtWidgets.QLabel(fname)
-                lbl.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-                v.addWidget(lbl)
-
-                container = QtWidgets.QWidget()
-                container.setLayout(v)
-                container.setContentsMargins(0, 0, 0, 0)
-                container.setStyleSheet('background: transparent;')
-                grid.addWidget(container, r, c)
-                c += 1
-                if c >= cols:
-                    c = 0
-                    r += 1
-            except Exception:
-                continue
-
-        scroll.setWidget(w)
-        layout.addWidget(scroll)
+        self.grid = FaceGridView(get_thumb_cache(thumb_dir_for(DB_PATH)), thumb_size, self)
+        self.grid.set_faces([{'abs_path': path, 'bbox': bbox, 'tooltip': os.path.basename(path)}
+                             for sim, path, bbox in results])
+        layout.addWidget(self.grid)
         btns = QtWidgets.QHBoxLayout()
         close = QtWidgets.QPushButton('Close')
         close.clicked.connect(self.accept)
@@ -118,53 +57,82 @@ class ThumbnailResultsDialog(QtWidgets.QDialog):
 class Indexer(QtCore.QThread):
     progress = QtCore.pyqtSignal(int, int, str)
     finished = QtCore.pyqtSignal(int)
+    # RunMetrics.snapshot() dicts, about once a second and once at the end
+    stats = QtCore.pyqtSignal(dict)
 
-    def __init__(self, db, engine, folder):
+    def __init__(self, db, engine, folder, make_thumbs=True, collect_stats=None, cluster=True):
         super().__init__()
         self.db = db
         self.engine = engine
         self.folder = folder
+        # pre-render face thumbnails while the image is hot in the page cache
+        self.thumbs = get_thumb_cache(thumb_dir_for(db.path)) if make_thumbs else None
+        self.metrics = RunMetrics(metrics_enabled() if collect_stats is None else collect_stats)
+        self.report_path = None
+        # False when the caller queues reclustering as its own (maintenance) job
+        self.cluster = cluster
+        self.job = None
         self._stop = False
+        self._last_stats = 0.0
 
     def stop(self):
         self._stop = True
 
+    def should_stop(self):
+        return self._stop or (self.job is not None and self.job.should_stop())
+
+    def run_job(self, job):
+        """Run as a Scheduler job instead of on this QThread; yields to higher-priority jobs."""
+        self.job = job
+        self.run()
+
+    def _on_progress(self, idx, total, added):
+        text = f'Indexing {idx}/{total} | faces added: {added}'
+        if self.job is not None:
+            self.job.set_progress(idx, total, text)
+        self.progress.emit(idx, total, text)
+        now = time.monotonic()
+        if self.metrics.enabled and now - self._last_stats >= 1.0:
+            self._last_stats = now
+            self.stats.emit(self.metrics.snapshot())
+
     def run(self):
-        images = find_images(self.folder)
-        total = len(images)
-        added = 0
-        for idx, img in enumerate(images, 1):
-            if self._stop:
-                break
+        with profiled('index'):
+            self._run()
+
+    def _run(self):
+        from backend.indexer import index_folder, cluster_library
+        from backend.quality import QualityGate
+        from backend.phash import BurstDeduper
+        from backend.shm_ring import workers_from_env
+        m = self.metrics
+        m.info['folder'] = self.folder
+        # burst shots copy their representative's faces, so they stay in People and searches
+        added = index_folder(self.db, self.engine, self.folder, thumbs=self.thumbs, metrics=m,
+                             should_stop=self.should_stop, progress=self._on_progress, gate=QualityGate(),
+                             dedup=BurstDeduper(mode="inherit"), decoders=workers_from_env())['faces']
+
+        # clustering
+        if self.cluster:
             try:
-                rel = rel_to(img, self.folder)
-                img_id = self.db.ensure_image(rel, img)
-                if self.db.has_faces(img_id):
-                    pass
-                else:
-                    dets = self.engine.extract_faces(img)
-                    for d in dets:
-                        self.db.add_face(img_id, d['bbox'], d['embedding'])
-                        added += 1
+                cluster_library(self.db, metrics=m)
             except Exception:
                 pass
-            if (idx % 5 == 0) or (idx == total):
-                self.progress.emit(idx, total, f'Indexing {idx}/{total} | faces added: {added}')
-
-        # clustering
-        try:
-            embs = self.db.get_all_embeddings()
-            if embs:
-                cl = Clusterer()
-                labels = cl.cluster(embs)
-                self.db.apply_cluster_labels(labels)
-        except Exception:
-            pass
 
+        m.finish()
+        self.report_path = m.write_report(report_path_for(self.db.path))
+        if m.enabled:
+            self.stats.emit(m.snapshot())
         self.finished.emit(added)
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    # (engine or None, error text) from the warm-up thread
+    engine_loaded = QtCore.pyqtSignal(object, str)
+    # scheduler changes, and callables to run on the GUI thread, from job threads
+    jobs_changed = QtCore.pyqtSignal()
+    call_in_gui = QtCore.pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle('FaceRecognition — Qt')
@@ -179,53 +147,134 @@ class MainWindow(QtWidgets.QMainWindow):
         btn_people = QtGui.QAction('People', self)
         btn_export = QtGui.QAction('Export Matches', self)
         btn_cancel = QtGui.QAction('Cancel', self)
+        btn_jobs = QtGui.QAction('Jobs', self)
         toolbar.addAction(btn_find)
         toolbar.addAction(btn_scan)
         toolbar.addAction(btn_people)
         toolbar.addAction(btn_export)
         toolbar.addAction(btn_cancel)
+        toolbar.addAction(btn_jobs)
+        toolbar.addSeparator()
+        self.act_stats = QtGui.QAction('Scan Stats', self)
+        self.act_stats.setCheckable(True)
+        self.act_stats.setChecked(metrics_enabled())
+        self.act_stats.setToolTip('Collect per-stage timings while scanning and write last_scan.json next to faces.db')
+        toolbar.addAction(self.act_stats)
+        toolbar.addSeparator()
+        # photos by people in the index: "alice and bob", "alice -carol"
+        self.search_box = QtWidgets.QLineEdit()
+        self.search_box.setPlaceholderText('People: alice and bob, alice -carol')
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setMaximumWidth(320)
+        self.search_box.returnPressed.connect(self.on_search)
+        toolbar.addWidget(self.search_box)
 
         # status bar and DB should be initialized as part of the window
         self.status = QtWidgets.QStatusBar()
         self.setStatusBar(self.status)
-
-        self.db = FaceDB(os.path.join(HERE, 'faces.db'))
-        # lazy-load FaceEngine because importing insightface/onnxruntime
-        # can raise a DLL import error on some systems. We'll create it
-        # only when a scan is requested.
+        # throughput / bottleneck summary of the running (or last) scan
+        self.stats_label = QtWidgets.QLabel('')
+        self.status.addPermanentWidget(self.stats_label)
+        self.jobs_label = QtWidgets.QLabel('')
+        self.status.addPermanentWidget(self.jobs_label)
+        self.engine_label = QtWidgets.QLabel('Face engine: waiting')
+        self.status.addPermanentWidget(self.engine_label)
+
+        self.db = FaceDB(DB_PATH)
+        self.thumbs = get_thumb_cache(thumb_dir_for(DB_PATH))
+        # FaceEngine is built in the background once the window is up
+        # (start_warmup); importing insightface/onnxruntime can also raise a
+        # DLL import error on some systems, which only disables scanning.
         self.engine = None
+        self._warmup = EngineWarmup(on_done=lambda e, err: self.engine_loaded.emit(e, str(err) if err else ''))
+        self.engine_loaded.connect(self._on_engine_loaded)
+        # Quick Find runs before indexing, indexing before reclustering; all share the one engine
+        self.scheduler = Scheduler(engine=self._warmup.wait)
+        self.scheduler.subscribe(self.jobs_changed.emit)
+        self.call_in_gui.connect(lambda fn: fn())
+        self.jobs_changed.connect(self._show_jobs)
 
         # wire actions
         btn_scan.triggered.connect(self.on_scan)
         btn_people.triggered.connect(self.on_people)
         btn_find.triggered.connect(self.on_find_person)
-        btn_export.triggered.connect(self.on_people)
+        btn_export.triggered.connect(self.on_export_matches)
         btn_cancel.triggered.connect(self.on_cancel)
+        btn_jobs.triggered.connect(self.on_jobs)
 
         # indexer placeholder
         self._indexer = None
+        # metrics of the latest scan, which the queued recluster adds its timings to
+        self._cluster_metrics = None
+        # (sim, path, bbox) matches of the last Find Person run
+        self._find_results = []
 
-        # central preview area: a scrollable widget where we can show thumbnails
-        self._preview_scroll = QtWidgets.QScrollArea()
-        self._preview_scroll.setWidgetResizable(True)
-        self._preview_widget = QtWidgets.QWidget()
-        self._preview_layout = QtWidgets.QGridLayout(self._preview_widget)
-        self._preview_layout.setSpacing(6)
-        self._preview_layout.setContentsMargins(6, 6, 6, 6)
-        self._preview_scroll.setWidget(self._preview_widget)
+        # central preview area: a virtualised grid where thumbnails load in the background
+        self._preview = FaceGridView(self.thumbs, 120)
         # start with an empty placeholder central widget
         placeholder = QtWidgets.QLabel('No previews yet. Use Scan Folder to index images and see previews here.')
         placeholder.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         self.setCentralWidget(placeholder)
 
     def on_cancel(self):
-        # Stop any running indexer thread
-        if self._indexer is not None:
-            try:
-                self._indexer.stop()
-                self.status.showMessage('Cancelling...')
-            except Exception:
-                pass
+        # the job in the foreground; the Jobs dialog cancels any other
+        job = self.scheduler.foreground() or next(iter(self.scheduler.active_jobs()), None)
+        if job is not None:
+            job.cancel()
+            self.status.showMessage(f'Cancelling {job.name}...')
+
+    def on_jobs(self):
+        dlg = JobsDialog(self, self.scheduler, self.jobs_changed)
+        dlg.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.show()
+
+    def _show_jobs(self):
+        jobs = self.scheduler.active_jobs()
+        fg = self.scheduler.foreground()
+        if fg is not None and fg.text:
+            self.status.showMessage(fg.text)
+        if not jobs:
+            self.jobs_label.setText('')
+            return
+        paused = sum(1 for j in jobs if j.state == PAUSED)
+        queued = sum(1 for j in jobs if j.state == QUEUED)
+        text = f'Jobs: {len(jobs) - queued} running'
+        if paused:
+            text += f' ({paused} paused)'
+        if queued:
+            text += f', {queued} queued'
+        self.jobs_label.setText(text)
+        self.jobs_label.setToolTip('\n'.join(f'{j.name}: {j.state}' for j in jobs))
+
+    def on_search(self):
+        query = self.search_box.text().strip()
+        if not query:
+            return
+        from backend.people_search import search
+        self.status.showMessage(f'Searching: {query}')
+        self.scheduler.submit(f'Search {query}', lambda job: search(self.db, query, limit=2000), INTERACTIVE,
+                              on_done=lambda job: self.call_in_gui.emit(lambda: self._on_search_done(job, query)))
+
+    def _on_search_done(self, job, query):
+        if isinstance(job.error, ValueError):
+            self.status.showMessage(f"Can't search for {query!r}: {job.error}")
+            return
+        if job.error is not None or job.result is None:
+            self.status.showMessage(f'Search failed: {job.error}')
+            return
+        res = job.result
+        # (sim, path, bbox) like Find Person, so Export Matches takes these too
+        self._find_results = [(1.0, r['source_path'], r['bbox']) for r in res['images']]
+        self._preview.set_faces([{'abs_path': r['abs_path'], 'bbox': r['bbox'],
+                                  'tooltip': os.path.basename(r['source_path'])} for r in res['images']])
+        self.setCentralWidget(self._preview)
+        text = f"{res['total']} photos for {query!r}"
+        if res['total'] > len(res['images']):
+            text += f" (showing {len(res['images'])})"
+        missing = [name for name, found in res['people'].items() if not found]
+        if missing:
+            text += ' — nobody called ' + ', '.join(repr(n) for n in missing)
+        self.status.showMessage(text)
 
     def on_find_person(self):
         # Quick find: pick reference photo and folder, then scan folder for similar faces
@@ -255,23 +304,47 @@ class MainWindow(QtWidgets.QMainWindow):
         if not folder:
             return
 
+        # off the GUI thread, ahead of (and pausing) any indexing
+        self.status.showMessage(f'Scanning {folder} for this person...')
+        self.scheduler.submit(f'Find person in {folder}', lambda job: self._quick_find(job, ref_emb, folder),
+                              INTERACTIVE, on_done=lambda job: self.call_in_gui.emit(lambda: self._on_find_done(job)))
+
+    def _quick_find(self, job, ref_emb, folder):
+        from backend.search import score_faces
+        engine = job.engine()
         imgs = find_images(folder)
         results = []
-        for img in imgs:
-            try:
-                ds = engine.extract_faces(img)
-                for d in ds:
-                    emb = np.array(d['embedding'], dtype=np.float32)
+        with profiled('quick_find'):
+            for idx, img in enumerate(imgs, 1):
+                if job.should_stop():
+                    break
+                try:
+                    ds = engine.extract_faces(img)
                     # cosine similarity
-                    sim = float((ref_emb * emb).sum() / (np.linalg.norm(ref_emb) * np.linalg.norm(emb) + 1e-9))
-                    results.append((sim, img, d['bbox']))
-            except Exception:
-                pass
+                    for sim, d in zip(score_faces(ref_emb, ds), ds):
+                        results.append((float(sim), img, d['bbox']))
+                except Exception:
+                    pass
+                if idx % 10 == 0 or idx == len(imgs):
+                    job.set_progress(idx, len(imgs), f'Scanning {idx}/{len(imgs)}')
         results.sort(key=lambda x: -x[0])
+        return results
+
+    def _on_find_done(self, job):
+        if job.error is not None:
+            QtWidgets.QMessageBox.critical(self, 'Find Person', f'Scan failed: {job.error}')
+            return
+        results = job.result or []
         # filter by similarity threshold to avoid returning every image
         threshold = 0.50  # show matches with cosine similarity >= threshold
         filtered = [r for r in results if r[0] >= threshold]
         top = filtered[:50]
+        self._find_results = filtered
+        if job.cancelled:
+            self.status.showMessage(f'Scan cancelled. Matches so far: {len(filtered)}')
+            if top:
+                self.show_results_on_main(top)
+            return
         if not top:
             QtWidgets.QMessageBox.information(self, 'Find Person', 'No matches found above similarity threshold (0.50). Try a different reference photo or lower the threshold in settings.')
             return
@@ -279,6 +352,18 @@ class MainWindow(QtWidgets.QMainWindow):
         self.status.showMessage(f'Found {len(top)} matches — showing on main page')
         self.show_results_on_main(top)
 
+    def on_export_matches(self):
+        if not self._find_results:
+            QtWidgets.QMessageBox.information(self, 'Export Matches', 'No matches to export. Use Find Person first.')
+            return
+        out_root = QtWidgets.QFileDialog.getExistingDirectory(self, 'Choose export folder')
+        if not out_root:
+            return
+        out_dir = os.path.join(out_root, f"FindPerson_{time.strftime('%Y%m%d_%H%M%S')}")
+        sources = [path for _sim, path, _bbox in self._find_results]
+        run_export(self, lambda mode, progress, stop: export_files(
+            sources, out_dir, mode=mode, progress=progress, stop_event=stop), 'Export Matches')
+
     def on_scan(self):
         dlg = QtWidgets.QFileDialog(self)
         dlg.setFileMode(QtWidgets.QFileDialog.FileMode.Directory)
@@ -289,187 +374,112 @@ class MainWindow(QtWidgets.QMainWindow):
             if engine is None:
                 QtWidgets.QMessageBox.critical(self, 'Error', 'Face engine could not be loaded. Check onnxruntime and insightface installation.')
                 return
-            self._indexer = Indexer(self.db, engine, folder)
-            self._indexer.progress.connect(lambda i,t,s: self.status.showMessage(s))
-            self._indexer.finished.connect(self._on_index_finished)
-            self._indexer.start()
+            indexer = Indexer(self.db, engine, folder, collect_stats=self.act_stats.isChecked(), cluster=False)
+            indexer.stats.connect(lambda snap, idx=indexer: self._on_index_stats(snap, idx))
+            self.stats_label.setText('')
+            indexer.finished.connect(lambda added, idx=indexer: self._on_index_finished(added, idx))
+            self._indexer = indexer
+            self.scheduler.submit(f'Index {folder}', indexer.run_job, INDEX)
+
+    def start_warmup(self):
+        startup.mark('window_shown_s')
+        self.engine_label.setText('Face engine: loading…')
+        self._warmup.start()
+
+    def _on_engine_loaded(self, engine, error):
+        if engine is not None:
+            self.engine = engine
+            self.engine_label.setText('Face engine: ready')
+            self.engine_label.setToolTip(f'Loaded in {self._warmup.elapsed_s:.1f} s')
+        else:
+            self.engine_label.setText('Face engine: unavailable')
+            self.engine_label.setToolTip(error)
+            self.status.showMessage(f'Failed to load face engine: {error}')
+        if startup.write_report(error=error or None):
+            QtWidgets.QApplication.quit()
 
     def _get_engine(self):
-        """Lazy import and instantiate FaceEngine. Returns None on failure."""
+        """The warmed-up FaceEngine, waiting for it if it's still loading. None on failure."""
         if self.engine is not None:
             return self.engine
-        try:
-            # import here to avoid top-level import errors
-            from backend.face_engine import FaceEngine
-            self.engine = FaceEngine()
-            return self.engine
-        except Exception as e:
+        if not self._warmup.done:
+            self.status.showMessage('Waiting for the face engine to finish loading…')
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
+            try:
+                self._warmup.wait()
+            finally:
+                QtWidgets.QApplication.restoreOverrideCursor()
+        if self._warmup.engine is None:
             # log to status bar and return None; scanning will be disabled
-            self.status.showMessage(f'Failed to load face engine: {e}')
+            self.status.showMessage(f'Failed to load face engine: {self._warmup.error}')
             return None
+        self.engine = self._warmup.engine
+        return self.engine
 
     def run_index(self, folder):
         # kept for compatibility, but we use Indexer now
         pass
 
-    def _on_index_finished(self, added):
-        self.status.showMessage(f'Indexing complete. Faces added: {added}')
+    def _on_index_stats(self, snap, indexer=None):
+        indexer = indexer or self._indexer
+        self.stats_label.setText(indexer.metrics.status_text(snap) if indexer else '')
+        lines = [f"{name}: {st['count']}× mean {st['mean_ms']:.1f} ms, p95 {st['p95_ms']:.1f} ms"
+                 for name, st in sorted(snap['stages'].items(), key=lambda kv: -kv[1]['total_s'])]
+        self.stats_label.setToolTip('\n'.join(lines))
+
+    def _on_index_finished(self, added, indexer=None):
+        indexer = indexer or self._indexer
+        cancelled = indexer is not None and indexer.job is not None and indexer.job.cancelled
+        msg = f"Indexing {'cancelled' if cancelled else 'complete'}. Faces added: {added}"
+        if indexer is not None and indexer.report_path:
+            msg += f' — report: {indexer.report_path}'
+        self.status.showMessage(msg)
+        if indexer is not None and not indexer.cluster and not cancelled:
+            # scans finishing while one is queued share a single recluster
+            self._cluster_metrics = indexer.metrics
+            self.scheduler.submit('Cluster people', self._cluster, MAINTENANCE, key='cluster')
         # show recently added faces on the main page instead of opening a new dialog
         QtCore.QTimer.singleShot(100, lambda: self.show_recent_faces_preview())
 
+    def _cluster(self, job):
+        from backend.indexer import cluster_library
+        m, self._cluster_metrics = self._cluster_metrics, None
+        try:
+            n = cluster_library(self.db, metrics=m)
+        except Exception:
+            n = None
+        if m is not None:
+            m.finish()
+            m.write_report(report_path_for(self.db.path))
+        return n
+
     def show_recent_faces_preview(self, limit: int = 48, thumb_size: int = 120, cols: int = 6):
         try:
             faces = self.db.get_recent_faces(limit)
         except Exception:
             faces = []
 
-        # clear existing layout
-        while self._preview_layout.count():
-            it = self._preview_layout.takeAt(0)
-            w = it.widget()
-            if w is not None:
-                w.setParent(None)
-
-        r = c = 0
-        for item in faces:
-            path = item.get('abs_path')
-            bbox = item.get('bbox')
-            try:
-                import cv2
-                arr = cv2.imread(path)
-                if arr is None:
-                    continue
-                x1, y1, x2, y2 = bbox
-                h_img, w_img = arr.shape[:2]
-                x1 = max(0, int(x1)); y1 = max(0, int(y1)); x2 = min(w_img, int(x2)); y2 = min(h_img, int(y2))
-                if x2 <= x1 or y2 <= y1:
-                    continue
-                face = arr[y1:y2, x1:x2]
-                face_rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-                fh, fw = face_rgb.shape[:2]
-
-                bytes_per_line = fw * 3
-                qimg = QtGui.QImage(face_rgb.data, fw, fh, bytes_per_line, QtGui.QImage.Format.Format_RGB888).copy()
-                pix = QtGui.QPixmap.fromImage(qimg)
-                scaled = pix.scaled(thumb_size, thumb_size, QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
-                canvas = QtGui.QPixmap(thumb_size, thumb_size)
-                canvas.fill(QtGui.QColor('#f5f5f5'))
-                painter = QtGui.QPainter(canvas)
-                xoff = (thumb_size - scaled.width()) // 2
-                yoff = (thumb_size - scaled.height()) // 2
-                painter.drawPixmap(xoff, yoff, scaled)
-                painter.end()
-
-                btn = QtWidgets.QPushButton()
-                btn.setFlat(True)
-                btn.setStyleSheet('border: none; padding: 0; margin: 0;')
-                btn.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
-                btn.setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.PointingHandCursor))
-                btn.setFixedSize(thumb_size, thumb_size)
-                icon = QtGui.QIcon(canvas)
-                btn.setIcon(icon)
-                btn.setIconSize(QtCore.QSize(thumb_size, thumb_size))
-                btn.setToolTip(f"{os.path.basename(path)}")
-                btn._path = path
-                btn.clicked.connect(lambda _checked, p=path: QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(p)))
-
-                v = QtWidgets.QVBoxLayout()
-                v.setContentsMargins(0, 2, 0, 2)
-                v.setSpacing(2)
-                v.addWidget(btn)
-                lbl = QtWidgets.QLabel(os.path.basename(path))
-                lbl.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-                v.addWidget(lbl)
-
-                container = QtWidgets.QWidget()
-                container.setLayout(v)
-                container.setContentsMargins(0, 0, 0, 0)
-                container.setStyleSheet('background: transparent;')
-                self._preview_layout.addWidget(container, r, c)
-                c += 1
-                if c >= cols:
-                    c = 0
-                    r += 1
-            except Exception:
-                continue
-
-        # place the preview scroll area as the central widget
-        self._preview_widget.adjustSize()
-        self.setCentralWidget(self._preview_scroll)
+        # the grid flows to the window width; ``cols`` is kept for callers
+        self._preview.thumb_size = thumb_size
+        self._preview.set_faces([f for f in faces if f.get('abs_path') and f.get('bbox')])
+        # place the preview grid as the central widget
+        self.setCentralWidget(self._preview)
 
     def show_results_on_main(self, results, thumb_size: int = 120, cols: int = 6):
         """Render a list of search results (sim, path, bbox) into the main preview area."""
-        # clear existing layout
-        while self._preview_layout.count():
-            it = self._preview_layout.takeAt(0)
-            w = it.widget()
-            if w is not None:
-                w.setParent(None)
-
-        r = c = 0
-        for sim, path, bbox in results:
-            try:
-                import cv2
-                arr = cv2.imread(path)
-                if arr is None:
-                    continue
-                x1, y1, x2, y2 = bbox
-                h_img, w_img = arr.shape[:2]
-                x1 = max(0, int(x1)); y1 = max(0, int(y1)); x2 = min(w_img, int(x2)); y2 = min(h_img, int(y2))
-                if x2 <= x1 or y2 <= y1:
-                    continue
-                face = arr[y1:y2, x1:x2]
-                face_rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-                fh, fw = face_rgb.shape[:2]
-
-                bytes_per_line = fw * 3
-                qimg = QtGui.QImage(face_rgb.data, fw, fh, bytes_per_line, QtGui.QImage.Format.Format_RGB888).copy()
-                pix = QtGui.QPixmap.fromImage(qimg)
-                scaled = pix.scaled(thumb_size, thumb_size, QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
-                canvas = QtGui.QPixmap(thumb_size, thumb_size)
-                canvas.fill(QtGui.QColor('#f5f5f5'))
-                painter = QtGui.QPainter(canvas)
-                xoff = (thumb_size - scaled.width()) // 2
-                yoff = (thumb_size - scaled.height()) // 2
-                painter.drawPixmap(xoff, yoff, scaled)
-                painter.end()
-
-                btn = QtWidgets.QPushButton()
-                btn.setFlat(True)
-                btn.setStyleSheet('border: none; padding: 0; margin: 0;')
-                btn.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
-                btn.setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.PointingHandCursor))
-                btn.setFixedSize(thumb_size, thumb_size)
-                icon = QtGui.QIcon(canvas)
-                btn.setIcon(icon)
-                btn.setIconSize(QtCore.QSize(thumb_size, thumb_size))
-                btn.setToolTip(f"{os.path.basename(path)} — {sim:.3f}")
-                btn._path = path
-                btn.clicked.connect(lambda _checked, p=path: QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(p)))
-
-                v = QtWidgets.QVBoxLayout()
-                v.setContentsMargins(0, 2, 0, 2)
-                v.setSpacing(2)
-                v.addWidget(btn)
-                lbl = QtWidgets.QLabel(os.path.basename(path))
-                lbl.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-                v.addWidget(lbl)
-
-                container = QtWidgets.QWidget()
-                container.setLayout(v)
-                container.setContentsMargins(0, 0, 0, 0)
-                container.setStyleSheet('background: transparent;')
-                self._preview_layout.addWidget(container, r, c)
-                c += 1
-                if c >= cols:
-                    c = 0
-                    r += 1
-            except Exception:
-                continue
-
-        # place the preview scroll area as the central widget
-        self._preview_widget.adjustSize()
-        self.setCentralWidget(self._preview_scroll)
+        # the grid flows to the window width; ``cols`` is kept for callers
+        self._preview.thumb_size = thumb_size
+        self._preview.set_faces([{'abs_path': path, 'bbox': bbox, 'tooltip': f"{os.path.basename(path)} — {sim:.3f}"}
+                                 for sim, path, bbox in results])
+        # place the preview grid as the central widget
+        self.setCentralWidget(self._preview)
+
+    def closeEvent(self, ev):
+        # drop queued thumbnail work so the pool doesn't hold up exit
+        self._preview.loader.shutdown()
+        # running jobs stop at their next checkpoint
+        self.scheduler.cancel_all()
+        super().closeEvent(ev)
 
     def on_people(self):
         from qt_people import PeopleDialog
@@ -477,9 +487,16 @@ class MainWindow(QtWidgets.QMainWindow):
         dlg.exec()
 
 def main():
+    # decoder processes (FACEREC_DECODERS) are spawned; needed for frozen builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    # --profile[=cpu,mem,stack] / FACEREC_PROFILE; artefacts go to ./profiles next to faces.db
+    profiling.configure_from_argv(sys.argv, default_dir=os.path.join(HERE, 'profiles'))
     app = QtWidgets.QApplication(sys.argv)
     w = MainWindow()
     w.show()
+    # once the first frame is up: load models off the GUI thread
+    QtCore.QTimer.singleShot(0, w.start_warmup)
     sys.exit(app.exec())
 
 if __name__ == '__main__':
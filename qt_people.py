@@ -1,8 +1,11 @@
 from PyQt6 import QtWidgets, QtGui, QtCore
-from PyQt6 import QtWidgets, QtGui, QtCore
 import os
 
-from backend.utils import thumb_from_face
+from backend.thumbs import get_thumb_cache, thumb_dir_for
+from qt_export import run_export
+from qt_thumbs import FaceGridView, ThumbLoader, placeholder_pixmap
+
+AVATAR_SIZE = 48
 
 
 class PeopleDialog(QtWidgets.QDialog):
@@ -11,10 +14,18 @@ class PeopleDialog(QtWidgets.QDialog):
         self.setWindowTitle('People')
         self.resize(800, 600)
         self.db = db
+        self.thumbs = get_thumb_cache(thumb_dir_for(db.path))
 
         layout = QtWidgets.QVBoxLayout(self)
         self.list = QtWidgets.QListWidget()
+        self.list.setIconSize(QtCore.QSize(AVATAR_SIZE, AVATAR_SIZE))
+        self.list.setUniformItemSizes(True)
         layout.addWidget(self.list)
+        # representative faces load in the background and fill in the icons
+        self._avatar_items = {}
+        self._avatar_placeholder = QtGui.QIcon(placeholder_pixmap(AVATAR_SIZE))
+        self.avatars = ThumbLoader(self.thumbs, self)
+        self.avatars.loaded.connect(self._on_avatar)
 
         btns = QtWidgets.QHBoxLayout()
         self.btn_refresh = QtWidgets.QPushButton('Refresh')
@@ -38,7 +49,12 @@ class PeopleDialog(QtWidgets.QDialog):
         self.refresh()
 
     def refresh(self):
+        self.avatars.cancel()
+        self._avatar_items.clear()
         self.list.clear()
+        # cheap when nothing changed: only clusters flagged dirty are recomputed
+        self.db.update_representatives()
+        reps = self.db.get_representatives()
         rows = self.db.list_clusters()
         if not rows:
             # show a non-selectable placeholder so the dialog isn't filled with stale entries
@@ -52,14 +68,29 @@ class PeopleDialog(QtWidgets.QDialog):
             self.btn_merge.setEnabled(False)
             self.btn_export.setEnabled(False)
         else:
-            for cid, label, cnt in rows:
-                self.list.addItem(f'{cid}: {label} ({cnt})')
+            for i, (cid, label, cnt) in enumerate(rows):
+                item = QtWidgets.QListWidgetItem(self._avatar_placeholder, f'{cid}: {label} ({cnt})')
+                self.list.addItem(item)
+                rep = reps.get(cid)
+                if rep is not None:
+                    self._avatar_items[cid] = item
+                    # earlier rows are on screen first
+                    self.avatars.request(cid, rep['abs_path'], rep['bbox'], AVATAR_SIZE, -i)
             # enable action buttons
             self.btn_view.setEnabled(True)
             self.btn_rename.setEnabled(True)
             self.btn_merge.setEnabled(True)
             self.btn_export.setEnabled(True)
 
+    def _on_avatar(self, cid, pix):
+        item = self._avatar_items.get(cid)
+        if item is not None:
+            item.setIcon(QtGui.QIcon(pix))
+
+    def done(self, result):
+        self.avatars.shutdown()
+        super().done(result)
+
     def _get_selected_ids(self):
         out = []
         for it in self.list.selectedItems():
@@ -100,8 +131,9 @@ class PeopleDialog(QtWidgets.QDialog):
         out = QtWidgets.QFileDialog.getExistingDirectory(self, 'Choose export folder')
         if not out:
             return
-        n = self.db.export_cluster(cid, os.getcwd(), out)
-        QtWidgets.QMessageBox.information(self, 'Export', f'Exported {n} files to {out}')
+        libroot = os.getcwd()
+        run_export(self, lambda mode, progress, stop: self.db.export_cluster(
+            cid, libroot, out, mode=mode, progress=progress, stop_event=stop))
 
     def view_selected(self):
         it = self.list.currentItem()
@@ -110,25 +142,10 @@ class PeopleDialog(QtWidgets.QDialog):
         cid = int(it.text().split(':', 1)[0])
         dlg = QtWidgets.QDialog(self)
         dlg.setWindowTitle(f'Person {cid}')
-        lay = QtWidgets.QGridLayout(dlg)
-        faces = self.db.get_faces_by_cluster(cid)
-        r = c = 0
-        for rec in faces[:50]:
-            path = rec['abs_path']
-            try:
-                from PIL import Image
-                img = Image.open(path).convert('RGB')
-                thumb = thumb_from_face(img, rec['bbox'], size=120)
-                data = thumb.tobytes('raw', 'RGB')
-                qimg = QtGui.QImage(data, thumb.width, thumb.height, QtGui.QImage.Format.Format_RGB888)
-                pix = QtGui.QPixmap.fromImage(qimg)
-                lbl = QtWidgets.QLabel()
-                lbl.setPixmap(pix)
-                lay.addWidget(lbl, r, c)
-                c += 1
-                if c >= 6:
-                    c = 0
-                    r += 1
-            except Exception:
-                pass
+        dlg.resize(820, 600)
+        lay = QtWidgets.QVBoxLayout(dlg)
+        grid = FaceGridView(self.thumbs, 120, dlg)
+        lay.addWidget(grid)
+        grid.set_faces(self.db.get_faces_by_cluster(cid))
         dlg.exec()
+        grid.loader.shutdown()
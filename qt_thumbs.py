@@ -0,0 +1,360 @@
+import os
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from PyQt6 import QtWidgets, QtGui, QtCore
+
+
+def pil_to_qimage(img):
+    img = img.convert('RGB')
+    data = img.tobytes('raw', 'RGB')
+    return QtGui.QImage(data, img.width, img.height, img.width * 3, QtGui.QImage.Format.Format_RGB888).copy()
+
+
+def square_pixmap(qimg, thumb_size):
+    """Scale a face image into a square QPixmap, centred on a light canvas."""
+    canvas = QtGui.QPixmap(thumb_size, thumb_size)
+    canvas.fill(QtGui.QColor('#f5f5f5'))
+    if qimg is None or qimg.isNull():
+        return canvas
+    pix = QtGui.QPixmap.fromImage(qimg)
+    # scale while keeping aspect ratio, then center on a square canvas
+    scaled = pix.scaled(thumb_size, thumb_size, QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
+    painter = QtGui.QPainter(canvas)
+    xoff = (thumb_size - scaled.width()) // 2
+    yoff = (thumb_size - scaled.height()) // 2
+    painter.drawPixmap(xoff, yoff, scaled)
+    painter.end()
+    return canvas
+
+
+def pil_to_square_pixmap(img, thumb_size):
+    """Convert a PIL thumbnail into a square QPixmap, centred on a light canvas."""
+    return square_pixmap(pil_to_qimage(img), thumb_size)
+
+
+def placeholder_pixmap(thumb_size):
+    canvas = QtGui.QPixmap(thumb_size, thumb_size)
+    canvas.fill(QtGui.QColor('#e6e6e6'))
+    return canvas
+
+
+class _JobSignals(QtCore.QObject):
+    # generation, token, image (null QImage when the thumbnail failed)
+    done = QtCore.pyqtSignal(int, object, QtGui.QImage)
+
+
+class _DrainJob(QtCore.QRunnable):
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+        self.loader._drain()
+
+
+class ThumbLoader(QtCore.QObject):
+    """Loads face thumbnails on a QThreadPool and hands back QPixmaps.
+
+    ``request`` queues a (path, bbox) pair under an opaque token; ``loaded``
+    fires on the GUI thread with that token once the pixmap is ready.
+    ``prioritize`` moves still-queued tokens (e.g. visible tiles) ahead of
+    the rest and ``cancel`` drops everything in flight, e.g. when the view
+    closes or is repopulated.
+    """
+    loaded = QtCore.pyqtSignal(object, QtGui.QPixmap)
+
+    HIGH = 10
+    NORMAL = 0
+
+    def __init__(self, cache, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.generation = 0
+        self.pool = QtCore.QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        else:
+            self.pool.setMaxThreadCount(max(2, min(8, (os.cpu_count() or 2))))
+        # the pool runs a few drain jobs that pull from our own priority heap,
+        # so queued requests can be re-prioritised and dropped cheaply
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = {}  # token -> [priority or None once taken, thumb_size, path, bbox]
+        self._workers = 0
+        self._signals = _JobSignals()
+        self._signals.done.connect(self._on_done)
+
+    def request(self, token, path, bbox, thumb_size, priority=NORMAL):
+        with self._lock:
+            ent = self._pending.get(token)
+            if ent is not None and ent[0] is None:
+                return  # already being rendered
+            self._pending[token] = [priority, thumb_size, path, bbox]
+            heapq.heappush(self._heap, (-priority, next(self._seq), self.generation, token))
+        self._spawn()
+
+    def prioritize(self, tokens):
+        with self._lock:
+            for token in tokens:
+                ent = self._pending.get(token)
+                if ent is None or ent[0] is None or ent[0] >= self.HIGH:
+                    continue
+                ent[0] = self.HIGH
+                heapq.heappush(self._heap, (-self.HIGH, next(self._seq), self.generation, token))
+
+    def retain(self, tokens):
+        """Drop queued (not yet started) requests whose token is not in ``tokens``.
+
+        Returns the dropped tokens.
+        """
+        keep = set(tokens)
+        with self._lock:
+            dropped = [t for t, ent in self._pending.items() if ent[0] is not None and t not in keep]
+            for t in dropped:
+                del self._pending[t]
+        return dropped
+
+    def cancel(self):
+        with self._lock:
+            self.generation += 1
+            self._heap.clear()
+            self._pending.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.waitForDone(2000)
+
+    def _spawn(self):
+        while True:
+            with self._lock:
+                if not self._heap or self._workers >= self.pool.maxThreadCount():
+                    return
+                self._workers += 1
+            self.pool.start(_DrainJob(self))
+
+    def _next(self):
+        with self._lock:
+            while self._heap:
+                negp, _, gen, token = heapq.heappop(self._heap)
+                ent = self._pending.get(token)
+                # skip stale heap entries (cancelled, re-prioritised or already taken)
+                if gen != self.generation or ent is None or ent[0] != -negp:
+                    continue
+                ent[0] = None
+                return gen, token, ent[1], ent[2], ent[3]
+            self._workers -= 1
+            return None
+
+    def _drain(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            gen, token, size, path, bbox = item
+            qimg = QtGui.QImage()
+            try:
+                thumb = self.cache.get(path, bbox, size=size)
+                if thumb is not None:
+                    qimg = pil_to_qimage(thumb)
+            except Exception:
+                pass
+            if gen == self.generation:
+                self._signals.done.emit(gen, token, qimg)
+
+    def _on_done(self, gen, token, qimg):
+        if gen != self.generation:
+            return
+        with self._lock:
+            ent = self._pending.pop(token, None)
+        if ent is None:
+            return
+        self.loaded.emit(token, square_pixmap(qimg, ent[1]))
+
+
+FaceRole = QtCore.Qt.ItemDataRole.UserRole + 1
+
+
+class FaceGridModel(QtCore.QAbstractListModel):
+    """List model over face records that loads thumbnails only when asked.
+
+    The view only calls ``data`` for rows it is about to paint, so the first
+    DecorationRole lookup of a row queues its thumbnail. The most recently
+    requested rows are served first (they are the ones on screen) and decoded
+    pixmaps live in a bounded LRU, so memory stays flat for huge grids.
+    """
+    def __init__(self, cache, thumb_size=120, parent=None, max_pixmaps=1500):
+        super().__init__(parent)
+        self.thumb_size = thumb_size
+        self.max_pixmaps = max_pixmaps
+        self.loader = ThumbLoader(cache, self)
+        self.loader.loaded.connect(self._on_loaded)
+        self._faces = []
+        self._pixmaps = OrderedDict()  # row -> QPixmap, least recently used first
+        self._requested = set()
+        self._prio = itertools.count(ThumbLoader.HIGH)
+        self._placeholder = placeholder_pixmap(thumb_size)
+
+    def set_faces(self, faces):
+        self.beginResetModel()
+        self.loader.cancel()
+        self._faces = list(faces)
+        self._pixmaps.clear()
+        self._requested.clear()
+        if self._placeholder.width() != self.thumb_size:
+            self._placeholder = placeholder_pixmap(self.thumb_size)
+        self.endResetModel()
+
+    def face(self, row):
+        return self._faces[row]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._faces)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        rec = self._faces[row]
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(rec['abs_path'])
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return rec.get('tooltip') or os.path.basename(rec['abs_path'])
+        if role == QtCore.Qt.ItemDataRole.DecorationRole:
+            pix = self._pixmaps.get(row)
+            if pix is not None:
+                self._pixmaps.move_to_end(row)
+                return pix
+            if row not in self._requested:
+                self._requested.add(row)
+                self.loader.request(row, rec['abs_path'], rec['bbox'], self.thumb_size, next(self._prio))
+            return self._placeholder
+        if role == FaceRole:
+            return rec
+        return None
+
+    def retain(self, first, last):
+        """Forget queued thumbnails outside rows ``first..last`` (scrolled past)."""
+        dropped = self.loader.retain(range(first, last + 1))
+        self._requested.difference_update(dropped)
+
+    def _on_loaded(self, row, pix):
+        self._requested.discard(row)
+        self._pixmaps[row] = pix
+        while len(self._pixmaps) > self.max_pixmaps:
+            self._pixmaps.popitem(last=False)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [QtCore.Qt.ItemDataRole.DecorationRole])
+
+
+class FaceTileDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints a face tile: square thumbnail with the file name underneath."""
+    def __init__(self, thumb_size=120, parent=None):
+        super().__init__(parent)
+        self.thumb_size = thumb_size
+
+    def sizeHint(self, option, index):
+        fm = option.fontMetrics
+        return QtCore.QSize(self.thumb_size + 8, self.thumb_size + fm.height() + 10)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        r = option.rect
+        if option.state & QtWidgets.QStyle.StateFlag.State_Selected:
+            painter.fillRect(r, option.palette.highlight())
+        elif option.state & QtWidgets.QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(r, QtGui.QColor('#ececec'))
+        pix = index.data(QtCore.Qt.ItemDataRole.DecorationRole)
+        x = r.x() + (r.width() - self.thumb_size) // 2
+        y = r.y() + 4
+        if pix is not None:
+            painter.drawPixmap(x, y, pix)
+        text_rect = QtCore.QRect(r.x() + 2, y + self.thumb_size + 2, r.width() - 4, option.fontMetrics.height())
+        text = option.fontMetrics.elidedText(index.data(QtCore.Qt.ItemDataRole.DisplayRole) or '',
+                                             QtCore.Qt.TextElideMode.ElideMiddle, text_rect.width())
+        painter.drawText(text_rect, QtCore.Qt.AlignmentFlag.AlignCenter, text)
+        painter.restore()
+
+
+class FaceGridView(QtWidgets.QListView):
+    """Virtualised face grid (QListView in icon mode with a custom delegate).
+
+    Only rows in the viewport are painted and only those load thumbnails,
+    so scrolling through tens of thousands of faces stays smooth. Pending
+    loads are dropped when the grid is repopulated or hidden.
+
+    faces: list of dicts with 'abs_path', 'bbox' and optionally 'tooltip'
+    Clicking a thumbnail opens the image with the OS default viewer.
+    """
+    def __init__(self, cache, thumb_size=120, parent=None):
+        super().__init__(parent)
+        self.face_model = FaceGridModel(cache, thumb_size, self)
+        self.setModel(self.face_model)
+        self.setItemDelegate(FaceTileDelegate(thumb_size, self))
+        self.setViewMode(QtWidgets.QListView.ViewMode.IconMode)
+        self.setResizeMode(QtWidgets.QListView.ResizeMode.Adjust)
+        self.setMovement(QtWidgets.QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.setBatchSize(500)
+        self.setSpacing(3)
+        self.setMouseTracking(True)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.PointingHandCursor))
+        self.clicked.connect(self._open)
+        # after scrolling settles, drop queued work for rows that left the screen
+        self._retain_timer = QtCore.QTimer(self)
+        self._retain_timer.setSingleShot(True)
+        self._retain_timer.setInterval(150)
+        self._retain_timer.timeout.connect(self._retain_visible)
+        self.verticalScrollBar().valueChanged.connect(lambda _v: self._retain_timer.start())
+
+    @property
+    def loader(self):
+        return self.face_model.loader
+
+    @property
+    def thumb_size(self):
+        return self.face_model.thumb_size
+
+    @thumb_size.setter
+    def thumb_size(self, size):
+        self.face_model.thumb_size = size
+        self.itemDelegate().thumb_size = size
+
+    def set_faces(self, faces):
+        self.face_model.set_faces(faces)
+        self.scrollToTop()
+
+    def clear(self):
+        self.face_model.set_faces([])
+
+    def visible_range(self):
+        n = self.face_model.rowCount()
+        if not n:
+            return 0, -1
+        vp = self.viewport().rect()
+        first = self.indexAt(vp.topLeft() + QtCore.QPoint(4, 4))
+        last = self.indexAt(vp.bottomRight() - QtCore.QPoint(4, 4))
+        lo = first.row() if first.isValid() else 0
+        hi = last.row() if last.isValid() else n - 1
+        return lo, hi
+
+    def _retain_visible(self):
+        lo, hi = self.visible_range()
+        self.face_model.retain(lo, hi)
+
+    def _open(self, index):
+        rec = index.data(FaceRole)
+        if rec:
+            QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(rec['abs_path']))
+
+    def hideEvent(self, ev):
+        # view closed or swapped out: stop decoding for it; rows are
+        # requested again from data() when they are painted next time
+        self.loader.cancel()
+        self.face_model._requested.clear()
+        super().hideEvent(ev)
@@ -0,0 +1,91 @@
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+try:
+    from backend.export import MODES
+except ModuleNotFoundError:
+    from export import MODES
+
+MODE_LABELS = {
+    'copy': 'Copy files',
+    'hardlink': 'Hard links (same drive, no extra space)',
+    'symlink': 'Symbolic links',
+    'reflink': 'Reflink / clone (copy-on-write filesystems)',
+    'zip': 'Single .zip archive',
+    'tar': 'Single .tar archive',
+}
+
+
+class ExportDialog(tk.Toplevel):
+    """Pick an export mode, run ``job(mode, progress, stop_event)`` on a
+    worker thread with a progress bar and Cancel, then report the outcome.
+    """
+    def __init__(self, parent, job, title='Export', on_done=None):
+        super().__init__(parent)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(parent)
+        self.job = job
+        self.on_done = on_done
+        self.stop_event = threading.Event()
+        self.worker = None
+
+        body = ttk.Frame(self, padding=10)
+        body.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(body, text='Export as:').grid(row=0, column=0, sticky='w')
+        self.mode = tk.StringVar(value=MODE_LABELS['copy'])
+        ttk.Combobox(body, textvariable=self.mode, state='readonly', width=42,
+                     values=[MODE_LABELS[m] for m in MODES]).grid(row=0, column=1, padx=(6, 0))
+        self.prog = ttk.Progressbar(body, mode='determinate', length=360)
+        self.prog.grid(row=1, column=0, columnspan=2, pady=8, sticky='we')
+        self.status = tk.StringVar(value='')
+        ttk.Label(body, textvariable=self.status).grid(row=2, column=0, columnspan=2, sticky='w')
+        btns = ttk.Frame(body)
+        btns.grid(row=3, column=0, columnspan=2, sticky='e', pady=(8, 0))
+        self.btn_start = ttk.Button(btns, text='Start', command=self.start)
+        self.btn_cancel = ttk.Button(btns, text='Cancel', command=self.cancel)
+        self.btn_start.pack(side=tk.LEFT, padx=4)
+        self.btn_cancel.pack(side=tk.LEFT, padx=4)
+        self.protocol('WM_DELETE_WINDOW', self.cancel)
+
+    def start(self):
+        label = self.mode.get()
+        mode = next(m for m in MODES if MODE_LABELS[m] == label)
+        self.btn_start.configure(state=tk.DISABLED)
+        self.status.set('Exporting…')
+        self.worker = threading.Thread(target=self._run, args=(mode,), daemon=True)
+        self.worker.start()
+
+    def cancel(self):
+        if self.worker and self.worker.is_alive():
+            self.stop_event.set()
+            self.status.set('Cancelling…')
+        else:
+            self.destroy()
+
+    def _run(self, mode):
+        def progress(done, total):
+            self.after(0, lambda: (self.prog.configure(maximum=total, value=done),
+                                   self.status.set(f'{done}/{total}')))
+        try:
+            res = self.job(mode, progress, self.stop_event)
+        except Exception as e:
+            res = e
+        self.after(0, lambda: self._finish(res))
+
+    def _finish(self, res):
+        parent = self.master
+        self.destroy()
+        if isinstance(res, Exception):
+            messagebox.showerror('Export', f'Export failed: {res}', parent=parent)
+            return
+        msg = res.summary()
+        if res.failed:
+            lines = '\n'.join(f'{src}: {err}' for src, err in res.failed[:15])
+            more = f'\n… and {len(res.failed) - 15} more' if len(res.failed) > 15 else ''
+            messagebox.showwarning('Export', f'{msg}\n\n{lines}{more}', parent=parent)
+        else:
+            messagebox.showinfo('Export', msg, parent=parent)
+        if self.on_done:
+            self.on_done(res)
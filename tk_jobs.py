@@ -0,0 +1,73 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+def job_progress_text(j):
+    if j['total']:
+        return f"{j['done']}/{j['total']}"
+    return ''
+
+
+class JobsWindow(tk.Toplevel):
+    """Queue view of a backend Scheduler: running, paused, queued and recent jobs.
+
+    Refreshes whenever the scheduler reports a change; Cancel stops the
+    selected jobs (queued ones are dropped, running ones stop at their next
+    checkpoint).
+    """
+    COLUMNS = (('name', 'Job', 320), ('priority', 'Priority', 90), ('state', 'State', 80),
+               ('progress', 'Progress', 90), ('text', 'Status', 300))
+
+    def __init__(self, parent, scheduler):
+        super().__init__(parent)
+        self.title('Jobs')
+        self.geometry('900x320')
+        self.scheduler = scheduler
+        self._pending = False
+
+        self.tree = ttk.Treeview(self, columns=[c for c, _, _ in self.COLUMNS], show='headings', selectmode='extended')
+        for col, label, width in self.COLUMNS:
+            self.tree.heading(col, text=label)
+            self.tree.column(col, width=width, stretch=(col in ('name', 'text')))
+        self.tree.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=6, pady=6)
+        btns = ttk.Frame(self)
+        btns.pack(side=tk.BOTTOM, fill=tk.X, padx=6, pady=(0, 6))
+        ttk.Button(btns, text='Close', command=self.destroy).pack(side=tk.RIGHT, padx=4)
+        ttk.Button(btns, text='Cancel Selected', command=self.cancel_selected).pack(side=tk.RIGHT, padx=4)
+
+        scheduler.subscribe(self._on_change)
+        self.bind('<Destroy>', self._on_destroy)
+        self.refresh()
+
+    def _on_change(self):
+        # called from job threads; coalesce into one refresh on the Tk thread
+        if not self._pending:
+            self._pending = True
+            try:
+                self.after(100, self.refresh)
+            except (RuntimeError, tk.TclError):
+                pass
+
+    def _on_destroy(self, ev):
+        if ev.widget is self:
+            self.scheduler.unsubscribe(self._on_change)
+
+    def refresh(self):
+        self._pending = False
+        if not self.winfo_exists():
+            return
+        selected = set(self.tree.selection())
+        self.tree.delete(*self.tree.get_children())
+        for j in self.scheduler.jobs():
+            iid = str(j['id'])
+            text = j['error'] or j['text']
+            self.tree.insert('', tk.END, iid=iid, values=(j['name'], j['priority_name'], j['state'],
+                                                          job_progress_text(j), text))
+            if iid in selected:
+                self.tree.selection_add(iid)
+
+    def cancel_selected(self):
+        for iid in self.tree.selection():
+            job = self.scheduler.get(int(iid))
+            if job is not None and job.active:
+                job.cancel()
@@ -0,0 +1,290 @@
+import heapq
+import itertools
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from PIL import ImageTk
+
+
+class TkThumbLoader:
+    """Background face-thumbnail loader for Tk windows.
+
+    A small pool of daemon threads renders thumbnails through the shared
+    ThumbCache; results are handed back on the Tk thread via ``after()``
+    polling, because PhotoImage objects must be created there. Requests are
+    served highest priority first, ``prioritize`` bumps tokens that became
+    visible and ``cancel`` drops everything queued (e.g. on repopulate).
+    The loader stops itself when ``widget`` is destroyed.
+    """
+    HIGH = 10
+    NORMAL = 0
+
+    def __init__(self, widget, cache, workers=None, poll_ms=30):
+        self.widget = widget
+        self.cache = cache
+        self.poll_ms = poll_ms
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = {}  # token -> [priority or None once taken, size, path, bbox, callback]
+        self._results = queue.Queue()
+        self._closed = False
+        self._after_id = None
+        n = workers or max(2, min(6, (os.cpu_count() or 2)))
+        for _ in range(n):
+            threading.Thread(target=self._work, daemon=True).start()
+        widget.bind('<Destroy>', self._on_destroy, add='+')
+
+    def request(self, token, path, bbox, size, callback, priority=NORMAL):
+        """Queue a thumbnail; ``callback(token, pil_image_or_None)`` runs on the Tk thread."""
+        with self._cv:
+            ent = self._pending.get(token)
+            if ent is not None and ent[0] is None:
+                return  # already being rendered
+            self._pending[token] = [priority, size, path, bbox, callback]
+            heapq.heappush(self._heap, (-priority, next(self._seq), self.generation, token))
+            self._cv.notify()
+        self._schedule()
+
+    def prioritize(self, tokens):
+        with self._cv:
+            for token in tokens:
+                ent = self._pending.get(token)
+                if ent is None or ent[0] is None or ent[0] >= self.HIGH:
+                    continue
+                ent[0] = self.HIGH
+                heapq.heappush(self._heap, (-self.HIGH, next(self._seq), self.generation, token))
+            self._cv.notify_all()
+
+    def retain(self, tokens):
+        """Drop queued (not yet started) requests whose token is not in ``tokens``."""
+        keep = set(tokens)
+        with self._cv:
+            dropped = [t for t, ent in self._pending.items() if ent[0] is not None and t not in keep]
+            for t in dropped:
+                del self._pending[t]
+        return dropped
+
+    def cancel(self):
+        with self._cv:
+            self.generation += 1
+            self._heap.clear()
+            self._pending.clear()
+
+    def close(self):
+        self.cancel()
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _on_destroy(self, ev):
+        if ev.widget is self.widget:
+            self.close()
+
+    # ---------- worker side ----------
+    def _work(self):
+        while True:
+            with self._cv:
+                item = None
+                while item is None:
+                    if self._closed:
+                        return
+                    while self._heap:
+                        negp, _, gen, token = heapq.heappop(self._heap)
+                        ent = self._pending.get(token)
+                        # skip stale heap entries (cancelled, re-prioritised or already taken)
+                        if gen != self.generation or ent is None or ent[0] != -negp:
+                            continue
+                        ent[0] = None
+                        item = (gen, token, ent[1], ent[2], ent[3])
+                        break
+                    if item is None:
+                        self._cv.wait()
+            gen, token, size, path, bbox = item
+            try:
+                thumb = self.cache.get(path, bbox, size=size)
+            except Exception:
+                thumb = None
+            if gen == self.generation:
+                self._results.put((gen, token, thumb))
+
+    # ---------- Tk side ----------
+    def _schedule(self):
+        if self._after_id is None and not self._closed:
+            try:
+                self._after_id = self.widget.after(self.poll_ms, self._poll)
+            except Exception:
+                self._after_id = None
+
+    def _poll(self):
+        self._after_id = None
+        # deliver in small batches so a burst of results doesn't freeze the UI
+        for _ in range(64):
+            try:
+                gen, token, thumb = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if gen != self.generation:
+                continue
+            with self._lock:
+                ent = self._pending.pop(token, None)
+            if ent is None:
+                continue
+            try:
+                ent[4](token, thumb)
+            except Exception:
+                pass
+        with self._lock:
+            busy = bool(self._pending)
+        if busy or not self._results.empty():
+            self._schedule()
+
+
+class TkFaceGrid(ttk.Frame):
+    """Canvas-based windowed face grid for Tk.
+
+    The canvas scroll region covers every face, but canvas items and
+    PhotoImages only exist for the rows in (or just around) the viewport;
+    they are created and discarded as the user scrolls. Thumbnails load
+    through a TkThumbLoader with the most recently exposed rows first.
+
+    faces: list of dicts with 'abs_path' and 'bbox'
+    on_open: called with the abs path of a double-clicked face
+    """
+    def __init__(self, master, cache, thumb_size=160, on_open=None, captions=True, pad=6, max_images=800):
+        super().__init__(master)
+        self.thumb_size = thumb_size
+        self.on_open = on_open
+        self.captions = captions
+        self.pad = pad
+        self.max_images = max_images
+        self.cell_w = thumb_size + 2 * pad
+        self.cell_h = thumb_size + 2 * pad + (18 if captions else 0)
+        self.cols = 1
+
+        self.canvas = tk.Canvas(self, highlightthickness=0)
+        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_yscroll)
+        self.canvas.configure(yscrollcommand=self.scroll.set)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.loader = TkThumbLoader(self, cache)
+        self._faces = []
+        self._drawn = {}  # index -> canvas item ids
+        self._images = OrderedDict()  # index -> PhotoImage, least recently used first
+        self._prio = itertools.count(TkThumbLoader.HIGH)
+
+        self.canvas.bind('<Configure>', lambda e: self._relayout())
+        self.canvas.bind('<Double-Button-1>', self._on_double)
+        for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.canvas.bind(seq, self._on_wheel)
+
+    def set_faces(self, faces):
+        self.loader.cancel()
+        self.canvas.delete('all')
+        self._drawn.clear()
+        self._images.clear()
+        self._faces = list(faces)
+        self.canvas.yview_moveto(0)
+        self._relayout()
+
+    def _relayout(self):
+        width = max(1, self.canvas.winfo_width())
+        cols = max(1, width // self.cell_w)
+        rows = (len(self._faces) + cols - 1) // cols
+        self.canvas.configure(scrollregion=(0, 0, cols * self.cell_w, max(1, rows * self.cell_h)))
+        if cols != self.cols:
+            # positions change with the column count; redraw from scratch
+            self.cols = cols
+            self.canvas.delete('all')
+            self._drawn.clear()
+        self._redraw()
+
+    def _visible(self):
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        # keep one extra row above and below so small scrolls don't flash
+        r0 = max(0, int(top // self.cell_h) - 1)
+        r1 = int(bottom // self.cell_h) + 1
+        return range(r0 * self.cols, min(len(self._faces), (r1 + 1) * self.cols))
+
+    def _redraw(self):
+        wanted = self._visible()
+        keep = set(wanted)
+        for i in [i for i in self._drawn if i not in keep]:
+            for item in self._drawn.pop(i):
+                self.canvas.delete(item)
+        self.loader.retain(keep)
+        for i in wanted:
+            if i not in self._drawn:
+                self._draw(i)
+
+    def _draw(self, i):
+        rec = self._faces[i]
+        r, c = divmod(i, self.cols)
+        x = c * self.cell_w + self.pad
+        y = r * self.cell_h + self.pad
+        s = self.thumb_size
+        items = [self.canvas.create_rectangle(x, y, x + s, y + s, fill='#e6e6e6', outline='')]
+        img = self._images.get(i)
+        if img is not None:
+            self._images.move_to_end(i)
+            items.append(self.canvas.create_image(x + s // 2, y + s // 2, image=img))
+        else:
+            self.loader.request(i, rec['abs_path'], rec['bbox'], s, self._on_thumb, next(self._prio))
+        if self.captions:
+            name = os.path.basename(rec['abs_path'])
+            if len(name) > 24:
+                name = name[:10] + '…' + name[-12:]
+            items.append(self.canvas.create_text(x + s // 2, y + s + 4, text=name, anchor='n'))
+        self._drawn[i] = items
+
+    def _on_thumb(self, i, thumb):
+        if thumb is None or i >= len(self._faces):
+            return
+        img = ImageTk.PhotoImage(thumb)
+        self._images[i] = img
+        extra = len(self._images) - self.max_images
+        if extra > 0:
+            # evict the least recently used images that are not on screen
+            for old in [k for k in self._images if k not in self._drawn][:extra]:
+                del self._images[old]
+        if i in self._drawn:
+            r, c = divmod(i, self.cols)
+            x = c * self.cell_w + self.pad + self.thumb_size // 2
+            y = r * self.cell_h + self.pad + self.thumb_size // 2
+            item = self.canvas.create_image(x, y, image=img)
+            self._drawn[i].insert(1, item)
+
+    def _on_yscroll(self, *args):
+        self.canvas.yview(*args)
+        self._redraw()
+
+    def _on_wheel(self, ev):
+        if getattr(ev, 'num', None) == 4:
+            step = -1
+        elif getattr(ev, 'num', None) == 5:
+            step = 1
+        else:
+            step = -1 if ev.delta > 0 else 1
+        self.canvas.yview_scroll(step * 2, 'units')
+        self._redraw()
+
+    def _on_double(self, ev):
+        x = self.canvas.canvasx(ev.x)
+        y = self.canvas.canvasy(ev.y)
+        c = int(x // self.cell_w)
+        i = int(y // self.cell_h) * self.cols + c
+        if 0 <= c < self.cols and 0 <= i < len(self._faces) and self.on_open:
+            self.on_open(self._faces[i]['abs_path'])